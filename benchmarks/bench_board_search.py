@@ -0,0 +1,95 @@
+"""
+Benchmarks `embed board search` queries against a synthetic board registry.
+
+    python benchmarks/bench_board_search.py --boards 20000 --budget-ms 1.0
+
+Exits non-zero when the p95 query latency exceeds the budget.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from board_search import BoardSearchIndex  # noqa: E402
+
+FAMILIES = [
+    ("stm32", "STM32", ["cortex-m0", "cortex-m3", "cortex-m4", "cortex-m7"], ["Nucleo", "Discovery", "Eval", "BluePill"]),
+    ("esp32", "ESP32", ["xtensa-esp32", "xtensa-esp32s3", "riscv-esp32c3"], ["DevKit", "WROOM", "WROVER", "Pico"]),
+    ("tivac", "TM4C", ["cortex-m4"], ["LaunchPad", "Connected LaunchPad"]),
+    ("nrf", "nRF", ["cortex-m4", "cortex-m33"], ["DK", "Dongle", "Thingy"]),
+    ("rp2040", "RP", ["cortex-m0"], ["Pico", "Feather", "Tiny"]),
+    ("samd", "ATSAMD", ["cortex-m0", "cortex-m4"], ["Xplained", "Curiosity", "Feather"]),
+]
+
+QUERIES = [
+    "stm32f13",
+    "tiva launchpad",
+    "nucleo",
+    "esp32 devkit",
+    "cortex-m4 discovery",
+    "10c4:ea60",
+    "rp2040 pico",
+    "nrf52840 dk",
+    "xplaned",
+    "stm32f407",
+]
+
+
+def synthetic_boards(count, seed=1234):
+    rng = random.Random(seed)
+    boards = []
+    for i in range(count):
+        family, prefix, mcus, kinds = rng.choice(FAMILIES)
+        part = f"{prefix}{rng.choice('FGHLCS')}{rng.randint(0, 999):03d}{rng.choice('CRVZ')}{rng.choice('68BEGI')}"
+        kind = rng.choice(kinds)
+        vendor = f"{rng.randint(0, 0xffff):04x}:{rng.randint(0, 0xffff):04x}"
+        boards.append({
+            "name": f"{part} {kind}",
+            "config_file": f"{part.lower()}-{kind.lower().replace(' ', '-')}-{i}",
+            "source": "json" if i % 10 == 0 else "openocd",
+            "config": {"family": family, "mcu": rng.choice(mcus), "usb_ids": [vendor]},
+        })
+    return boards
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--boards", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    boards = synthetic_boards(args.boards)
+    started = time.perf_counter()
+    index = BoardSearchIndex(boards)
+    build_ms = (time.perf_counter() - started) * 1000
+    print(f"indexed {len(boards)} boards ({len(index.vocab)} tokens) in {build_ms:.1f} ms")
+
+    worst_p95 = 0.0
+    for query in QUERIES:
+        samples = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            results = index.search(query, limit=args.limit)
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        p50 = statistics.median(samples)
+        p95 = samples[int(len(samples) * 0.95) - 1]
+        worst_p95 = max(worst_p95, p95)
+        top = results[0][1]["name"] if results else "-"
+        print(f"{query!r:24} p50 {p50:7.3f} ms  p95 {p95:7.3f} ms  hits {len(results):3}  top {top}")
+
+    if worst_p95 > args.budget_ms:
+        print(f"FAIL: worst p95 {worst_p95:.3f} ms exceeds budget {args.budget_ms:.3f} ms")
+        return 1
+    print(f"OK: worst p95 {worst_p95:.3f} ms within budget {args.budget_ms:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
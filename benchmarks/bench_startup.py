@@ -0,0 +1,90 @@
+"""
+Tracks CLI startup: wall-clock time per subcommand and `-X importtime`.
+
+    python benchmarks/bench_startup.py --runs 15 --budget-ms 50
+
+Fast-path commands (the `board ... --json` queries used from hooks) must stay
+under the budget; the rest are reported so regressions stay visible.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(REPO_ROOT, "src", "main.py")
+
+# (argv, fast_path)
+COMMANDS = [
+    (["board", "list", "--json"], True),
+    (["board", "search", "tiva", "--json"], True),
+    (["board", "tools", "esp32dev", "--json"], True),
+    (["--help"], False),
+    (["board", "list"], False),
+    (["board", "search", "tiva"], False),
+    (["board", "tools", "esp32dev"], False),
+    (["new", "--help"], False),
+    (["add-module", "--help"], False),
+    (["compile", "--help"], False),
+]
+
+
+def wall_clock_ms(command, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=REPO_ROOT)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def import_times(argv, top):
+    """
+    Returns the `top` slowest top-level imports as (cumulative_us, module).
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", MAIN, *argv], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, cwd=REPO_ROOT)
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not name.startswith("  ", 1):  # top-level imports only
+            entries.append((int(cumulative_us), name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    interpreter_ms = wall_clock_ms([sys.executable, "-c", "pass"], args.runs)
+    print(f"     bare interpreter                 {interpreter_ms:7.1f} ms")
+
+    wrapper_ms = wall_clock_ms(["bash", os.path.join(REPO_ROOT, "embed"), "board", "search", "tiva", "--json"], args.runs)
+    print(f"     embed wrapper: board search --json {wrapper_ms:5.1f} ms")
+
+    failures = []
+    for argv, fast_path in COMMANDS:
+        elapsed = wall_clock_ms([sys.executable, MAIN, *argv], args.runs)
+        label = " ".join(argv)
+        marker = "fast" if fast_path else "    "
+        print(f"{marker} {label:32} {elapsed:7.1f} ms")
+        for cumulative_us, name in import_times(argv, args.top):
+            print(f"       {cumulative_us / 1000:7.1f} ms  import {name}")
+        if fast_path and elapsed > args.budget_ms:
+            failures.append(label)
+
+    if failures:
+        print(f"FAIL: over {args.budget_ms:.0f} ms: {', '.join(failures)}")
+        return 1
+    print(f"OK: fast-path commands within {args.budget_ms:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Fixtures for the CLI benchmark suite (benchmarks/perf_*.py).
+
+Everything the CLI touches is synthetic and generated per session: an
+OpenOCD board directory, a boards/ registry, deeply nested project trees
+and stub `make`/`cargo`/compiler/flasher executables first on PATH, so
+timings do not depend on what is installed on the machine.
+"""
+import json
+import os
+import random
+import shutil
+import stat
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+DEFAULT_THRESHOLD = 0.3
+
+OPENOCD_BOARDS = 10000
+JSON_BOARDS = 1000
+TREE_DEPTH = 64
+
+STUBS = {
+    "make": "echo \"make: Nothing to be done for 'all'.\"",
+    "cargo": "echo '    Finished dev [unoptimized + debuginfo] target(s) in 0.00s'",
+    "rustc": "echo 'rustc 1.80.0 (stub)'",
+    "arm-none-eabi-gcc": "echo 'arm-none-eabi-gcc (stub) 13.2.1'",
+    "arm-none-eabi-gdb": "echo 'GNU gdb (stub) 13.2'",
+    "openocd": "echo 'Open On-Chip Debugger (stub) 0.12.0'",
+    "st-flash": "echo 'st-flash (stub) 1.8.0'",
+    "esptool.py": "echo 'esptool.py (stub) v4.7'",
+}
+
+VENDORS = ["STMicroelectronics", "Texas Instruments", "Nordic", "Espressif", "Raspberry Pi", "Microchip"]
+KINDS = ["Nucleo", "Discovery", "LaunchPad", "DevKit", "Pico", "Xplained", "Feather"]
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("embed benchmarks")
+    group.addoption("--update-baselines", action="store_true", help="Record this run's medians in benchmarks/baselines.json.")
+    group.addoption("--regression-threshold", type=float, default=None, help=f"Allowed slowdown over the baseline median as a fraction (default from baselines.json, else {DEFAULT_THRESHOLD}).")
+
+
+def _load_baselines():
+    try:
+        with open(BASELINES_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"threshold": DEFAULT_THRESHOLD, "benchmarks": {}}
+
+
+def pytest_configure(config):
+    config._embed_baselines = _load_baselines()
+    config._embed_measured = {}
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    if not config.getoption("--update-baselines") or not config._embed_measured:
+        return
+    baselines = config._embed_baselines
+    baselines.setdefault("threshold", DEFAULT_THRESHOLD)
+    baselines.setdefault("benchmarks", {}).update(config._embed_measured)
+    baselines["benchmarks"] = dict(sorted(baselines["benchmarks"].items()))
+    with open(BASELINES_PATH, "w") as f:
+        json.dump(baselines, f, indent=2)
+        f.write("\n")
+
+
+def _write_stub(directory, name, body):
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write(f"#!/bin/sh\n{body}\n")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def _generate_openocd_boards(directory, count, rng):
+    os.makedirs(directory)
+    for i in range(count):
+        vendor = rng.choice(VENDORS)
+        kind = rng.choice(KINDS)
+        with open(os.path.join(directory, f"{vendor.split()[0].lower()}-{kind.lower()}-{i:05d}.cfg"), "w") as f:
+            f.write(f"# SPDX-License-Identifier: GPL-2.0-or-later\n\n# This is an {vendor} {kind} {i} board\n\nsource [find interface/stlink.cfg]\ntransport select hla_swd\nsource [find target/stm32f1x.cfg]\nreset_config srst_only\n")
+
+
+def _generate_json_boards(directory, count, rng):
+    os.makedirs(directory)
+    for name in os.listdir(os.path.join(REPO_ROOT, "boards")):
+        shutil.copy(os.path.join(REPO_ROOT, "boards", name), directory)
+    for i in range(count):
+        kind = rng.choice(KINDS)
+        config = {
+            "name": f"Synthetic {kind} {i}",
+            "family": rng.choice(["stm32", "esp32", "tivac", "nrf", "rp2040"]),
+            "mcu": rng.choice(["cortex-m0", "cortex-m3", "cortex-m4", "cortex-m7"]),
+            "toolchain": "arm-none-eabi-gcc",
+            "output": "main.elf",
+            "upload": "st-flash write {elf} 0x8000000",
+            "debug": "arm-none-eabi-gdb {elf}",
+            "usb_ids": [f"{rng.randint(0, 0xffff):04x}:{rng.randint(0, 0xffff):04x}"],
+        }
+        with open(os.path.join(directory, f"synthetic-{kind.lower()}-{i:04d}.json"), "w") as f:
+            json.dump(config, f, indent=2)
+
+
+@pytest.fixture(scope="session")
+def bench_env(tmp_path_factory):
+    """
+    Generates the synthetic fixtures once and points the CLI at them.
+
+    Returns a dict of the fixture paths; the environment stays patched for
+    the whole session.
+    """
+    root = str(tmp_path_factory.mktemp("embed-bench"))
+    rng = random.Random(1234)
+    paths = {
+        "root": root,
+        "openocd": os.path.join(root, "openocd", "board"),
+        "boards": os.path.join(root, "boards"),
+        "bin": os.path.join(root, "bin"),
+        "cache": os.path.join(root, "cache"),
+        "work": os.path.join(root, "work"),
+    }
+    _generate_openocd_boards(paths["openocd"], OPENOCD_BOARDS, rng)
+    _generate_json_boards(paths["boards"], JSON_BOARDS, rng)
+    os.makedirs(paths["bin"])
+    for name, body in STUBS.items():
+        _write_stub(paths["bin"], name, body)
+    os.makedirs(paths["work"])
+
+    patch = pytest.MonkeyPatch()
+    patch.setenv("EMBED_OPENOCD_BOARD_DIR", paths["openocd"])
+    patch.setenv("EMBED_BOARDS_DIR", paths["boards"])
+    patch.setenv("EMBED_CACHE_DIR", paths["cache"])
+    patch.setenv("PATH", paths["bin"] + os.pathsep + os.environ.get("PATH", ""))
+    patch.delenv("EMBED_TRACE", raising=False)
+    patch.setenv("COLUMNS", "120")
+    yield paths
+    patch.undo()
+
+
+@pytest.fixture(scope="session")
+def cli(bench_env):
+    """
+    Invokes the typer app in-process and fails on a non-zero exit code.
+    """
+    from typer.testing import CliRunner
+
+    import main
+
+    runner = CliRunner()
+
+    def invoke(*args):
+        result = runner.invoke(main.app, list(args), catch_exceptions=False)
+        assert result.exit_code == 0, result.output
+        return result
+
+    return invoke
+
+
+@pytest.fixture
+def c_project(bench_env, monkeypatch):
+    """
+    A C project created by `embed new`, with a prebuilt ELF so `compile`
+    has an artifact to cache and size, and a TREE_DEPTH-deep source tree.
+    """
+    from scaffold import render_project
+
+    project_root = os.path.join(bench_env["work"], f"proj-{len(os.listdir(bench_env['work']))}")
+    render_project("c", project_root, {"project_name": "bench", "board": "stm32f103c8", "language": "c"}, {"name": "stm32f103c8", "language": "c"})
+    shutil.copy(os.path.join(REPO_ROOT, "hello.elf"), os.path.join(project_root, "main"))
+    deep = os.path.join(project_root, *(f"d{level}" for level in range(TREE_DEPTH)))
+    os.makedirs(deep)
+    monkeypatch.chdir(project_root)
+    return {"root": project_root, "deep": deep}
+
+
+@pytest.fixture
+def bench(benchmark, request):
+    """
+    Runs `function` under pytest-benchmark and checks its median against
+    the stored baseline.
+
+    `setup`, if given, runs untimed before every round (as in
+    benchmark.pedantic) and returns the (args, kwargs) for that round.
+    """
+    config = request.config
+    name = request.node.name
+
+    def run(function, setup=None, rounds=15, warmup_rounds=2):
+        if setup is None:
+            result = benchmark.pedantic(function, rounds=rounds, warmup_rounds=warmup_rounds)
+        else:
+            result = benchmark.pedantic(function, setup=setup, rounds=rounds, warmup_rounds=warmup_rounds)
+        if benchmark.disabled:
+            return result
+        median_ms = benchmark.stats.stats.median * 1000
+        config._embed_measured[name] = round(median_ms, 3)
+        baseline = config._embed_baselines.get("benchmarks", {}).get(name)
+        threshold = config.getoption("--regression-threshold")
+        if threshold is None:
+            threshold = config._embed_baselines.get("threshold", DEFAULT_THRESHOLD)
+        benchmark.extra_info.update(baseline_ms=baseline, threshold=threshold)
+        if baseline and not config.getoption("--update-baselines") and median_ms > baseline * (1 + threshold):
+            pytest.fail(f"{name}: median {median_ms:.2f} ms is more than {threshold:.0%} over the {baseline:.2f} ms baseline", pytrace=False)
+        return result
+
+    return run
@@ -0,0 +1,106 @@
+"""
+Latency of the everyday CLI commands against the synthetic fixtures.
+
+    pip install -r benchmarks/requirements.txt
+    python -m pytest benchmarks                       # compare with baselines.json
+    python -m pytest benchmarks --update-baselines    # re-record the baselines
+"""
+import itertools
+import os
+import subprocess
+import sys
+
+from conftest import REPO_ROOT
+
+MAIN = os.path.join(REPO_ROOT, "src", "main.py")
+
+_names = itertools.count()
+
+
+def _run_main(*argv):
+    result = subprocess.run([sys.executable, MAIN, *argv], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, cwd=REPO_ROOT)
+    assert result.returncode == 0, result.stderr
+
+
+# -- startup (a fresh interpreter per round) ---------------------------------
+
+def test_startup_help(bench, bench_env):
+    bench(lambda: _run_main("--help"), rounds=10)
+
+
+def test_startup_board_list_json(bench, bench_env):
+    _run_main("board", "list", "--json")
+    bench(lambda: _run_main("board", "list", "--json"), rounds=10)
+
+
+# -- board registry ----------------------------------------------------------
+
+def test_board_list_cold_index(bench, bench_env, cli):
+    from board_index import load_board_index
+
+    index_path = os.path.join(bench_env["cache"], "board_index.json")
+
+    def drop_index():
+        try:
+            os.unlink(index_path)
+        except OSError:
+            pass
+        return (), {}
+
+    bench(lambda: load_board_index(), setup=drop_index, rounds=5, warmup_rounds=0)
+
+
+def test_board_list(bench, bench_env, cli):
+    # Renders an 11k-row table, so fewer rounds.
+    bench(lambda: cli("board", "list"), rounds=5, warmup_rounds=1)
+
+
+def test_board_list_json(bench, bench_env, cli):
+    bench(lambda: cli("board", "list", "--json"))
+
+
+def test_board_search(bench, bench_env, cli):
+    bench(lambda: cli("board", "search", "nucleo 42"))
+
+
+def test_board_tools(bench, bench_env, cli):
+    bench(lambda: cli("board", "tools", "esp32dev"))
+
+
+# -- project commands --------------------------------------------------------
+
+def test_new(bench, bench_env, cli, monkeypatch):
+    monkeypatch.chdir(bench_env["work"])
+
+    def fresh_name():
+        return (f"new-{next(_names)}",), {}
+
+    bench(lambda name: cli("new", name, "--lang", "c", "--board", "stm32f103c8"), setup=fresh_name)
+
+
+def test_add_module(bench, cli, c_project):
+    def fresh_name():
+        return (f"sensor{next(_names)}",), {}
+
+    bench(lambda name: cli("add-module", name, "--type", "sensor", "--conn", "I2C"), setup=fresh_name)
+
+
+def test_find_project_root_deep(bench, c_project, monkeypatch):
+    import main
+
+    monkeypatch.chdir(c_project["deep"])
+    root = bench(main._find_project_root, rounds=200)
+    assert root == c_project["root"]
+
+
+def test_compile_noop(bench, cli, c_project, monkeypatch):
+    # Up to date: the stub make has nothing to do and the build cache is bypassed.
+    monkeypatch.chdir(c_project["deep"])
+    bench(lambda: cli("compile", "--no-cache"))
+
+
+def test_compile_cache_hit(bench, cli, c_project, monkeypatch):
+    monkeypatch.chdir(c_project["deep"])
+    cli("compile")
+    result = bench(lambda: cli("compile"))
+    assert "Build cache hit" in result.output
@@ -0,0 +1,176 @@
+import json
+import os
+import re
+
+import resident
+from cache import cache_dir, load_json, write_json_atomic
+from tracing import traced
+
+INDEX_VERSION = 1
+DEFAULT_OPENOCD_BOARD_DIR = "/usr/share/openocd/scripts/board"
+
+
+def default_boards_dir():
+    return os.environ.get("EMBED_BOARDS_DIR") or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "boards")
+
+
+def default_openocd_board_dir():
+    return os.environ.get("EMBED_OPENOCD_BOARD_DIR", DEFAULT_OPENOCD_BOARD_DIR)
+
+
+def _get_openocd_board_name(file_path):
+    with open(file_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('#'):
+                comment_text = line[1:].strip()
+                # Look for specific patterns like "This is an XYZ board"
+                match = re.search(r"This is an (.+?)\s+(board|kit)", comment_text, re.IGNORECASE)
+                if match:
+                    return match.group(1).strip()
+                # Fallback to general comment if no specific pattern found
+                if "board" in comment_text.lower() or "kit" in comment_text.lower():
+                    return comment_text
+    return os.path.basename(file_path).replace(".cfg", "")
+
+
+def _parse_json_board(file_path, file_name):
+    try:
+        with open(file_path, "r") as f:
+            config = json.load(f)
+        return {"name": config.get("name", "N/A"), "config_file": file_name.replace(".json", ""), "source": "json", "config": config}
+    except Exception as e:
+        return {"error": f"Error reading {file_name}: {e}"}
+
+
+def _parse_openocd_board(file_path, file_name):
+    try:
+        return {"name": _get_openocd_board_name(file_path), "config_file": file_name, "source": "openocd"}
+    except Exception as e:
+        return {"error": f"Error reading {file_name}: {e}"}
+
+
+def _scan_dir(directory, suffix, parse, cached):
+    """
+    Refreshes one directory's entries against its cached state.
+
+    The directory listing is only re-read when the directory mtime moved;
+    individual files are re-parsed only when their size or mtime changed.
+    Returns (state, changed); state is None when the directory is missing.
+    """
+    try:
+        dir_stat = os.stat(directory)
+    except OSError:
+        return None, cached is not None
+
+    cached_files = cached.get("files", {}) if cached else {}
+    changed = cached is None or cached.get("mtime_ns") != dir_stat.st_mtime_ns
+    if changed:
+        names = sorted(name for name in os.listdir(directory) if name.endswith(suffix))
+    else:
+        names = list(cached_files)
+
+    files = {}
+    for name in names:
+        file_path = os.path.join(directory, name)
+        try:
+            file_stat = os.stat(file_path)
+        except OSError:
+            changed = True
+            continue
+        previous = cached_files.get(name)
+        if previous and previous[0] == file_stat.st_size and previous[1] == file_stat.st_mtime_ns:
+            files[name] = previous
+        else:
+            files[name] = [file_stat.st_size, file_stat.st_mtime_ns, parse(file_path, name)]
+            changed = True
+
+    return {"mtime_ns": dir_stat.st_mtime_ns, "files": files}, changed
+
+
+@traced("load board index")
+def load_board_index(boards_dir=None, openocd_board_dir=None, index_path=None):
+    """
+    Returns the board registry shared by the `board` commands.
+
+    The registry is persisted under the user cache dir and refreshed
+    incrementally, so a warm call only stats files instead of opening them.
+    """
+    boards_dir = os.path.abspath(boards_dir or default_boards_dir())
+    openocd_board_dir = os.path.abspath(openocd_board_dir or default_openocd_board_dir())
+    index_path = index_path or os.path.join(cache_dir(), "board_index.json")
+    # In the daemon the registry stays in memory until a board file changes
+    # or one of the directories appears or disappears.
+    existing = tuple(directory for directory in (boards_dir, openocd_board_dir) if os.path.isdir(directory))
+    return resident.memo(
+        ("board_index", boards_dir, openocd_board_dir, index_path),
+        lambda: _refresh_board_index(boards_dir, openocd_board_dir, index_path),
+        watch=existing,
+        stamp=existing,
+    )
+
+
+def _refresh_board_index(boards_dir, openocd_board_dir, index_path):
+    index = load_json(index_path)
+    if not index or index.get("version") != INDEX_VERSION:
+        index = {"version": INDEX_VERSION, "dirs": {}}
+    cached_dirs = index["dirs"]
+
+    dirs = {}
+    dirty = False
+    for directory, suffix, parse in (
+        (boards_dir, ".json", _parse_json_board),
+        (openocd_board_dir, ".cfg", _parse_openocd_board),
+    ):
+        state, changed = _scan_dir(directory, suffix, parse, cached_dirs.get(directory))
+        dirty = dirty or changed
+        if state is not None:
+            dirs[directory] = state
+
+    generation = index.get("generation")
+    if dirty or set(dirs) != set(cached_dirs) or not generation:
+        generation = os.urandom(16).hex()
+        try:
+            write_json_atomic(index_path, {"version": INDEX_VERSION, "generation": generation, "dirs": dirs})
+        except OSError:
+            pass  # A read-only cache dir only costs us the warm start.
+
+    boards = []
+    errors = []
+    for directory in (boards_dir, openocd_board_dir):
+        for _size, _mtime, entry in dirs.get(directory, {}).get("files", {}).values():
+            if "error" in entry:
+                errors.append(entry["error"])
+            else:
+                boards.append(entry)
+
+    return {
+        "boards": boards,
+        "errors": errors,
+        "openocd_board_dir": openocd_board_dir,
+        "openocd_found": openocd_board_dir in dirs,
+        "generation": generation,
+    }
+
+
+def find_board(index, board_name):
+    """
+    Finds a boards/*.json entry by display name or config file name.
+    """
+    wanted = board_name.lower()
+    for entry in index["boards"]:
+        if entry["source"] == "json" and (entry["name"].lower() == wanted or entry["config_file"].lower() == wanted):
+            return entry
+    return None
+
+
+def board_summary(entry):
+    """
+    JSON-ready view of a registry entry, shared by the `--json` outputs.
+    """
+    summary = {"name": entry["name"], "config_file": entry["config_file"], "source": entry["source"]}
+    config = entry.get("config")
+    if config:
+        summary["toolchain"] = config.get("toolchain")
+        summary["debug"] = config.get("debug")
+    return summary
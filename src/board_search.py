@@ -0,0 +1,312 @@
+import bisect
+import heapq
+import math
+import os
+import re
+from collections import Counter
+
+import resident
+from cache import cache_dir, load_json, write_json_atomic
+from tracing import traced
+
+SEARCH_INDEX_VERSION = 2
+
+# How much a token counts depending on where it was found.
+FIELD_WEIGHTS = {
+    "name": 1.0,
+    "config_file": 0.9,
+    "usb_ids": 0.8,
+    "mcu": 0.6,
+    "family": 0.6,
+}
+
+MAX_VOCAB_MATCHES = 64
+MIN_FUZZY_SIMILARITY = 0.45
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def trigrams(token):
+    padded = f"^{token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _board_fields(entry):
+    config = entry.get("config", {})
+    usb_ids = config.get("usb_ids") or []
+    return {
+        "name": entry["name"],
+        "config_file": entry["config_file"],
+        "family": str(config.get("family", "")),
+        "mcu": str(config.get("mcu", "")),
+        "usb_ids": " ".join(usb_ids),
+    }
+
+
+class BoardSearchIndex:
+    """
+    Token and trigram index over the board registry.
+
+    Documents are numbered in static rank order (boards/*.json first, then
+    shorter names), so a lower id wins a tie. Query tokens are matched against
+    the deduplicated token vocabulary (exact, prefix, then trigram similarity)
+    and only the postings of the best vocabulary matches are scored.
+    """
+
+    def __init__(self, entries):
+        ranked = sorted(entries, key=lambda e: (e["source"] != "json", len(e["name"]), e["name"].lower(), e["config_file"]))
+        self.docs = []
+        postings = {}
+        for doc_id, entry in enumerate(ranked):
+            fields = _board_fields(entry)
+            self.docs.append({
+                "name": entry["name"],
+                "config_file": entry["config_file"],
+                "source": entry["source"],
+                "family": fields["family"],
+                "mcu": fields["mcu"],
+                "usb_ids": fields["usb_ids"].split(),
+            })
+            for field, text in fields.items():
+                weight = FIELD_WEIGHTS[field]
+                for token in tokenize(text):
+                    doc_weights = postings.setdefault(token, {})
+                    if doc_weights.get(doc_id, 0.0) < weight:
+                        doc_weights[doc_id] = weight
+
+        self.vocab = sorted(postings)
+        # Postings are grouped by field weight so scoring works on whole sets.
+        # Each token's groups are stored flat, as [weight, count, doc ids...]
+        # repeated, which is what the JSON cache holds too; see _levels().
+        self.postings = []
+        for token in self.vocab:
+            by_weight = {}
+            for doc_id, weight in postings[token].items():
+                by_weight.setdefault(weight, []).append(doc_id)
+            flat = []
+            for weight, ids in sorted(by_weight.items(), reverse=True):
+                flat += [weight, len(ids), *ids]
+            self.postings.append(flat)
+        gram_index = {}
+        for vocab_id, token in enumerate(self.vocab):
+            for gram in trigrams(token):
+                gram_index.setdefault(gram, []).append(vocab_id)
+        self.gram_index = gram_index
+        self.vocab_grams = [len(trigrams(token)) for token in self.vocab]
+        self._finish()
+
+    def _finish(self):
+        self.vocab_ids = {token: i for i, token in enumerate(self.vocab)}
+        self.vocab_lengths = [len(token) for token in self.vocab]
+        # Sets are made on first use: a one-off search touches few postings.
+        self._level_sets = {}
+        self._gram_sets = {}
+
+    def to_json(self):
+        """
+        Returns the index as plain JSON data, see from_json().
+        """
+        fields = list(self.docs[0]) if self.docs else []
+        return {
+            # Column-wise, as one list per field loads faster than a dict per board.
+            "docs": {field: [doc[field] for doc in self.docs] for field in fields},
+            "vocab": self.vocab,
+            "postings": self.postings,
+            "gram_index": self.gram_index,
+            "vocab_grams": self.vocab_grams,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        index = cls.__new__(cls)
+        fields = list(data["docs"])
+        index.docs = [dict(zip(fields, values)) for values in zip(*data["docs"].values())]
+        index.vocab = data["vocab"]
+        index.postings = data["postings"]
+        index.gram_index = data["gram_index"]
+        index.vocab_grams = data["vocab_grams"]
+        index._finish()
+        return index
+
+    def _levels(self, vocab_id):
+        """
+        Returns [(weight, doc_ids)] of a vocabulary token, best weight first.
+        """
+        levels = self._level_sets.get(vocab_id)
+        if levels is None:
+            flat = self.postings[vocab_id]
+            levels = []
+            i = 0
+            while i < len(flat):
+                count = flat[i + 1]
+                levels.append((flat[i], frozenset(flat[i + 2:i + 2 + count])))
+                i += 2 + count
+            self._level_sets[vocab_id] = levels
+        return levels
+
+    def _gram_set(self, gram):
+        ids = self._gram_sets.get(gram)
+        if ids is None:
+            ids = self._gram_sets[gram] = frozenset(self.gram_index[gram])
+        return ids
+
+    def _match_vocab(self, token):
+        """
+        Returns {vocab_id: similarity} for one query token.
+        """
+        matches = {}
+        exact = self.vocab_ids.get(token)
+        if exact is not None:
+            matches[exact] = 1.0
+
+        if len(token) >= 2:
+            lo = bisect.bisect_right(self.vocab, token)
+            hi = bisect.bisect_left(self.vocab, token + "\x7f", lo)
+            prefixed = sorted(range(lo, hi), key=self.vocab_lengths.__getitem__)[:MAX_VOCAB_MATCHES]
+            for vocab_id in prefixed:
+                matches[vocab_id] = 0.6 + 0.3 * len(token) / self.vocab_lengths[vocab_id]
+
+        if not matches:
+            matches = self._match_fuzzy(token)
+        return matches
+
+    def _match_fuzzy(self, token):
+        """
+        Typo tolerance: Dice coefficient over padded trigrams.
+
+        A vocabulary token can only reach MIN_FUZZY_SIMILARITY if it shares
+        at least `needed` grams with the query, so it must contain one of the
+        len(grams) - needed + 1 rarest query grams (prefix filtering). Only
+        those postings are expanded; the common grams are just probed.
+        """
+        grams = sorted(trigrams(token), key=lambda gram: len(self.gram_index.get(gram, ())))
+        needed = max(1, math.ceil(MIN_FUZZY_SIMILARITY * len(grams) / (2 - MIN_FUZZY_SIMILARITY)))
+        probe_count = len(grams) - needed + 1
+        shared = Counter()
+        for gram in grams[:probe_count]:
+            candidates = self.gram_index.get(gram)
+            if candidates:
+                shared.update(candidates)
+        common = [self._gram_set(gram) for gram in grams[probe_count:] if gram in self.gram_index]
+
+        scored = []
+        for vocab_id, count in shared.items():
+            for gram_ids in common:
+                if vocab_id in gram_ids:
+                    count += 1
+            similarity = 2.0 * count / (len(grams) + self.vocab_grams[vocab_id])
+            if similarity >= MIN_FUZZY_SIMILARITY:
+                scored.append((similarity, vocab_id))
+        return {vocab_id: 0.85 * similarity for similarity, vocab_id in heapq.nlargest(MAX_VOCAB_MATCHES, scored)}
+
+    def _token_levels(self, token):
+        """
+        Partitions the documents matching `token` by their best score.
+
+        Returns ([(score, doc_ids)] best first, all matching doc_ids).
+        """
+        weighted = []
+        for vocab_id, similarity in self._match_vocab(token).items():
+            for weight, doc_ids in self._levels(vocab_id):
+                weighted.append((round(similarity * weight, 4), doc_ids))
+        weighted.sort(key=lambda item: item[0], reverse=True)
+        if len(weighted) == 1:
+            return weighted, weighted[0][1]
+
+        levels = []
+        seen = set()
+        for score, doc_ids in weighted:
+            fresh = doc_ids - seen if seen else doc_ids
+            if not fresh:
+                continue
+            seen |= fresh
+            if levels and levels[-1][0] == score:
+                levels[-1] = (score, levels[-1][1] | fresh)
+            else:
+                levels.append((score, fresh))
+        return levels, seen
+
+    def search(self, query, limit=10):
+        """
+        Returns up to `limit` (score, board) pairs, best first.
+
+        A document's score is the mean of its best per-token scores. Score
+        levels of every query token are combined best-first, so only the
+        level combinations that can still reach the top `limit` are visited.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or limit <= 0:
+            return []
+
+        per_token = [self._token_levels(token) for token in tokens]
+        # A token that is missing from a document contributes a score of 0.
+        levels = [token_levels + [(0.0, None)] for token_levels, _ in per_token]
+        matched = [doc_ids for _, doc_ids in per_token]
+
+        def combo_score(combo):
+            return sum(levels[i][j][0] for i, j in enumerate(combo))
+
+        start = (0,) * len(levels)
+        heap = [(-combo_score(start), start)]
+        visited = {start}
+        results = []
+        while heap and len(results) < limit:
+            neg_total, combo = heapq.heappop(heap)
+            if neg_total == 0:
+                break
+            present = sorted((levels[i][j][1] for i, j in enumerate(combo) if levels[i][j][1] is not None), key=len)
+            candidates = present[0].intersection(*present[1:]) if len(present) > 1 else present[0]
+            for i, j in enumerate(combo):
+                if levels[i][j][1] is None and candidates:
+                    candidates = candidates - matched[i]
+            if candidates:
+                score = round(-neg_total / len(levels), 4)
+                for doc_id in heapq.nsmallest(limit - len(results), candidates):
+                    results.append((score, self.docs[doc_id]))
+
+            for i in range(len(combo)):
+                if combo[i] + 1 < len(levels[i]):
+                    neighbour = combo[:i] + (combo[i] + 1,) + combo[i + 1:]
+                    if neighbour not in visited:
+                        visited.add(neighbour)
+                        heapq.heappush(heap, (-combo_score(neighbour), neighbour))
+        return results
+
+
+@traced("load board search index")
+def load_search_index(board_index, index_path=None):
+    """
+    Returns the BoardSearchIndex for `board_index`, reusing the JSON copy
+    from the cache dir while the board registry generation is unchanged.
+    """
+    index_path = index_path or os.path.join(cache_dir(), "board_search.json")
+    generation = board_index.get("generation")
+    if not generation:
+        return _load_search_index(board_index, index_path, generation)
+    return resident.memo(("board_search", index_path), lambda: _load_search_index(board_index, index_path, generation), stamp=generation)
+
+
+def _load_search_index(board_index, index_path, generation):
+    # The cache holds BoardSearchIndex internals, so edits to this module
+    # invalidate it as well. It is plain JSON because the cache dir may be
+    # shared (EMBED_CACHE_DIR) and must not be able to run code.
+    version = [SEARCH_INDEX_VERSION, os.stat(__file__).st_mtime_ns]
+    if generation:
+        cached = load_json(index_path)
+        try:
+            if cached["version"] == version and cached["generation"] == generation:
+                return BoardSearchIndex.from_json(cached["index"])
+        except (KeyError, TypeError, ValueError):
+            pass
+
+    search_index = BoardSearchIndex(board_index["boards"])
+    if generation:
+        try:
+            write_json_atomic(index_path, {"version": version, "generation": generation, "index": search_index.to_json()})
+        except OSError:
+            pass
+    return search_index
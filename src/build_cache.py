@@ -0,0 +1,208 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import time
+
+import resident
+from cache import cache_dir, load_json, write_json_atomic
+from tracing import subprocess_span
+
+CACHE_FORMAT = 1
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Directories and file types that are build outputs, never build inputs.
+IGNORED_DIRS = {".git", ".embed", "target", "build", "node_modules", "__pycache__"}
+IGNORED_SUFFIXES = (".o", ".d", ".a", ".elf", ".bin", ".hex", ".map", ".lst")
+
+
+def _max_bytes():
+    limit_mb = os.environ.get("EMBED_BUILD_CACHE_MAX_MB")
+    try:
+        return int(float(limit_mb) * 1024 * 1024) if limit_mb else DEFAULT_MAX_BYTES
+    except ValueError:
+        return DEFAULT_MAX_BYTES
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """
+    Content-addressed store of build artifacts under the user cache dir.
+
+    A build is keyed on the hash of every input file in the project, the
+    build command and the toolchain versions. File digests are remembered
+    per (size, mtime) so an unchanged tree is re-keyed with stat calls only.
+    Entries are evicted least-recently-used once the store outgrows
+    EMBED_BUILD_CACHE_MAX_MB (512 MB by default).
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or cache_dir("builds")
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.max_bytes = _max_bytes() if max_bytes is None else max_bytes
+
+    # -- keys ---------------------------------------------------------------
+
+    def _stat_cache_path(self, project_root):
+        name = hashlib.sha1(os.path.abspath(project_root).encode()).hexdigest()
+        return os.path.join(self.root, "stat", f"{name}.json")
+
+    def source_digests(self, project_root, exclude=()):
+        """
+        Returns sorted [(relative_path, sha256)] for the project's inputs.
+        """
+        exclude = {os.path.abspath(path) for path in exclude}
+        stat_cache_path = self._stat_cache_path(project_root)
+        previous = load_json(stat_cache_path, {})
+        current = {}
+        for directory, dir_names, file_names in os.walk(project_root):
+            dir_names[:] = sorted(name for name in dir_names if name not in IGNORED_DIRS)
+            for name in file_names:
+                path = os.path.join(directory, name)
+                if name.endswith(IGNORED_SUFFIXES) or path in exclude:
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                relative = os.path.relpath(path, project_root)
+                known = previous.get(relative)
+                if known and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+                    current[relative] = known
+                else:
+                    current[relative] = [st.st_size, st.st_mtime_ns, _sha256_file(path)]
+        if current != previous:
+            try:
+                write_json_atomic(stat_cache_path, current)
+            except OSError:
+                pass
+        return sorted((relative, entry[2]) for relative, entry in current.items())
+
+    def toolchain_versions(self, tools):
+        """
+        Returns {tool: version line}, cached per resolved binary and mtime.
+        """
+        path_env = os.environ.get("PATH", "")
+        existing = [directory for directory in dict.fromkeys(path_env.split(os.pathsep)) if directory and os.path.isdir(directory)]
+        return resident.memo(("toolchain_versions", self.root, tuple(tools), path_env), lambda: self._toolchain_versions(tools), watch=existing, stamp=tuple(existing))
+
+    def _toolchain_versions(self, tools):
+        versions_path = os.path.join(self.root, "toolchains.json")
+        known = load_json(versions_path, {})
+        versions = {}
+        changed = False
+        for tool in tools:
+            path = shutil.which(tool)
+            if not path:
+                versions[tool] = "missing"
+                continue
+            st = os.stat(path)
+            stamp = f"{os.path.realpath(path)}:{st.st_size}:{st.st_mtime_ns}"
+            entry = known.get(tool)
+            if entry and entry[0] == stamp:
+                versions[tool] = entry[1]
+                continue
+            try:
+                with subprocess_span([path, "--version"]):
+                    result = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=10)
+                version = (result.stdout or result.stderr).strip().splitlines()[0]
+            except (OSError, subprocess.SubprocessError, IndexError):
+                version = "unknown"
+            known[tool] = [stamp, version]
+            versions[tool] = version
+            changed = True
+        if changed:
+            try:
+                write_json_atomic(versions_path, known)
+            except OSError:
+                pass
+        return versions
+
+    def key(self, project_root, build_command, tools, artifacts=()):
+        digest = hashlib.sha256()
+        digest.update(f"embed-build-cache:{CACHE_FORMAT}\n".encode())
+        digest.update(("command:" + "\0".join(build_command) + "\n").encode())
+        for tool, version in sorted(self.toolchain_versions(tools).items()):
+            digest.update(f"tool:{tool}:{version}\n".encode())
+        for relative, file_digest in self.source_digests(project_root, exclude=artifacts):
+            digest.update(f"file:{relative}:{file_digest}\n".encode())
+        return digest.hexdigest()
+
+    # -- store --------------------------------------------------------------
+
+    def _entry_dir(self, key):
+        return os.path.join(self.objects_dir, key[:2], key)
+
+    def restore(self, key, project_root):
+        """
+        Copies a cached build's artifacts back into the project.
+
+        Returns the restored relative paths, or None on a cache miss.
+        """
+        entry_dir = self._entry_dir(key)
+        meta_path = os.path.join(entry_dir, "meta.json")
+        meta = load_json(meta_path)
+        if not meta:
+            return None
+        for relative, artifact_digest in meta["artifacts"].items():
+            target = os.path.join(project_root, relative)
+            source = os.path.join(entry_dir, "files", relative)
+            if not os.path.exists(source):
+                return None
+            if os.path.exists(target) and os.path.getsize(target) == os.path.getsize(source) and _sha256_file(target) == artifact_digest:
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_target = f"{target}.embed-restore"
+            shutil.copy2(source, tmp_target)
+            os.replace(tmp_target, target)
+        os.utime(meta_path)  # Marks the entry as recently used.
+        return list(meta["artifacts"])
+
+    def store(self, key, project_root, artifacts):
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        digests = {}
+        total = 0
+        for artifact in artifacts:
+            relative = os.path.relpath(artifact, project_root)
+            destination = os.path.join(tmp_dir, "files", relative)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copy2(artifact, destination)
+            digests[relative] = _sha256_file(destination)
+            total += os.path.getsize(destination)
+        write_json_atomic(os.path.join(tmp_dir, "meta.json"), {"artifacts": digests, "size": total, "created": time.time()})
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        os.replace(tmp_dir, entry_dir)
+        self.evict()
+
+    def evict(self):
+        """
+        Drops least-recently-used entries until the store fits max_bytes.
+        """
+        entries = []
+        total = 0
+        if not os.path.isdir(self.objects_dir):
+            return
+        for shard in os.listdir(self.objects_dir):
+            shard_dir = os.path.join(self.objects_dir, shard)
+            for key in os.listdir(shard_dir):
+                meta_path = os.path.join(shard_dir, key, "meta.json")
+                meta = load_json(meta_path)
+                if not meta:
+                    continue
+                entries.append((os.stat(meta_path).st_mtime, meta.get("size", 0), os.path.join(shard_dir, key)))
+                total += meta.get("size", 0)
+        for _used, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
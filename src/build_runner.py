@@ -0,0 +1,191 @@
+import os
+import queue
+import re
+import signal
+import subprocess
+import threading
+import time
+from collections import deque, namedtuple
+
+import tracing
+
+DEFAULT_TAIL_LINES = 200
+DEFAULT_MAX_DIAGNOSTICS = 500
+
+Diagnostic = namedtuple("Diagnostic", "file line column severity message")
+
+# gcc/clang style: `main.c:12:5: error: ...` (the column is optional).
+_GCC_RE = re.compile(r"^(?P<file>[^\s:][^:]*):(?P<line>\d+):(?:(?P<column>\d+):)?\s*(?P<severity>fatal error|error|warning|note):\s*(?P<message>.*)$")
+# Tool-level messages without a source line: `gcc: fatal error: ...`,
+# `collect2: error: ld returned 1 exit status`, `make: *** [all] Error 1` and
+# the linker's own `/usr/bin/ld: main.o: undefined reference to ...`.
+_TOOL_RE = re.compile(r"^(?P<file>[^\s:]+):\s*(?P<severity>fatal error|error|warning):\s*(?P<message>.*)$")
+_MAKE_RE = re.compile(r"^(?P<file>\S*make(?:\[\d+\])?): \*\*\* (?P<message>(?!Waiting for unfinished jobs).*)$")
+_LD_RE = re.compile(r"^(?P<file>\S*\bld(?:\.\w+)?): (?P<message>.*(?:undefined reference|cannot find|multiple definition|overflowed|will not fit).*)$")
+# rustc style: `error[E0425]: ...` followed by ` --> src/main.rs:3:5`.
+_RUST_HEADER_RE = re.compile(r"^(?P<severity>error|warning)(?:\[\w+\])?:\s*(?P<message>.*)$")
+_RUST_LOCATION_RE = re.compile(r"^\s*--> (?P<file>[^:]+):(?P<line>\d+):(?P<column>\d+)\s*$")
+
+
+class DiagnosticParser:
+    """
+    Turns compiler output lines into Diagnostic records as they arrive.
+    """
+
+    def __init__(self):
+        self._pending_rust = None
+
+    def feed(self, line):
+        match = _GCC_RE.match(line)
+        if match:
+            self._pending_rust = None
+            severity = "error" if match["severity"] == "fatal error" else match["severity"]
+            column = int(match["column"]) if match["column"] else None
+            return Diagnostic(match["file"], int(match["line"]), column, severity, match["message"])
+
+        match = _TOOL_RE.match(line)
+        if match:
+            self._pending_rust = None
+            severity = "error" if match["severity"] == "fatal error" else match["severity"]
+            return Diagnostic(match["file"], None, None, severity, match["message"])
+        match = _MAKE_RE.match(line) or _LD_RE.match(line)
+        if match:
+            self._pending_rust = None
+            return Diagnostic(match["file"], None, None, "error", match["message"])
+
+        if self._pending_rust:
+            location = _RUST_LOCATION_RE.match(line)
+            if location:
+                severity, message = self._pending_rust
+                self._pending_rust = None
+                return Diagnostic(location["file"], int(location["line"]), int(location["column"]), severity, message)
+
+        header = _RUST_HEADER_RE.match(line)
+        if header and not header["message"].startswith(("aborting due to", "could not compile")) and " generated " not in header["message"]:
+            self._pending_rust = (header["severity"], header["message"])
+        return None
+
+
+class BuildResult:
+    def __init__(self, returncode, tail, diagnostics, counts, dropped_diagnostics, line_count, duration, cancelled=False):
+        self.returncode = returncode
+        self.cancelled = cancelled
+        self.tail = tail
+        self.diagnostics = diagnostics
+        self.counts = counts
+        self.dropped_diagnostics = dropped_diagnostics
+        self.line_count = line_count
+        self.duration = duration
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and not self.cancelled
+
+
+def _pump(stream, name, lines):
+    for raw in iter(stream.readline, b""):
+        lines.put((name, raw.decode("utf-8", errors="replace").rstrip("\r\n")))
+    stream.close()
+    lines.put((name, None))
+
+
+def run_build(command, cwd, on_line=None, on_diagnostic=None, env=None, tail_lines=DEFAULT_TAIL_LINES, max_diagnostics=DEFAULT_MAX_DIAGNOSTICS, cancel=None):
+    """
+    Runs a build command, streaming its output instead of buffering it.
+
+    stdout and stderr are drained by reader threads so neither pipe can fill
+    up and stall the compiler. Each line goes to `on_line(stream, line)` as
+    soon as it is read; only the last `tail_lines` lines and the first
+    `max_diagnostics` parsed diagnostics are kept, so memory stays bounded
+    however long the log gets.
+
+    The command runs in its own process group. Setting the `cancel` event
+    stops the build by terminating that group as a whole, so no compiler
+    jobs are left behind, and the result comes back with `cancelled` set;
+    an exception in the caller (Ctrl-C) terminates it the same way.
+    """
+    with tracing.subprocess_span(command, cwd=cwd) as span:
+        result = _run_build(command, cwd, on_line, on_diagnostic, env, tail_lines, max_diagnostics, cancel)
+        span.set(returncode=result.returncode, lines=result.line_count, cancelled=result.cancelled)
+    return result
+
+
+def _terminate_group(process, grace=2.0):
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            process.wait(timeout=grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def _run_build(command, cwd, on_line, on_diagnostic, env, tail_lines, max_diagnostics, cancel=None):
+    started = time.monotonic()
+    process = subprocess.Popen(command, cwd=cwd, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True)
+    lines = queue.Queue()
+    readers = [
+        threading.Thread(target=_pump, args=(process.stdout, "stdout", lines), daemon=True),
+        threading.Thread(target=_pump, args=(process.stderr, "stderr", lines), daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    tail = deque(maxlen=tail_lines)
+    parser = DiagnosticParser()
+    diagnostics = []
+    counts = {"error": 0, "warning": 0, "note": 0}
+    dropped = 0
+    line_count = 0
+    open_streams = len(readers)
+    cancelled = False
+    try:
+        while open_streams:
+            if cancel is not None and cancel.is_set() and not cancelled:
+                cancelled = True
+                _terminate_group(process)
+            try:
+                stream, line = lines.get(timeout=None if cancel is None else 0.05)
+            except queue.Empty:
+                continue
+            if line is None:
+                open_streams -= 1
+                continue
+            line_count += 1
+            tail.append((stream, line))
+            if on_line:
+                on_line(stream, line)
+            diagnostic = parser.feed(line)
+            if diagnostic:
+                counts[diagnostic.severity] = counts.get(diagnostic.severity, 0) + 1
+                if len(diagnostics) < max_diagnostics:
+                    diagnostics.append(diagnostic)
+                else:
+                    dropped += 1
+                if on_diagnostic:
+                    on_diagnostic(diagnostic)
+    except BaseException:
+        # Ctrl-C in the caller must not leave a detached build running.
+        _terminate_group(process)
+        raise
+
+    returncode = process.wait()
+    for reader in readers:
+        reader.join()
+    return BuildResult(returncode, list(tail), diagnostics, counts, dropped, line_count, time.monotonic() - started, cancelled)
+
+
+def format_diagnostic(diagnostic, root=None):
+    path = diagnostic.file
+    if diagnostic.line is None:
+        # A tool (gcc, ld, make) rather than a source file.
+        return path
+    if root and os.path.isabs(path):
+        path = os.path.relpath(path, root)
+    location = f"{path}:{diagnostic.line}"
+    if diagnostic.column is not None:
+        location += f":{diagnostic.column}"
+    return location
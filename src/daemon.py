@@ -0,0 +1,418 @@
+import json
+import os
+import sys
+
+PROTOCOL_VERSION = 1
+DEFAULT_IDLE_TIMEOUT = 3600
+# Unix socket paths are limited to 108 bytes including the terminator.
+MAX_SOCKET_PATH = 107
+# A daemon that does not accept within this long is wedged; run in-process.
+CONNECT_TIMEOUT = 1.0
+# Read-only commands the daemon answers alongside a running build.
+QUERY_COMMANDS = ("board", "check-tools")
+# What those commands read from the environment (besides EMBED_*).
+QUERY_ENV_KEYS = ("HOME", "PATH", "XDG_CACHE_HOME")
+
+
+def socket_path():
+    """
+    Where the daemon listens: EMBED_DAEMON_SOCKET, else the per-user runtime
+    dir, else the cache dir.
+    """
+    path = os.environ.get("EMBED_DAEMON_SOCKET")
+    if path:
+        return path
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, "embed-daemon.sock")
+    from cache import cache_dir
+
+    return os.path.join(cache_dir(), "daemon.sock")
+
+
+def _connect(path, timeout=None):
+    """
+    Returns a socket connected to a daemon owned by this user, or None.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if st.st_uid != os.getuid():
+        return None
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def _send(sock, message):
+    sock.sendall(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+
+
+def _wants_local(argv):
+    from tracing import split_global_options
+
+    options, command = split_global_options(argv)
+    # Installs can prompt for sudo and take minutes, and a monitor runs until
+    # interrupted, so they stay in the terminal.
+    if os.environ.get("EMBED_NO_DAEMON") or not command or command[0] in ("daemon", "install", "monitor"):
+        return True
+    # A traced run has to trace this process, not the daemon, and a watch
+    # or monitor loop would hold the daemon for as long as it runs.
+    return any(option.startswith("--trace") for option in options) or any(arg in ("--watch", "-w", "--monitor", "-m") for arg in command)
+
+
+def _is_query(argv):
+    from tracing import split_global_options
+
+    _options, command = split_global_options(argv)
+    return bool(command) and command[0] in QUERY_COMMANDS
+
+
+def _query_env(env):
+    return {key: value for key, value in env.items() if key.startswith("EMBED_") or key in QUERY_ENV_KEYS}
+
+
+def _replace_environ(env):
+    # Keys that keep their value are never removed on the way, so a query
+    # running alongside (see serve) never sees them missing.
+    for key in [key for key in os.environ if key not in env]:
+        del os.environ[key]
+    os.environ.update(env)
+
+
+def _terminal(stream):
+    try:
+        columns = os.get_terminal_size(stream.fileno()).columns
+    except (OSError, ValueError, AttributeError):
+        columns = None
+    try:
+        tty = stream.isatty()
+    except (ValueError, AttributeError):
+        tty = False
+    return {"columns": columns, "tty": tty}
+
+
+def forward(argv, path=None):
+    """
+    Runs an `embed` command line in the daemon, streaming its output here.
+
+    Returns the exit code, or None when no daemon is running (or it is busy
+    or asked to be bypassed) so the caller runs the command in-process instead.
+    """
+    if _wants_local(argv):
+        return None
+    sock = _connect(path or socket_path(), CONNECT_TIMEOUT)
+    if sock is None:
+        return None
+    received = False
+    try:
+        sock.settimeout(None)  # Builds can stay silent for a long time.
+        _send(sock, {"version": PROTOCOL_VERSION, "argv": argv, "cwd": os.getcwd(), "env": dict(os.environ), "terminal": _terminal(sys.stdout)})
+        for line in sock.makefile("rb"):
+            message = json.loads(line)
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+            elif "err" in message:
+                sys.stderr.write(message["err"])
+                sys.stderr.flush()
+            elif "exit" in message:
+                return message["exit"]
+            elif "local" in message:
+                return None if not received else 1
+            received = True
+    except (OSError, ValueError):
+        pass
+    except KeyboardInterrupt:
+        # Hanging up is what tells the daemon to cancel the command.
+        return 130
+    finally:
+        sock.close()
+    if not received:
+        return None
+    # Output was already shown, so re-running the command here could repeat its side effects.
+    print("embed: lost the connection to the daemon.", file=sys.stderr)
+    return 1
+
+
+def request(op, path=None, timeout=2.0):
+    """
+    Sends a control request ("status" or "stop"); returns the reply or None.
+    """
+    sock = _connect(path or socket_path(), timeout)
+    if sock is None:
+        return None
+    try:
+        _send(sock, {"version": PROTOCOL_VERSION, "op": op})
+        line = sock.makefile("rb").readline()
+        return json.loads(line) if line else None
+    except (OSError, ValueError):
+        return None
+    finally:
+        sock.close()
+
+
+class _StreamWriter:
+    """
+    Text stream that forwards everything written to the client as frames.
+    """
+
+    encoding = "utf-8"
+    errors = "replace"
+
+    def __init__(self, send, key, tty):
+        self._send = send
+        self._key = key
+        self._tty = tty
+
+    def write(self, text):
+        if text:
+            self._send({self._key: text})
+        return len(text)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return self._tty
+
+    def writable(self):
+        return True
+
+    def readable(self):
+        return False
+
+    def seekable(self):
+        return False
+
+
+def _source_stamp():
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    stamp = {}
+    for name in os.listdir(source_dir):
+        if name.endswith(".py"):
+            stamp[name] = os.stat(os.path.join(source_dir, name)).st_mtime_ns
+    return stamp
+
+
+def serve(run_command, path=None, idle_timeout=DEFAULT_IDLE_TIMEOUT, warm=None, log=None):
+    """
+    Serves `embed` commands on a Unix socket until stopped or idle.
+
+    `run_command(argv, stdout, stderr, terminal, cancel)` runs one command
+    line and returns its exit code; the `cancel` event is set when the
+    client hangs up (Ctrl-C), and output after that is dropped. Commands
+    share the process's cwd and environment, so they run one at a time; a
+    command arriving while another runs is handed back to its client to run
+    in-process rather than queued. Read-only queries (QUERY_COMMANDS) need
+    neither the cwd nor the swap, and run alongside whenever the client's
+    query environment matches the daemon's own; `run_command` must then
+    keep each thread's output apart. The daemon exits by itself after
+    `idle_timeout` seconds without a command, and hands clients back to
+    in-process execution once its own source files change.
+    """
+    import socket
+    import struct
+    import threading
+    import time
+
+    import resident
+    from watcher import Watcher
+
+    path = path or socket_path()
+    if len(os.fsencode(path)) > MAX_SOCKET_PATH:
+        raise OSError(f"Socket path is too long for a Unix socket: {path}")
+    if request("status", path) is not None:
+        raise OSError(f"A daemon is already listening on {path}.")
+    try:
+        os.unlink(path)  # Left over from a daemon that did not shut down cleanly.
+    except FileNotFoundError:
+        pass
+
+    watcher = Watcher(poll_interval=2.0)
+    resident.enable(watcher.add)
+
+    def invalidate_forever():
+        while True:
+            resident.invalidate(watcher.wait())
+
+    threading.Thread(target=invalidate_forever, name="embed-watcher", daemon=True).start()
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(old_umask)
+    server.listen(16)
+    server.settimeout(1.0)
+
+    started = time.time()
+    stamp = _source_stamp()
+    command_lock = threading.Lock()
+    state = {"last_used": time.monotonic(), "commands": 0, "stopping": False, "queries": 0, "diverged": False}
+    # Guards "queries" and "diverged": while a command runs with a query
+    # environment other than the daemon's, no query may run alongside.
+    queries = threading.Condition()
+    base_env = _query_env(os.environ)
+
+    if warm:
+        warm()
+    if log:
+        log(f"embed daemon {os.getpid()} listening on {path} ({watcher.backend} watcher)")
+
+    def status():
+        return {
+            "pid": os.getpid(),
+            "socket": path,
+            "uptime_s": round(time.time() - started, 1),
+            "commands": state["commands"],
+            "resident_entries": resident.size(),
+            "watcher": watcher.backend,
+            "busy": command_lock.locked(),
+            "queries": state["queries"],
+        }
+
+    def begin_query(env):
+        with queries:
+            if state["diverged"] or _query_env(env) != base_env:
+                return False
+            state["queries"] += 1
+            state["commands"] += 1
+            return True
+
+    def end_query():
+        with queries:
+            state["queries"] -= 1
+            state["last_used"] = time.monotonic()
+            queries.notify_all()
+
+    def handle(conn):
+        send_lock = threading.Lock()
+        cancel = threading.Event()
+
+        def send(message):
+            if cancel.is_set():
+                return
+            with send_lock:
+                try:
+                    _send(conn, message)
+                except OSError:
+                    cancel.set()
+
+        def watch_client():
+            # Clients send nothing after their request, so end of stream
+            # means this one hung up.
+            try:
+                while conn.recv(4096):
+                    pass
+            except OSError:
+                pass
+            cancel.set()
+
+        try:
+            if hasattr(socket, "SO_PEERCRED"):
+                _pid, uid, _gid = struct.unpack("3i", conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")))
+                if uid != os.getuid():
+                    return
+            line = conn.makefile("rb").readline()
+            if not line:
+                return
+            message = json.loads(line)
+            if message.get("version") != PROTOCOL_VERSION:
+                send({"local": "protocol"})
+                return
+            op = message.get("op")
+            if op == "status":
+                send(status())
+                return
+            if op == "stop":
+                state["stopping"] = True
+                send({"stopping": True})
+                return
+            if _source_stamp() != stamp:
+                # embed was updated underneath us: let the client run the new code.
+                state["stopping"] = True
+                send({"local": "restart"})
+                return
+            threading.Thread(target=watch_client, name="embed-client-watch", daemon=True).start()
+            terminal = message.get("terminal", {})
+            streams = _StreamWriter(send, "out", terminal.get("tty", False)), _StreamWriter(send, "err", terminal.get("tty", False))
+            if _is_query(message["argv"]) and begin_query(message["env"]):
+                try:
+                    code = run_command(message["argv"], *streams, terminal, cancel)
+                finally:
+                    end_query()
+                send({"exit": code})
+                return
+            if not command_lock.acquire(blocking=False):
+                # Waiting for the running command would take longer than
+                # starting cold in the client.
+                send({"local": "busy"})
+                return
+            try:
+                state["commands"] += 1
+                diverged = _query_env(message["env"]) != base_env
+                if diverged:
+                    with queries:
+                        state["diverged"] = True
+                        queries.wait_for(lambda: state["queries"] == 0)
+                saved_cwd = os.getcwd()
+                saved_env = dict(os.environ)
+                try:
+                    os.chdir(message["cwd"])
+                    _replace_environ(message["env"])
+                    code = run_command(message["argv"], *streams, terminal, cancel)
+                finally:
+                    _replace_environ(saved_env)
+                    os.chdir(saved_cwd)
+                    state["last_used"] = time.monotonic()
+                    if diverged:
+                        with queries:
+                            state["diverged"] = False
+            finally:
+                command_lock.release()
+            send({"exit": code})
+        except (OSError, ValueError, KeyError):
+            pass  # The client went away or sent garbage; nothing to answer.
+        finally:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    try:
+        while not state["stopping"]:
+            try:
+                conn, _address = server.accept()
+            except socket.timeout:
+                if not command_lock.locked() and not state["queries"] and time.monotonic() - state["last_used"] > idle_timeout:
+                    break
+                continue
+            conn.settimeout(None)
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+    finally:
+        server.close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        with command_lock:
+            pass  # Let a running command finish before the process exits.
+        with queries:
+            queries.wait_for(lambda: state["queries"] == 0)
+    if log:
+        log(f"embed daemon {os.getpid()} stopped after {state['commands']} command(s)")
@@ -0,0 +1,198 @@
+import hashlib
+import os
+import re
+import shlex
+import subprocess
+import tempfile
+
+from cache import cache_dir, load_json, write_json_atomic
+from elf import PT_LOAD, ElfFile
+from tracing import subprocess_span
+
+RECORD_VERSION = 1
+ERASED_BYTE = b"\xff"
+
+
+class FlashError(Exception):
+    pass
+
+
+def _int(value):
+    return int(value, 0) if isinstance(value, str) else int(value)
+
+
+def supports_delta(board_config):
+    # Without the flash size the image could not be bounded to flash.
+    return bool(board_config.get("upload_range") and board_config.get("sector_size") and board_config.get("flash_size"))
+
+
+def flat_image(elf_file, flash_base, sector_size, flash_size):
+    """
+    Lays the ELF's loadable contents out as they sit in flash.
+
+    Returns (address, image): the image starts and ends on a sector boundary
+    and gaps are filled with the erased value, like objcopy -O binary.
+    A segment with contents outside flash_base..flash_base + flash_size
+    (say, one loaded straight into RAM) is an error rather than padding.
+    """
+    elf = ElfFile(elf_file)
+    flash_end = flash_base + flash_size
+    chunks = []
+    for segment in elf.segments:
+        if segment.type != PT_LOAD or not segment.filesz:
+            continue
+        if segment.paddr < flash_base or segment.paddr + segment.filesz > flash_end:
+            raise FlashError(f"{elf_file} loads {segment.filesz} bytes at {segment.paddr:#x}, outside flash ({flash_base:#x}-{flash_end:#x}).")
+        chunks.append((segment.paddr, elf.data[segment.offset:segment.offset + segment.filesz]))
+    if not chunks:
+        raise FlashError(f"{elf_file} has nothing to flash at {flash_base:#x}-{flash_end:#x}.")
+    start = flash_base + (min(address for address, _data in chunks) - flash_base) // sector_size * sector_size
+    end = max(address + len(data) for address, data in chunks)
+    end = flash_base + -(-(end - flash_base) // sector_size) * sector_size
+    image = bytearray(ERASED_BYTE * (end - start))
+    for address, data in chunks:
+        image[address - start:address - start + len(data)] = data
+    return start, bytes(image)
+
+
+def sector_hashes(image, sector_size):
+    return [hashlib.sha256(image[offset:offset + sector_size]).hexdigest() for offset in range(0, len(image), sector_size)]
+
+
+def changed_ranges(record, address, hashes, sector_size):
+    """
+    Returns [(address, length)] of sector runs that differ from `record`.
+
+    Sectors the record does not cover, or a record for another layout,
+    count as changed; adjacent changed sectors are merged into one write.
+    """
+    known = {}
+    if record and record.get("sector_size") == sector_size:
+        for index, digest in enumerate(record.get("hashes", [])):
+            known[record["address"] + index * sector_size] = digest
+    ranges = []
+    for index, digest in enumerate(hashes):
+        sector_address = address + index * sector_size
+        if known.get(sector_address) == digest:
+            continue
+        if ranges and ranges[-1][0] + ranges[-1][1] == sector_address:
+            ranges[-1] = (ranges[-1][0], ranges[-1][1] + sector_size)
+        else:
+            ranges.append((sector_address, sector_size))
+    return ranges
+
+
+def _board_records(board_name, root=None):
+    # `embed upload` in Bash removes this directory too; keep the names in step.
+    return os.path.join(root or cache_dir("flash"), re.sub(r"[^A-Za-z0-9._-]", "-", board_name or "default"))
+
+
+def record_path(board_name, serial, root=None):
+    """
+    Returns where the sector hashes of the device with USB `serial` live.
+
+    Records follow the probe, not the port it happens to be plugged into.
+    """
+    device = hashlib.sha1(serial.encode()).hexdigest()
+    return os.path.join(_board_records(board_name, root), f"{device}.json")
+
+
+def forget_device(board_name, serial=None, root=None):
+    """
+    Drops what is known about a device's flash, or about every device of
+    the board when `serial` is None; the next upload writes everything.
+    """
+    if serial is not None:
+        paths = [record_path(board_name, serial, root)]
+    else:
+        directory = _board_records(board_name, root)
+        try:
+            paths = [os.path.join(directory, name) for name in os.listdir(directory)]
+        except OSError:
+            paths = []
+    for path in paths:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def run_template(template, values, run=subprocess.run):
+    """
+    Runs a board command template such as `st-flash write {bin} {address}`.
+
+    The template is split like a shell command line and the placeholders are
+    filled in per argument, so paths with spaces need no quoting. An
+    argument whose placeholder is None is left out, so `--serial={serial}`
+    drops away when the device's serial is unknown.
+    """
+    command = []
+    for token in shlex.split(template):
+        for name, value in values.items():
+            placeholder = "{" + name + "}"
+            if placeholder not in token:
+                continue
+            if value is None:
+                token = None
+                break
+            token = token.replace(placeholder, value)
+        if token is not None:
+            command.append(token)
+    try:
+        with subprocess_span(command):
+            result = run(command, capture_output=True, text=True)
+    except FileNotFoundError:
+        raise FlashError(f"Flash tool '{command[0]}' not found.") from None
+    if result.returncode != 0:
+        raise FlashError(f"{' '.join(command)} failed with error code {result.returncode}:\n{result.stdout}{result.stderr}")
+
+
+def flash_delta(elf_file, board_config, port=None, serial=None, full=False, record_root=None, run=subprocess.run):
+    """
+    Flashes only the sectors that changed since the last upload to this device.
+
+    The board config supplies `sector_size`, `flash_base`, `flash_size` and an
+    `upload_range` command template with {bin}, {address}, {size}, {port}
+    and {serial} placeholders. The record of sector hashes is kept per USB `serial` and
+    only written after every range has been flashed; a failed upload drops
+    it, so the next upload starts from a full write. Without a serial the
+    device cannot be told apart from others, so the whole image is written
+    and nothing is recorded.
+    """
+    sector_size = _int(board_config["sector_size"])
+    flash_base = _int(board_config.get("flash_base", 0))
+    address, image = flat_image(elf_file, flash_base, sector_size, _int(board_config["flash_size"]))
+    hashes = sector_hashes(image, sector_size)
+
+    path = record_path(board_config.get("name", ""), serial, record_root) if serial else None
+    record = None if full or path is None else load_json(path)
+    if record and record.get("version") != RECORD_VERSION:
+        record = None
+    ranges = changed_ranges(record, address, hashes, sector_size)
+
+    if ranges:
+        with tempfile.TemporaryDirectory(prefix="embed-flash-") as tmp_dir:
+            try:
+                for range_address, length in ranges:
+                    image_file = os.path.join(tmp_dir, f"{range_address:08x}.bin")
+                    with open(image_file, "wb") as f:
+                        f.write(image[range_address - address:range_address - address + length])
+                    values = {"bin": image_file, "address": f"{range_address:#x}", "size": str(length), "port": port or "", "serial": serial}
+                    run_template(board_config["upload_range"], values, run)
+            except FlashError:
+                if path:
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+                raise
+        if path:
+            write_json_atomic(path, {"version": RECORD_VERSION, "address": address, "sector_size": sector_size, "hashes": hashes})
+
+    return {
+        "ranges": ranges,
+        "bytes_written": sum(length for _address, length in ranges),
+        "image_size": len(image),
+        "sectors_changed": sum(length for _address, length in ranges) // sector_size,
+        "sectors_total": len(hashes),
+    }
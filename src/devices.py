@@ -0,0 +1,70 @@
+import os
+from collections import namedtuple
+
+Device = namedtuple("Device", "port usb_id serial")
+
+SERIAL_PREFIXES = ("ttyACM", "ttyUSB")
+
+
+def sysfs_root():
+    return os.environ.get("EMBED_SYSFS_ROOT", "/sys")
+
+
+def _read(path):
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _usb_device_dir(tty_dir, root):
+    """
+    Walks up from a tty's device link to the USB device that owns it.
+    """
+    path = os.path.realpath(os.path.join(tty_dir, "device"))
+    stop = os.path.realpath(root)
+    while path.startswith(stop) and path != stop:
+        if os.path.exists(os.path.join(path, "idVendor")) and os.path.exists(os.path.join(path, "idProduct")):
+            return path
+        path = os.path.dirname(path)
+    return None
+
+
+def discover_devices(root=None):
+    """
+    Lists USB serial devices from sysfs as Device(port, "vid:pid", serial).
+    """
+    root = root or sysfs_root()
+    tty_class = os.path.join(root, "class", "tty")
+    try:
+        names = sorted(name for name in os.listdir(tty_class) if name.startswith(SERIAL_PREFIXES))
+    except OSError:
+        return []
+    devices = []
+    for name in names:
+        usb_dir = _usb_device_dir(os.path.join(tty_class, name), root)
+        if not usb_dir:
+            continue
+        usb_id = f"{_read(os.path.join(usb_dir, 'idVendor'))}:{_read(os.path.join(usb_dir, 'idProduct'))}".lower()
+        devices.append(Device(f"/dev/{name}", usb_id, _read(os.path.join(usb_dir, "serial"))))
+    return devices
+
+
+def match_devices(devices, board_config):
+    usb_ids = {usb_id.lower() for usb_id in board_config.get("usb_ids", [])}
+    return [device for device in devices if device.usb_id in usb_ids]
+
+
+def device_for_port(port, board_config=None, devices=None):
+    """
+    Returns the Device behind `port` (a /dev path or a link to one), or
+    without a port the only attached device matching `board_config`.
+    Returns None when that is not known.
+    """
+    devices = discover_devices() if devices is None else devices
+    if port:
+        target = os.path.realpath(port)
+        return next((device for device in devices if device.port == port or os.path.realpath(device.port) == target), None)
+    matching = match_devices(devices, board_config or {})
+    return matching[0] if len(matching) == 1 else None
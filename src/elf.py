@@ -0,0 +1,108 @@
+import struct
+from collections import namedtuple
+
+SHT_NOBITS = 8
+SHT_SYMTAB = 2
+SHF_WRITE = 0x1
+SHF_ALLOC = 0x2
+SHF_EXECINSTR = 0x4
+PT_LOAD = 1
+STT_OBJECT = 1
+STT_FUNC = 2
+
+Section = namedtuple("Section", "name type flags addr offset size link")
+Segment = namedtuple("Segment", "type offset vaddr paddr filesz memsz")
+Symbol = namedtuple("Symbol", "name value size type section")
+
+
+class ElfError(Exception):
+    pass
+
+
+class ElfFile:
+    """
+    Minimal ELF reader: section headers, program headers and the symbol table.
+
+    Enough to size firmware images without binutils; both 32- and 64-bit,
+    little- and big-endian files are understood.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = f.read()
+        if len(self.data) < 16 or self.data[:4] != b"\x7fELF":
+            raise ElfError(f"{path} is not an ELF file.")
+        self.is_64 = self.data[4] == 2
+        self.endian = "<" if self.data[5] == 1 else ">"
+        self._parse_header()
+        self.sections = self._parse_sections()
+        self.segments = self._parse_segments()
+
+    def _unpack(self, fmt, offset):
+        try:
+            return struct.unpack_from(self.endian + fmt, self.data, offset)
+        except struct.error:
+            raise ElfError(f"{self.path} is truncated.") from None
+
+    def _parse_header(self):
+        if self.is_64:
+            fields = self._unpack("HHIQQQIHHHHHH", 16)
+        else:
+            fields = self._unpack("HHIIIIIHHHHHH", 16)
+        (self.file_type, self.machine, _version, self.entry, self.phoff, self.shoff, _flags,
+         _ehsize, self.phentsize, self.phnum, self.shentsize, self.shnum, self.shstrndx) = fields
+
+    def _parse_sections(self):
+        fmt = "IIQQQQIIQQ" if self.is_64 else "IIIIIIIIII"
+        raw = [self._unpack(fmt, self.shoff + i * self.shentsize) for i in range(self.shnum)]
+        names_offset = raw[self.shstrndx][4] if self.shstrndx < len(raw) else 0
+        return [
+            Section(self._string(names_offset + name), sh_type, flags, addr, offset, size, link)
+            for name, sh_type, flags, addr, offset, size, link, *_rest in raw
+        ]
+
+    def _parse_segments(self):
+        segments = []
+        for i in range(self.phnum):
+            offset = self.phoff + i * self.phentsize
+            if self.is_64:
+                p_type, _flags, p_offset, vaddr, paddr, filesz, memsz, _align = self._unpack("IIQQQQQQ", offset)
+            else:
+                p_type, p_offset, vaddr, paddr, filesz, memsz, _flags, _align = self._unpack("IIIIIIII", offset)
+            segments.append(Segment(p_type, p_offset, vaddr, paddr, filesz, memsz))
+        return segments
+
+    def _string(self, offset):
+        end = self.data.find(b"\0", offset)
+        return self.data[offset:end if end >= 0 else len(self.data)].decode("utf-8", errors="replace")
+
+    def section_data(self, section):
+        if section.type == SHT_NOBITS:
+            return b""
+        return self.data[section.offset:section.offset + section.size]
+
+    def load_address(self, section):
+        """
+        Returns where the section is stored (its LMA), e.g. flash for .data.
+        """
+        if section.type != SHT_NOBITS:
+            for segment in self.segments:
+                if segment.type == PT_LOAD and segment.offset <= section.offset < segment.offset + segment.filesz:
+                    return segment.paddr + section.offset - segment.offset
+        return section.addr
+
+    def symbols(self):
+        symtab = next((section for section in self.sections if section.type == SHT_SYMTAB), None)
+        if symtab is None:
+            return []
+        strtab_offset = self.sections[symtab.link].offset
+        entry_size = 24 if self.is_64 else 16
+        symbols = []
+        for offset in range(symtab.offset + entry_size, symtab.offset + symtab.size, entry_size):
+            if self.is_64:
+                name, info, _other, shndx, value, size = self._unpack("IBBHQQ", offset)
+            else:
+                name, value, size, info, _other, shndx = self._unpack("IIIBBH", offset)
+            symbols.append(Symbol(self._string(strtab_offset + name), value, size, info & 0xF, shndx))
+        return symbols
@@ -0,0 +1,69 @@
+import json
+import sys
+
+
+def _parse_board_query(argv):
+    """
+    Returns (command, argument, limit) for `board <cmd> [arg] --json` argv,
+    or None for anything the full CLI has to handle.
+    """
+    if len(argv) < 2 or argv[0] != "board" or "--json" not in argv:
+        return None
+    command = argv[1]
+    rest = [arg for arg in argv[2:] if arg != "--json"]
+    limit = 10
+    if command == "search":
+        positional = []
+        i = 0
+        while i < len(rest):
+            arg = rest[i]
+            if arg in ("--limit", "-n") and i + 1 < len(rest):
+                limit = rest[i + 1]
+                i += 2
+                continue
+            if arg.startswith("--limit="):
+                limit = arg.split("=", 1)[1]
+            elif arg.startswith("-"):
+                return None
+            else:
+                positional.append(arg)
+            i += 1
+        if len(positional) != 1 or not str(limit).isdigit():
+            return None
+        return command, positional[0], int(limit)
+    if command == "tools" and len(rest) == 1 and not rest[0].startswith("-"):
+        return command, rest[0], limit
+    if command == "list" and not rest:
+        return command, None, limit
+    return None
+
+
+def run_fast_path(argv):
+    """
+    Answers `board list/search/tools --json` without importing typer or rich.
+
+    These are the queries editor and git hooks issue; everything else,
+    including `--help`, returns None and goes through the typer app.
+    """
+    query = _parse_board_query(argv)
+    if query is None:
+        return None
+    command, argument, limit = query
+
+    from board_index import board_summary, find_board, load_board_index
+
+    index = load_board_index()
+    if command == "list":
+        print(json.dumps([board_summary(entry) for entry in index["boards"]], indent=2))
+    elif command == "search":
+        from board_search import load_search_index
+
+        results = load_search_index(index).search(argument, limit=limit)
+        print(json.dumps([dict(board, score=score) for score, board in results], indent=2))
+    else:
+        entry = find_board(index, argument)
+        if entry is None:
+            print(f"Board '{argument}' not found in project configurations.", file=sys.stderr)
+            return 1
+        print(json.dumps(board_summary(entry), indent=2))
+    return 0
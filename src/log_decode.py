@@ -0,0 +1,245 @@
+import re
+import struct
+from collections import namedtuple
+
+from elf import SHF_ALLOC, SHT_NOBITS, ElfFile
+
+# Deferred ("binary") logging keeps format strings in the firmware image and
+# sends only their address and raw arguments. Each frame is COBS-encoded and
+# terminated by a zero byte; decoded, it is
+#
+#   level: u8 | format address: u32 | timestamp in microseconds: u32 | arguments
+#
+# all little-endian. Arguments are packed the way C varargs promote them on
+# a 32-bit target: 4 bytes for int-sized conversions (including %c and %p),
+# 8 for %ll*/%j* and doubles (%f, %e, %g), and %s as a u8 length followed by
+# the bytes.
+LEVELS = ("error", "warn", "info", "debug", "trace")
+MAX_FRAME_SIZE = 4096
+
+LogRecord = namedtuple("LogRecord", "level timestamp text")
+
+_HEADER = struct.Struct("<BII")
+_CONVERSION_RE = re.compile(r"%(?P<flags>[-+ #0]*)(?P<width>\d*)(?P<precision>\.\d*)?(?P<length>hh|h|ll|l|j|z|t|L)?(?P<type>[diouxXcspfFeEgG%])")
+
+
+class FrameError(Exception):
+    pass
+
+
+def cobs_encode(data):
+    """
+    COBS-encodes `data` so it contains no zero byte; the caller appends the
+    zero that ends the frame.
+    """
+    out = bytearray()
+    block = bytearray()
+    for byte in data:
+        if byte == 0:
+            out.append(len(block) + 1)
+            out += block
+            block.clear()
+            continue
+        block.append(byte)
+        if len(block) == 254:
+            out.append(255)
+            out += block
+            block.clear()
+    out.append(len(block) + 1)
+    out += block
+    return bytes(out)
+
+
+def cobs_decode(data):
+    out = bytearray()
+    index = 0
+    while index < len(data):
+        code = data[index]
+        end = index + code
+        if code == 0 or end > len(data):
+            raise FrameError("corrupt COBS frame")
+        out += data[index + 1:end]
+        index = end
+        if code < 255 and index < len(data):
+            out.append(0)
+    return bytes(out)
+
+
+class ElfStrings:
+    """
+    Looks up NUL-terminated strings by address in an ELF's loaded sections.
+    """
+
+    def __init__(self, path):
+        self._elf = ElfFile(path)
+        self._sections = [
+            (section.addr, section.addr + section.size, self._elf.section_data(section))
+            for section in self._elf.sections
+            if section.flags & SHF_ALLOC and section.type != SHT_NOBITS and section.size
+        ]
+        self._cache = {}
+
+    def string_at(self, address):
+        if address in self._cache:
+            return self._cache[address]
+        value = None
+        for start, end, data in self._sections:
+            if start <= address < end:
+                offset = address - start
+                terminator = data.find(b"\0", offset)
+                if terminator >= 0:
+                    value = data[offset:terminator].decode("utf-8", errors="replace")
+                break
+        self._cache[address] = value
+        return value
+
+
+def _compile_format(fmt):
+    """
+    Splits a printf format into literal text and (python spec, type, size).
+    """
+    pieces = []
+    position = 0
+    for match in _CONVERSION_RE.finditer(fmt):
+        pieces.append(fmt[position:match.start()])
+        position = match.end()
+        conversion = match["type"]
+        if conversion == "%":
+            pieces.append("%")
+            continue
+        spec = "%" + match["flags"] + match["width"] + (match["precision"] or "")
+        if conversion == "s":
+            size = None
+        elif conversion in "fFeEgG" or match["length"] in ("ll", "j"):
+            size = 8
+        else:
+            size = 4
+        if conversion == "p":
+            spec, conversion = "0x%08x", "x"
+        elif conversion == "u":
+            spec += "d"
+        else:
+            spec += conversion
+        pieces.append((spec, conversion, size))
+    pieces.append(fmt[position:])
+    return pieces
+
+
+def format_arguments(fmt_pieces, payload):
+    out = []
+    offset = 0
+    for piece in fmt_pieces:
+        if isinstance(piece, str):
+            out.append(piece)
+            continue
+        spec, conversion, size = piece
+        try:
+            if size is None:
+                length = payload[offset]
+                if offset + 1 + length > len(payload):
+                    raise IndexError
+                value = payload[offset + 1:offset + 1 + length].decode("utf-8", errors="replace")
+                offset += 1 + length
+            elif conversion in "fFeEgG":
+                (value,) = struct.unpack_from("<d", payload, offset)
+                offset += 8
+            else:
+                if offset + size > len(payload):
+                    raise IndexError
+                value = int.from_bytes(payload[offset:offset + size], "little", signed=conversion in "di")
+                offset += size
+        except (IndexError, struct.error):
+            raise FrameError("frame is shorter than its format string") from None
+        try:
+            out.append(spec % value)
+        except (ValueError, OverflowError):
+            raise FrameError(f"argument {value!r} does not fit {spec}") from None
+    if offset != len(payload):
+        raise FrameError("frame has trailing bytes")
+    return "".join(out)
+
+
+class TextDecoder:
+    """
+    Splits plain text output into lines as it arrives.
+    """
+
+    def __init__(self, max_line=MAX_FRAME_SIZE):
+        self._pending = b""
+        self._max_line = max_line
+
+    def feed(self, data):
+        data = self._pending + data
+        lines = data.split(b"\n")
+        self._pending = lines.pop()
+        if len(self._pending) > self._max_line:
+            lines.append(self._pending)
+            self._pending = b""
+        return [LogRecord(None, None, line.rstrip(b"\r").decode("utf-8", errors="replace")) for line in lines]
+
+    def flush(self):
+        pending, self._pending = self._pending, b""
+        return self.feed(pending + b"\n") if pending else []
+
+
+class FrameDecoder:
+    """
+    Turns a stream of zero-terminated binary log frames into LogRecords,
+    expanding each format string from the firmware's ELF.
+
+    Frames that cannot be decoded (noise, a stale ELF, text printed before
+    the logger started) come back with level "raw" and the bytes as text.
+    """
+
+    def __init__(self, strings):
+        self._strings = strings
+        self._formats = {}
+        self._pending = bytearray()
+
+    def feed(self, data):
+        records = []
+        start = 0
+        while True:
+            end = data.find(b"\0", start)
+            if end < 0:
+                break
+            if self._pending:
+                self._pending += data[start:end]
+                frame = bytes(self._pending)
+                self._pending.clear()
+            else:
+                frame = data[start:end]
+            if frame:
+                records.append(self._decode(frame))
+            start = end + 1
+        self._pending += data[start:]
+        if len(self._pending) > MAX_FRAME_SIZE:
+            records.append(self._raw(bytes(self._pending)))
+            self._pending.clear()
+        return records
+
+    def flush(self):
+        pending = bytes(self._pending)
+        self._pending.clear()
+        return [self._decode(pending)] if pending else []
+
+    def _decode(self, frame):
+        try:
+            payload = cobs_decode(frame)
+            if len(payload) < _HEADER.size:
+                raise FrameError("frame is too short")
+            level, address, timestamp = _HEADER.unpack_from(payload)
+            pieces = self._formats.get(address)
+            if pieces is None:
+                fmt = self._strings.string_at(address)
+                if fmt is None:
+                    raise FrameError(f"no format string at {address:#x}")
+                pieces = self._formats[address] = _compile_format(fmt)
+            text = format_arguments(pieces, payload[_HEADER.size:])
+        except FrameError:
+            return self._raw(frame)
+        return LogRecord(LEVELS[level] if level < len(LEVELS) else str(level), timestamp, text)
+
+    @staticmethod
+    def _raw(frame):
+        return LogRecord("raw", None, frame.decode("utf-8", errors="replace"))
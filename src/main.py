@@ -1,19 +1,133 @@
-import typer
-from rich.console import Console
-from typing_extensions import Annotated
-import subprocess
+# Imported first so trace timestamps start before anything else loads.
+import tracing
 import os
-import shutil
 import json
 import sys
-import re
-from rich.table import Table
-from rich.panel import Panel
 
-app = typer.Typer(help="A beautiful CLI for embedded development.")
+if __name__ == "__main__":
+    tracing.configure(sys.argv[1:])
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Hook-friendly `board ... --json` queries are answered before typer and
+    # rich are imported, and before even looking for a daemon: they are
+    # cheaper to answer here than to forward.
+    from fastpath import run_fast_path
+
+    with tracing.span("fast path"):
+        _fast_exit_code = run_fast_path(sys.argv[1:])
+    if _fast_exit_code is not None:
+        sys.exit(_fast_exit_code)
+
+    # A running `embed daemon` has everything warm already; without one the
+    # command runs here as usual.
+    from daemon import forward
+
+    _daemon_exit_code = forward(sys.argv[1:])
+    if _daemon_exit_code is not None:
+        sys.exit(_daemon_exit_code)
+
+with tracing.span("import typer"):
+    import threading
+    from collections.abc import MutableMapping
+
+    import typer
+    from typer.core import TyperGroup
+    from typing_extensions import Annotated
+
+
+class _LazyCommands(MutableMapping):
+    """
+    Subcommands of the root group, converted from their typer definitions
+    only when looked up.
+
+    typer turns every command's signature into click parameters up front,
+    a cost that grows with each command; a run only needs the one it
+    invokes. Help and completion still list (and so build) them all.
+    """
+
+    def __init__(self, builders, built):
+        self._builders = builders
+        self._built = dict(built)
+
+    def __getitem__(self, name):
+        if name not in self._built:
+            self._built[name] = self._builders[name]()
+        return self._built[name]
+
+    def __setitem__(self, name, command):
+        self._built[name] = command
+
+    def __delitem__(self, name):
+        self._builders.pop(name, None)
+        self._built.pop(name, None)
+
+    def __iter__(self):
+        return iter(dict.fromkeys([*self._builders, *self._built]))
+
+    def __len__(self):
+        return len(dict.fromkeys([*self._builders, *self._built]))
+
+
+class _LazyGroup(TyperGroup):
+    # Command name -> builder of its click command; see _defer_commands().
+    deferred = {}
+
+    def __init__(self, *args, commands=None, **kwargs):
+        super().__init__(*args, commands=_LazyCommands(self.deferred, commands or {}), **kwargs)
+
+
+app = typer.Typer(help="A beautiful CLI for embedded development.", cls=_LazyGroup)
 board_app = typer.Typer(help="Commands for managing development boards.")
 app.add_typer(board_app, name="board")
-console = Console()
+daemon_app = typer.Typer(help="Keep a background process with warm state to answer commands faster.")
+app.add_typer(daemon_app, name="daemon")
+
+
+# In the daemon, the console, streams and cancel event of the command
+# running on each thread (see _run_daemon_command).
+_daemon_local = threading.local()
+
+
+class _LazyConsole:
+    """
+    Defers importing rich.console until something is actually printed.
+    """
+
+    _console = None
+
+    def __getattr__(self, name):
+        target = getattr(_daemon_local, "console", None)
+        if target is None:
+            if _LazyConsole._console is None:
+                with tracing.span("import rich"):
+                    from rich.console import Console
+
+                    _LazyConsole._console = Console()
+            target = _LazyConsole._console
+        attribute = getattr(target, name)
+        if name == "print" and tracing.enabled():
+            def traced_print(*args, **kwargs):
+                with tracing.span("render", category="render"):
+                    return attribute(*args, **kwargs)
+            return traced_print
+        return attribute
+
+
+console = _LazyConsole()
+
+
+# rich.panel and rich.table are only imported when a command renders one.
+def Panel(*args, **kwargs):
+    from rich.panel import Panel
+
+    return Panel(*args, **kwargs)
+
+
+def Table(*args, **kwargs):
+    from rich.table import Table
+
+    return Table(*args, **kwargs)
+
 
 def _find_project_root():
     current_dir = os.getcwd()
@@ -25,214 +139,188 @@ def _find_project_root():
             return None
         current_dir = parent_dir
 
-def _get_project_language():
-    board_file = ".board.json"
-    if not os.path.exists(board_file):
-        console.print(Panel("[bold red]Error: Not in a project directory. '.board.json' not found.[/bold red]", title="[bold red]Project Error[/bold red]", border_style="red"))
+def _named_project_root(name):
+    from project_index import ProjectLookupError, find_project
+
+    try:
+        return find_project(name)["path"]
+    except ProjectLookupError as e:
+        console.print(Panel(f"[bold red]Error: {e}[/bold red]", title="[bold red]Project Error[/bold red]", border_style="red"))
         raise typer.Exit(code=1)
-    with open(board_file, "r") as f:
-        config = json.load(f)
-    return config.get("language")
-
-def _generate_rust_module(module_name, module_type, connection_type):
-    content = f"// {module_name} {module_type} module (Rust) - {connection_type} connection\n"
-    content += f"pub struct {module_name.capitalize()}<'a> {{\n"
-    content += f"    // Add {connection_type} specific fields here\n"
-    content += f"}}\n\n"
-    content += f"impl<'a> {module_name.capitalize()}<'a> {{\n"
-    content += f"    pub fn new() -> Self {{\n"
-    content += f"        // Initialize {module_name} module\n"
-    content += f"        Self {{}}\n"
-    content += f"    }}\n\n"
-    content += f"    pub fn read(&mut self) -> u32 {{\n"
-    content += f"        // Read data from {module_name}\n"
-    content += f"        0\n"
-    content += f"    }}\n\n"
-    content += f"    pub fn write(&mut self, value: u32) {{\n"
-    content += f"        // Write data to {module_name}\n"
-    content += f"    }}\n"
-    content += f"}}\n"
-    return content
-
-def _generate_c_module(module_name, module_type, connection_type):
-    content = f"// {module_name} {module_type} module (C) - {connection_type} connection\n"
-    content += f"#ifndef {module_name.upper()}_H\n"
-    content += f"#define {module_name.upper()}_H\n\n"
-    content += f"#include <stdint.h>\n\n"
-    content += f"typedef struct {{\n"
-    content += f"    // Add {connection_type} specific fields here\n"
-    content += f"}} {module_name.capitalize()};\n\n"
-    content += f"void {module_name.capitalize()}_init({module_name.capitalize()}* module);\n"
-    content += f"uint32_t {module_name.capitalize()}_read({module_name.capitalize()}* module);\n"
-    content += f"void {module_name.capitalize()}_write({module_name.capitalize()}* module, uint32_t value);\n\n"
-    content += f"#endif // {module_name.upper()}_H\n\n"
-
-    impl_content = f"// {module_name} {module_type} module (C) implementation\n"
-    impl_content += f"#include \"{module_name}.h\"\n\n"
-    impl_content += f"void {module_name.capitalize()}_init({module_name.capitalize()}* module) {{\n"
-    impl_content += f"    // Initialize {module_name} module\n"
-    impl_content += f"}}\n\n"
-    impl_content += f"uint32_t {module_name.capitalize()}_read({module_name.capitalize()}* module) {{\n"
-    impl_content += f"    // Read data from {module_name}\n"
-    impl_content += f"    return 0;\n"
-    impl_content += f"}}\n\n"
-    impl_content += f"void {module_name.capitalize()}_write({module_name.capitalize()}* module, uint32_t value) {{\n"
-    content += f"    // Write data to {module_name}\n"
-    content += f"}}\n"
-
-    return content, impl_content
+
+def _load_board_config(project_root):
+    import resident
+
+    path = os.path.join(project_root, ".board.json")
+
+    def load():
+        with open(path, "r") as f:
+            return json.load(f)
+
+    st = os.stat(path)
+    return resident.memo(("board_config", path), load, stamp=(st.st_mtime_ns, st.st_size, st.st_ino))
+
+def _project_context(ctx, project=None):
+    """
+    Resolves the enclosing project on first use and caches it on ctx.obj.
+
+    Only commands that work on a project call this, so `--help` and the
+    `board` commands never walk the directory tree or parse `.board.json`.
+    `project` (from -P) names a project in the workspace instead.
+    """
+    if "project_root" not in ctx.obj:
+        with tracing.span("find project root"):
+            project_root = _named_project_root(project) if project else _find_project_root()
+        board_config = None
+        if project_root:
+            with tracing.span("load .board.json"):
+                board_config = _load_board_config(project_root)
+        ctx.obj["project_root"] = project_root
+        ctx.obj["board_config"] = board_config
+    return ctx.obj["project_root"], ctx.obj["board_config"]
 
 @app.command()
 def new(
-    project_name: Annotated[str, typer.Argument(help="Name of the new project.")],
+    project_name: Annotated[str, typer.Argument(help="Name of the new project.")] = None,
     language: Annotated[str, typer.Option("--lang", "-l", help="Programming language (rust or c).")] = "c",
     board: Annotated[str, typer.Option("--board", "-b", help="Target board (e.g., esp32dev, stm32f103c8).")] = "tivac-launchpad",
+    batch: Annotated[str, typer.Option("--batch", help="JSON file listing projects to create, each with name and optional lang and board.")] = None,
+    jobs: Annotated[int, typer.Option("--jobs", "-j", help="Projects to create at the same time with --batch.")] = None,
+    hardlink: Annotated[bool, typer.Option("--hardlink", help="Hardlink static template files instead of copying them (edits then change the template too).")] = False,
 ):
     """
     Initializes a new embedded project.
     """
-    console.print(Panel(f"[bold green]Creating new project: {project_name}[/bold green]\n  Language: {language}\n  Board: {board}", title="[bold blue]Project Initialization[/bold blue]", border_style="blue"))
+    from scaffold import ScaffoldError, load_batch_spec, render_batch, render_project
 
-    project_path = os.path.join(os.getcwd(), project_name)
-    if os.path.exists(project_path):
-        console.print(Panel(f"[bold red]Error: Project directory '{project_name}' already exists.[/bold red]", title="[bold red]Error[/bold red]", border_style="red"))
-        raise typer.Exit(code=1)
-
-    template_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", language)
-    if not os.path.exists(template_path):
-        console.print(Panel(f"[bold red]Error: Template for language '{language}' not found.[/bold red]", title="[bold red]Error[/bold red]", border_style="red"))
-        raise typer.Exit(code=1)
-
-    if language == "rust":
-        # Use cargo new to create a proper Rust project structure
+    link = "hardlink" if hardlink else "reflink"
+    if batch:
         try:
-            subprocess.run(["cargo", "new", project_path], check=True, capture_output=True, text=True)
-            console.print(Panel(f"[bold green]Created new Cargo project at {project_path}[/bold green]", title="[bold green]Cargo Project Creation[/bold green]", border_style="green"))
-            shutil.copytree(os.path.join(os.path.dirname(os.path.dirname(__file__)), "templates", language, "embedded_template"), project_path, dirs_exist_ok=True)
-            # Replace placeholder in Cargo.toml
-            cargo_toml_path = os.path.join(project_path, "Cargo.toml")
-            with open(cargo_toml_path, "r") as f:
-                content = f.read()
-            content = content.replace("{{project_name}}", project_name)
-            with open(cargo_toml_path, "w") as f:
-                f.write(content)
-        except subprocess.CalledProcessError as e:
-            console.print(Panel(f"[bold red]Error creating Cargo project: {e.stderr}[/bold red]", title="[bold red]Cargo Error[/bold red]", border_style="red"))
+            projects = load_batch_spec(batch)
+        except ScaffoldError as e:
+            console.print(Panel(f"[bold red]Error: {e}[/bold red]", title="[bold red]Error[/bold red]", border_style="red"))
             raise typer.Exit(code=1)
-    elif language == "c":
-        try:
-            shutil.copytree(template_path, project_path)
-            console.print(Panel(f"[bold green]Copied {language} template to {project_path}[/bold green]", title="[bold green]Template Copy[/bold green]", border_style="green"))
-        except Exception as e:
-            console.print(Panel(f"[bold red]Error copying C template: {e}[/bold red]", title="[bold red]Template Copy Error[/bold red]", border_style="red"))
+
+        with console.status(f"[bold blue]Creating {len(projects)} projects...[/bold blue]"):
+            results = render_batch(projects, os.getcwd(), language, board, link=link, jobs=jobs)
+
+        table = Table(title="[bold magenta]Created Projects[/bold magenta]")
+        table.add_column("Project", style="cyan", no_wrap=True)
+        table.add_column("Language")
+        table.add_column("Board", style="cyan")
+        table.add_column("Status")
+        for result in results:
+            status_text = "[bold green]✔ Created[/bold green]" if result["ok"] else f"[bold red]✖ {result['error']}[/bold red]"
+            table.add_row(result["name"], result["language"], result["board"], status_text)
+        console.print(table)
+        if not all(result["ok"] for result in results):
             raise typer.Exit(code=1)
+        return
 
-    try:
-        board_config = {
-            "name": board,
-            "language": language
-        }
-        with open(os.path.join(project_path, ".board.json"), "w") as f:
-            json.dump(board_config, f, indent=2)
-        console.print(Panel(f"[bold green]Created .board.json in {project_path}[/bold green]", title="[bold green]Board Configuration[/bold green]", border_style="green"))
+    if not project_name:
+        console.print(Panel("[bold red]Error: Pass a project name, or --batch spec.json.[/bold red]", title="[bold red]Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+
+    console.print(Panel(f"[bold green]Creating new project: {project_name}[/bold green]\n  Language: {language}\n  Board: {board}", title="[bold blue]Project Initialization[/bold blue]", border_style="blue"))
 
-        console.print(Panel(f"[bold green]Project '{project_name}' initialized successfully![/bold green]", title="[bold green]Success[/bold green]", border_style="green"))
-    except Exception as e:
-        console.print(Panel(f"[bold red]Error initializing project: {e}[/bold red]", title="[bold red]Error[/bold red]", border_style="red"))
+    project_path = os.path.join(os.getcwd(), project_name)
+    board_config = {
+        "name": board,
+        "language": language
+    }
+    try:
+        counts = render_project(language, project_path, {"project_name": project_name, "board": board, "language": language}, board_config, link=link)
+    except (ScaffoldError, OSError) as e:
+        console.print(Panel(f"[bold red]Error: {e}[/bold red]", title="[bold red]Error[/bold red]", border_style="red"))
         raise typer.Exit(code=1)
 
+    console.print(f"[green]Rendered {counts['rendered']}, linked {counts['linked']} and copied {counts['copied']} template file(s); created .board.json[/green]")
+    console.print(Panel(f"[bold green]Project '{project_name}' initialized successfully![/bold green]", title="[bold green]Success[/bold green]", border_style="green"))
+
 @app.command()
 def add_module(
-    module_name: Annotated[str, typer.Argument(help="Name of the new module.")],
-    module_type: Annotated[str, typer.Option("--type", "-t", help="Type of module (e.g., sensor, actuator).")],
-    connection_type: Annotated[str, typer.Option("--conn", "-c", help="Connection type (e.g., I2C, SPI, GPIO).")],
+    ctx: typer.Context,
+    project: Annotated[str, typer.Option("--project", "-P", help="Project to use, by name or path within the workspace (see 'embed projects'), instead of the current one.")] = None,
+    module_name: Annotated[str, typer.Argument(help="Name of the new module.")] = None,
+    module_type: Annotated[str, typer.Option("--type", "-t", help="Type of module (e.g., sensor, actuator).")] = None,
+    connection_type: Annotated[str, typer.Option("--conn", "-c", help="Connection type (e.g., I2C, SPI, GPIO).")] = None,
+    manifest: Annotated[str, typer.Option("--from", help="JSON file listing modules to add, each with name, type and conn.")] = None,
+    force: Annotated[bool, typer.Option("--force", help="Overwrite existing module files that differ from the template.")] = False,
 ):
     """
-    Adds a new module (sensor or actuator) to the current project.
+    Adds new modules (sensors or actuators) to the current project.
     """
-    console.print(Panel(f"[bold green]Adding new module: {module_name}[/bold green]\n  Type: {module_type}\n  Connection: {connection_type}", title="[bold blue]Module Addition[/bold blue]", border_style="blue"))
+    from module_gen import ModuleError, apply_writes, load_manifest, plan_modules
 
-    language = _get_project_language()
+    project_root, board_config = _project_context(ctx, project)
+    if not project_root:
+        console.print(Panel("[bold red]Error: Not in a project directory. '.board.json' not found.[/bold red]", title="[bold red]Project Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+    language = board_config.get("language")
     if not language:
+        console.print(Panel("[bold red]Error: Project language not specified in .board.json.[/bold red]", title="[bold red]Configuration Error[/bold red]", border_style="red"))
         raise typer.Exit(code=1)
 
-    module_dir = os.path.join(os.getcwd(), "modules")
-    os.makedirs(module_dir, exist_ok=True)
-
-    if language == "rust":
-        module_file_dir = os.path.join(os.getcwd(), "src") # Rust modules go directly in src/
-        os.makedirs(module_file_dir, exist_ok=True)
-        file_name = os.path.join(module_file_dir, f"{module_name}.rs")
-        content = _generate_rust_module(module_name, module_type, connection_type)
-        with open(file_name, "w") as f:
-            f.write(content)
-        console.print(Panel(f"[bold green]Created Rust module file: {file_name}[/bold green]", title="[bold green]File Creation[/bold green]", border_style="green"))
-
-        # Add module declaration to src/main.rs or src/lib.rs
-        main_rs_path = os.path.join(os.getcwd(), "src", "main.rs")
-        lib_rs_path = os.path.join(os.getcwd(), "src", "lib.rs")
-        target_rs_file = None
-
-        if os.path.exists(main_rs_path):
-            target_rs_file = main_rs_path
-        elif os.path.exists(lib_rs_path):
-            target_rs_file = lib_rs_path
-        
-        if target_rs_file:
-            with open(target_rs_file, "a") as f:
-                f.write(f"\nmod {module_name};\n")
-            console.print(Panel(f"[bold green]Added 'mod {module_name};' to {os.path.basename(target_rs_file)}[/bold green]", title="[bold green]Module Declaration[/bold green]", border_style="green"))
-        else:
-            console.print(Panel("[bold yellow]Warning: Neither src/main.rs nor src/lib.rs found. Please manually add 'mod {module_name};'[/bold yellow]", title="[bold yellow]Module Declaration Warning[/bold yellow]", border_style="yellow"))
-    elif language == "c":
-        header_file = os.path.join(module_dir, f"{module_name}.h")
-        source_file = os.path.join(module_dir, f"{module_name}.c")
-        header_content, source_content = _generate_c_module(module_name, module_type, connection_type)
-        with open(header_file, "w") as f:
-            f.write(header_content)
-        with open(source_file, "w") as f:
-            f.write(source_content)
-        console.print(Panel(f"[bold green]Created C module header: {header_file}[/bold green]\n[bold green]Created C module source: {source_file}[/bold green]", title="[bold green]File Creation[/bold green]", border_style="green"))
-
-        # Update Makefile to include the new C source file
-        makefile_path = os.path.join(os.getcwd(), "Makefile")
-        if os.path.exists(makefile_path):
-            with open(makefile_path, "r") as f:
-                makefile_content = f.read()
-            
-            old_build_line = "arm-none-eabi-gcc main.c -o main"
-            new_build_line = f"arm-none-eabi-gcc main.c {module_name}.c -o main"
-            
-            if old_build_line in makefile_content:
-                updated_makefile_content = makefile_content.replace(old_build_line, new_build_line)
-                with open(makefile_path, "w") as f:
-                    f.write(updated_makefile_content)
-                console.print(Panel(f"[bold green]Updated Makefile to include {module_name}.c[/bold green]", title="[bold green]Makefile Update[/bold green]", border_style="green"))
-            else:
-                console.print(Panel("[bold yellow]Warning: Could not find standard build line in Makefile. Please update manually.[/bold yellow]", title="[bold yellow]Makefile Warning[/bold yellow]", border_style="yellow"))
+    try:
+        if manifest:
+            modules = load_manifest(manifest)
+        elif module_name and module_type and connection_type:
+            modules = [{"name": module_name, "type": module_type, "conn": connection_type}]
         else:
-            console.print(Panel("[bold yellow]Warning: Makefile not found in project root. Please update manually.[/bold yellow]", title="[bold yellow]Makefile Warning[/bold yellow]", border_style="yellow"))
-    else:
-        console.print(Panel(f"[bold red]Error: Unsupported language '{language}' for module generation.[/bold red]", title="[bold red]Error[/bold red]", border_style="red"))
+            raise ModuleError("Pass a module name with --type and --conn, or --from modules.json.")
+        console.print(Panel(
+            "\n".join(f"[bold green]{module['name']}[/bold green]  Type: {module['type']}  Connection: {module['conn']}" for module in modules),
+            title="[bold blue]Module Addition[/bold blue]", border_style="blue",
+        ))
+        writes, statuses, warnings, skipped = plan_modules(project_root, language, modules, force=force)
+        apply_writes(writes)
+    except (ModuleError, OSError) as e:
+        console.print(Panel(f"[bold red]Error: {e}[/bold red]", title="[bold red]Error[/bold red]", border_style="red"))
         raise typer.Exit(code=1)
 
-    console.print(Panel(f"[bold green]Module '{module_name}' added successfully![/bold green]", title="[bold green]Success[/bold green]", border_style="green"))
+    for path in writes:
+        console.print(f"[green]Wrote {os.path.relpath(path, project_root)}[/green]")
+    for path in skipped:
+        console.print(f"[yellow]{os.path.relpath(path, project_root)} exists, skipped[/yellow]")
+    for warning in warnings:
+        console.print(Panel(f"[bold yellow]Warning: {warning}[/bold yellow]", title="[bold yellow]Module Declaration Warning[/bold yellow]", border_style="yellow"))
+
+    unchanged = [name for name, status in statuses.items() if status in ("unchanged", "skipped")]
+    summary = f"[bold green]{len(modules) - len(unchanged)} module(s) added or updated, {len(writes)} file(s) written.[/bold green]"
+    if unchanged:
+        summary += f"\nUnchanged, skipped: {', '.join(unchanged)}"
+    if skipped:
+        summary += f"\n{len(skipped)} existing file(s) differ from the template and were kept; pass --force to overwrite them."
+    console.print(Panel(summary, title="[bold green]Success[/bold green]", border_style="green"))
 
 @app.command()
 def compile(
     ctx: typer.Context,
+    project: Annotated[str, typer.Option("--project", "-P", help="Project to use, by name or path within the workspace (see 'embed projects'), instead of the current one.")] = None,
     port: Annotated[str, typer.Option("--port", "-p", help="Serial port for upload.")] = None,
+    no_cache: Annotated[bool, typer.Option("--no-cache", help="Always run the build instead of restoring a cached one.")] = False,
+    profile: Annotated[str, typer.Option("--profile", help="Build profile: dev, release or size.")] = None,
+    shared_target_dir: Annotated[bool, typer.Option("--shared-target-dir", help="Build Rust projects in a CARGO_TARGET_DIR shared across projects.")] = False,
+    full_flash: Annotated[bool, typer.Option("--full-flash", help="Rewrite every flash sector instead of only the ones that changed.")] = False,
+    watch: Annotated[bool, typer.Option("--watch", "-w", help="Rebuild (and upload with --port) whenever a source file changes; skips the build cache.")] = False,
+    debounce: Annotated[int, typer.Option("--debounce", help="With --watch, milliseconds of quiet to wait for after a change.")] = 50,
+    monitor: Annotated[bool, typer.Option("--monitor", "-m", help="After uploading, show the device's serial output (see 'embed monitor').")] = False,
 ):
     """
     Compiles the current project and uploads it to the board.
     """
-    project_root = ctx.obj.get("project_root")
-    board_config = ctx.obj.get("board_config")
+    from project import PROFILES, build_command as project_build_command, elf_path, shared_cargo_target_dir
+
+    project_root, board_config = _project_context(ctx, project)
 
     if not project_root or not board_config:
         console.print(Panel("[bold red]Error: Not in an embedded project directory. Please run 'embed new' first.[/bold red]", title="[bold red]Error[/bold red]", border_style="red"))
         raise typer.Exit(code=1)
 
+    if monitor and not port:
+        console.print(Panel("[bold red]Error: --monitor needs --port to know which device to read.[/bold red]", title="[bold red]Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+
     console.print(Panel(f"[bold blue]Compiling project for board: {board_config['name']}[/bold blue]", title="[bold blue]Compilation[/bold blue]", border_style="blue"))
 
     language = board_config.get("language")
@@ -240,282 +328,1176 @@ def compile(
         console.print(Panel("[bold red]Error: Project language not specified in .board.json.[/bold red]", title="[bold red]Configuration Error[/bold red]", border_style="red"))
         raise typer.Exit(code=1)
 
-    build_command = []
-    if language == "rust":
-        build_command = ["cargo", "build"]
-    elif language == "c":
-        build_command = ["make"]
-    else:
+    profile = profile or board_config.get("profile", "dev")
+    if profile not in PROFILES:
+        console.print(Panel(f"[bold red]Error: Unknown build profile '{profile}'. Choose one of: {', '.join(PROFILES)}.[/bold red]", title="[bold red]Compilation Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+
+    build_command = project_build_command(language, profile)
+    if build_command is None:
         console.print(Panel(f"[bold red]Error: Unsupported language '{language}' for compilation.[/bold red]", title="[bold red]Compilation Error[/bold red]", border_style="red"))
         raise typer.Exit(code=1)
 
-    try:
+    build_env = None
+    if language == "rust" and (shared_target_dir or os.environ.get("EMBED_SHARED_TARGET_DIR")) and not os.environ.get("CARGO_TARGET_DIR"):
+        build_env = dict(os.environ, CARGO_TARGET_DIR=shared_cargo_target_dir())
+        console.print(f"[dim]Using shared target dir {build_env['CARGO_TARGET_DIR']}[/dim]")
+
+    elf_file = elf_path(project_root, board_config, env=build_env, profile=profile)
+    if watch:
+        _watch_compile(project_root, board_config, language, build_command, elf_file, build_env=build_env, port=port, full_flash=full_flash, debounce=debounce / 1000)
+        return
+
+    build_cache = None
+    cache_key = None
+    restored = None
+    # Only artifacts inside the project can be restored from the cache.
+    if not no_cache and os.path.commonpath([os.path.abspath(elf_file), project_root]) == project_root:
+        from build_cache import BuildCache
+
+        build_cache = BuildCache()
+        with tracing.span("build cache lookup"):
+            cache_key = build_cache.key(project_root, build_command, _toolchain_tools(language, board_config), artifacts=[elf_file])
+            restored = build_cache.restore(cache_key, project_root)
+
+    if restored:
+        console.print(Panel(f"[bold green]Build cache hit: restored {', '.join(restored)} without running {' '.join(build_command)}.[/bold green]", title="[bold green]Success[/bold green]", border_style="green"))
+    else:
         console.print(f"[bold green]Running build command: {' '.join(build_command)}[/bold green]")
-        result = subprocess.run(build_command, capture_output=True, text=True, check=True, cwd=project_root)
-        console.print(Panel(result.stdout, title="[bold green]Build Output[/bold green]", border_style="green"))
-        if result.stderr:
-            console.print(Panel(result.stderr, title="[bold yellow]Build Warnings/Errors[/bold yellow]", border_style="yellow"))
+        try:
+            result = _run_streaming_build(build_command, project_root, env=build_env)
+        except FileNotFoundError:
+            console.print(Panel(f"[bold red]Error: Build tool '{build_command[0]}' not found. Run 'embed install' first.[/bold red]", title="[bold red]Compilation Failed[/bold red]", border_style="red"))
+            raise typer.Exit(code=1)
+
+        _print_build_summary(result, project_root)
+        if not result.ok:
+            tail = "\n".join(line for _stream, line in result.tail[-10:])
+            console.print(Panel(f"Compilation failed with error code {result.returncode}:\n{tail}", title="[bold red]Compilation Failed[/bold red]", border_style="red"))
+            raise typer.Exit(code=1)
 
+        if build_cache and os.path.exists(elf_file):
+            with tracing.span("build cache store"):
+                build_cache.store(cache_key, project_root, [elf_file])
         console.print(Panel("[bold green]Compilation complete.[/bold green]", title="[bold green]Success[/bold green]", border_style="green"))
 
-        # Now handle upload if port is provided
-        if port:
-            console.print(Panel(f"[bold blue]Uploading to board: {board_config['name']} on port {port}[/bold blue]", title="[bold blue]Upload[/bold blue]", border_style="blue"))
-            embed_script_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "embed")
-            upload_command = [embed_script_path, "upload", f"--board={board_config['name']}", f"--project-path={project_root}"]
-            if port:
-                upload_command.append(f"--port={port}")
-            
-            # Determine ELF file based on language and project structure
-            elf_file = ""
-            if language == "rust":
-                # Assuming default cargo build output path
-                elf_file = os.path.join(project_root, "target", "debug", project_name) # project_name is usually the binary name
-            elif language == "cpp":
-                # Assuming default make output path
-                elf_file = os.path.join(project_root, "main") # Assuming main is the output executable
-            
-            if elf_file and os.path.exists(elf_file):
-                upload_command.append(f"--elf={elf_file}")
-            else:
-                console.print(Panel(f"[bold red]Error: ELF file not found for upload. Expected at {elf_file}[/bold red]", title="[bold red]Upload Error[/bold red]", border_style="red"))
-                raise typer.Exit(code=1)
+    if os.path.exists(elf_file):
+        with tracing.span("size report"):
+            _print_size_report(project_root, board_config, elf_file)
 
-            upload_result = subprocess.run(upload_command, capture_output=True, text=True, check=True, cwd=os.path.dirname(embed_script_path))
-            console.print(Panel(upload_result.stdout, title="[bold green]Upload Output[/bold green]", border_style="green"))
-            if upload_result.stderr:
-                console.print(Panel(upload_result.stderr, title="[bold yellow]Upload Warnings/Errors[/bold yellow]", border_style="yellow"))
-            console.print(Panel("[bold green]Upload complete.[/bold green]", title="[bold green]Success[/bold green]", border_style="green"))
+    # Now handle upload if port is provided
+    if port:
+        _upload_elf(project_root, board_config, elf_file, port, full_flash=full_flash)
+        if monitor:
+            _monitor_port(port, elf_file=elf_file, capture_path=_default_capture_path(project_root), board_config=board_config)
+
+def _upload_elf(project_root, board_config, elf_file, port, full_flash=False):
+    """
+    Uploads a built ELF through the board's delta flasher or `embed upload`.
+    """
+    import subprocess
+
+    console.print(Panel(f"[bold blue]Uploading to board: {board_config['name']} on port {port}[/bold blue]", title="[bold blue]Upload[/bold blue]", border_style="blue"))
+    upload_config = _upload_config(board_config)
+    from delta_flash import supports_delta
+
+    if supports_delta(upload_config):
+        _delta_upload(elf_file, upload_config, port, full=full_flash)
+        return
+
+    embed_script_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "embed")
+    upload_command = [embed_script_path, "upload", f"--board={board_config['name']}", f"--project-path={project_root}", f"--port={port}"]
+
+    if os.path.exists(elf_file):
+        upload_command.append(f"--elf={elf_file}")
+    else:
+        console.print(Panel(f"[bold red]Error: ELF file not found for upload. Expected at {elf_file}[/bold red]", title="[bold red]Upload Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
 
+    try:
+        with tracing.subprocess_span(upload_command):
+            upload_result = subprocess.run(upload_command, capture_output=True, text=True, check=True, cwd=os.path.dirname(embed_script_path))
     except subprocess.CalledProcessError as e:
-        console.print(Panel(f"Compilation failed with error code {e.returncode}:\n{e.stdout}\n{e.stderr}", title="[bold red]Compilation Failed[/bold red]", border_style="red"))
-        raise typer.Exit(code=1)
-
-def _get_openocd_board_name(file_path):
-    with open(file_path, 'r') as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith('#'):
-                comment_text = line[1:].strip()
-                # Look for specific patterns like "This is an XYZ board"
-                match = re.search(r"This is an (.+?)\s+(board|kit)", comment_text, re.IGNORECASE)
-                if match:
-                    return match.group(1).strip()
-                # Fallback to general comment if no specific pattern found
-                if "board" in comment_text.lower() or "kit" in comment_text.lower():
-                    return comment_text
-    return os.path.basename(file_path).replace(".cfg", "")
+        console.print(Panel(f"Upload failed with error code {e.returncode}:\n{e.stdout}\n{e.stderr}", title="[bold red]Upload Failed[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+    console.print(Panel(upload_result.stdout, title="[bold green]Upload Output[/bold green]", border_style="green"))
+    if upload_result.stderr:
+        console.print(Panel(upload_result.stderr, title="[bold yellow]Upload Warnings/Errors[/bold yellow]", border_style="yellow"))
+    console.print(Panel("[bold green]Upload complete.[/bold green]", title="[bold green]Success[/bold green]", border_style="green"))
+
+def _watch_compile(project_root, board_config, language, build_command, elf_file, build_env=None, port=None, full_flash=False, debounce=0.05):
+    """
+    Rebuilds whenever a build input changes, and uploads the result if its
+    contents changed since the last upload.
+    """
+    import hashlib
+    import time
+
+    from watch_build import watch_rebuilds
+
+    def digest(path):
+        try:
+            with open(path, "rb") as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+
+    uploaded = {"digest": None}
+
+    def build(changes, cancel):
+        started = time.monotonic()
+        if changes:
+            console.print(f"[bold blue]Changed: {', '.join(changes[:5])}{' ...' if len(changes) > 5 else ''}[/bold blue]")
+        console.print(f"[bold green]Running build command: {' '.join(build_command)}[/bold green]")
+        try:
+            result = _run_streaming_build(build_command, project_root, env=build_env, cancel=cancel)
+        except FileNotFoundError:
+            console.print(Panel(f"[bold red]Error: Build tool '{build_command[0]}' not found. Run 'embed install' first.[/bold red]", title="[bold red]Compilation Failed[/bold red]", border_style="red"))
+            return
+        if result.cancelled:
+            console.print("[yellow]Build cancelled: newer changes arrived.[/yellow]")
+            return
+        _print_build_summary(result, project_root)
+        if not result.ok:
+            tail = "\n".join(line for _stream, line in result.tail[-10:])
+            console.print(Panel(f"Compilation failed with error code {result.returncode}:\n{tail}", title="[bold red]Compilation Failed[/bold red]", border_style="red"))
+            return
+        console.print(f"[bold green]Rebuilt in {time.monotonic() - started:.2f}s.[/bold green]")
+        if not os.path.exists(elf_file):
+            return
+        _print_size_report(project_root, board_config, elf_file)
+        if port and not cancel.is_set():
+            current = digest(elf_file)
+            if current == uploaded["digest"]:
+                console.print("[dim]Firmware unchanged since the last upload; skipping it.[/dim]")
+                return
+            try:
+                _upload_elf(project_root, board_config, elf_file, port, full_flash=full_flash)
+                uploaded["digest"] = current
+            except typer.Exit:
+                pass  # Already reported; try again after the next change.
+
+    def on_event(event, detail):
+        if event == "watching":
+            console.print(f"[bold blue]Watching {project_root} for changes ({detail['backend']}). Press Ctrl-C to stop.[/bold blue]")
+            for path in detail["unwatched"]:
+                console.print(f"[bold yellow]Warning: could not watch {path}.[/bold yellow]")
+        elif event == "cancelling":
+            console.print("[yellow]Changes arrived; stopping the running build.[/yellow]")
+
+    try:
+        watch_rebuilds(project_root, language, build, exclude=[elf_file], debounce=debounce, on_event=on_event)
+    except KeyboardInterrupt:
+        console.print("[bold blue]Stopped watching.[/bold blue]")
+
+def _print_size_report(project_root, board_config, elf_file, top=10, linker_script=None, save=True):
+    """
+    Prints flash/RAM usage and the largest symbols, diffed against the last run.
+    """
+    from elf import ElfError
+    from size_report import diff_reports, find_linker_script, load_previous_report, parse_memory_regions, save_report, size_report
+
+    linker_script = linker_script or find_linker_script(project_root, board_config)
+    regions = []
+    if linker_script:
+        try:
+            with open(linker_script, "r") as f:
+                regions = parse_memory_regions(f.read())
+        except OSError as e:
+            console.print(f"[bold yellow]Warning: Could not read linker script {linker_script}: {e.strerror}[/bold yellow]")
+    try:
+        report = size_report(elf_file, regions)
+    except (OSError, ElfError) as e:
+        console.print(Panel(f"[bold red]Error: Could not read {elf_file}: {e}[/bold red]", title="[bold red]Size Report Error[/bold red]", border_style="red"))
+        return None
+
+    previous = load_previous_report(project_root, elf_file)
+    diff = diff_reports(previous, report) if previous else None
+
+    def delta(value):
+        if not diff or not value:
+            return ""
+        style = "red" if value > 0 else "green"
+        return f"[{style}]{value:+d}[/{style}]"
+
+    table = Table(title=f"[bold magenta]Memory Usage: {os.path.relpath(elf_file, project_root)}[/bold magenta]")
+    table.add_column("Region", style="cyan", no_wrap=True)
+    table.add_column("Used", justify="right")
+    table.add_column("Size", justify="right")
+    table.add_column("Use%", justify="right")
+    table.add_column("Change", justify="right")
+    for region in report["regions"]:
+        percent = 100.0 * region["used"] / region["length"] if region["length"] else 0.0
+        style = "bold red" if percent > 100 else "yellow" if percent > 90 else "green"
+        table.add_row(region["name"], str(region["used"]), str(region["length"]), f"[{style}]{percent:.1f}%[/{style}]", delta(diff["regions"].get(region["name"]) if diff else 0))
+    for name, value in report["totals"].items():
+        table.add_row(f"[dim]{name}[/dim]", str(value), "", "", delta(diff["totals"][name] if diff else 0))
+    if not report["regions"]:
+        table.caption = "No MEMORY regions found; pass --linker-script to check limits."
+    console.print(table)
+
+    if top:
+        symbols_table = Table(title=f"[bold magenta]Top {top} Symbols[/bold magenta]")
+        symbols_table.add_column("Symbol", style="cyan")
+        symbols_table.add_column("Type")
+        symbols_table.add_column("Size", justify="right")
+        for symbol in report["symbols"][:top]:
+            symbols_table.add_row(symbol["name"], symbol["type"], str(symbol["size"]))
+        console.print(symbols_table)
+
+    if diff and diff["symbols"]:
+        changes_table = Table(title="[bold magenta]Largest Changes Since Last Build[/bold magenta]")
+        changes_table.add_column("Symbol", style="cyan")
+        changes_table.add_column("Before", justify="right")
+        changes_table.add_column("After", justify="right")
+        changes_table.add_column("Change", justify="right")
+        for name, old, new in diff["symbols"][:top or 10]:
+            changes_table.add_row(name, str(old) if old else "-", str(new) if new else "-", delta(new - old))
+        console.print(changes_table)
+
+    if save:
+        try:
+            save_report(project_root, report)
+        except OSError:
+            pass
+    return report
+
+def _upload_config(board_config):
+    """
+    The board's registry config with the project's .board.json on top.
+    """
+    from board_index import find_board, load_board_index
+
+    entry = find_board(load_board_index(), board_config.get("name", ""))
+    return dict(entry["config"] if entry else {}, **board_config)
+
+def _delta_upload(elf_file, upload_config, port, full=False):
+    from delta_flash import FlashError, flash_delta
+    from devices import device_for_port
+    from elf import ElfError
+
+    device = device_for_port(port, upload_config)
+    serial = device.serial if device else None
+    if not serial:
+        console.print("[yellow]Cannot tell which device this is (no USB serial), so the whole image is flashed.[/yellow]")
+    try:
+        with console.status("[bold blue]Flashing changed sectors...[/bold blue]"):
+            summary = flash_delta(elf_file, upload_config, port=port, serial=serial, full=full)
+    except (FlashError, ElfError, OSError) as e:
+        console.print(Panel(f"Upload failed: {e}", title="[bold red]Upload Failed[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+
+    if not summary["ranges"]:
+        console.print(Panel("[bold green]Device already up to date, nothing to flash.[/bold green]", title="[bold green]Success[/bold green]", border_style="green"))
+        return
+    ranges = ", ".join(f"{address:#x}+{length:#x}" for address, length in summary["ranges"])
+    console.print(Panel(f"[bold green]Upload complete.[/bold green]\nFlashed {summary['sectors_changed']} of {summary['sectors_total']} sectors ({summary['bytes_written']} of {summary['image_size']} bytes): {ranges}", title="[bold green]Success[/bold green]", border_style="green"))
+
+def _toolchain_tools(language, board_config):
+    """
+    Tools whose versions are part of the build cache key.
+    """
+    if language == "rust":
+        return ["cargo", "rustc"]
+    from board_index import find_board, load_board_index
+
+    entry = find_board(load_board_index(), board_config.get("name", ""))
+    toolchain = entry["config"].get("toolchain") if entry else None
+    return ["make", toolchain or "arm-none-eabi-gcc"]
+
+def _run_streaming_build(build_command, project_root, env=None, cancel=None):
+    """
+    Runs the build with its output streamed to the console as it arrives.
+    """
+    from build_runner import run_build
+
+    if cancel is None:
+        cancel = getattr(_daemon_local, "cancel", None)
+    counts = {"error": 0, "warning": 0}
+    with console.status("[bold blue]Building...[/bold blue]") as status:
+        def on_line(stream, line):
+            console.print(line, markup=False, highlight=False, style="dim" if stream == "stdout" else None)
+
+        def on_diagnostic(diagnostic):
+            if diagnostic.severity in counts:
+                counts[diagnostic.severity] += 1
+                status.update(f"[bold blue]Building...[/bold blue] [red]{counts['error']} errors[/red], [yellow]{counts['warning']} warnings[/yellow]")
+
+        return run_build(build_command, cwd=project_root, on_line=on_line, on_diagnostic=on_diagnostic, env=env, cancel=cancel)
+
+def _print_build_summary(result, project_root, max_rows=50):
+    from build_runner import format_diagnostic
+
+    if result.diagnostics:
+        styles = {"error": "bold red", "warning": "yellow", "note": "cyan"}
+        table = Table(title="[bold magenta]Build Diagnostics[/bold magenta]")
+        table.add_column("Severity", no_wrap=True)
+        table.add_column("Location", style="cyan", no_wrap=True)
+        table.add_column("Message", style="white")
+        for diagnostic in result.diagnostics[:max_rows]:
+            style = styles.get(diagnostic.severity, "white")
+            table.add_row(f"[{style}]{diagnostic.severity}[/{style}]", format_diagnostic(diagnostic, project_root), diagnostic.message)
+        hidden = len(result.diagnostics) - max_rows + result.dropped_diagnostics
+        if hidden > 0:
+            table.caption = f"{hidden} more diagnostics not shown"
+        console.print(table)
+
+    summary = f"[bold]{result.line_count}[/bold] lines, [bold red]{result.counts['error']}[/bold red] errors, [bold yellow]{result.counts['warning']}[/bold yellow] warnings in {result.duration:.1f}s"
+    if result.cancelled:
+        summary += ", [bold red]cancelled[/bold red]"
+    elif result.returncode != 0:
+        # Not every failure prints a diagnostic we recognise.
+        summary += f", [bold red]failed[/bold red] (exit code {result.returncode})"
+    console.print(summary)
+
+@app.command("build-all")
+def build_all(
+    ctx: typer.Context,
+    projects: Annotated[list[str], typer.Argument(help="Project directories or names to build (defaults to the current project).")] = None,
+    boards: Annotated[list[str], typer.Option("--board", "-b", help="Board to build for; repeat or comma-separate for several.")] = None,
+    jobs: Annotated[int, typer.Option("--jobs", "-j", help="Parallel builds (defaults to the number of CPU cores).")] = None,
+    profile: Annotated[str, typer.Option("--profile", help="Build profile: dev, release or size.")] = "dev",
+):
+    """
+    Builds several boards and/or projects in parallel and summarizes the results.
+    """
+    import time
+
+    from board_index import find_board, load_board_index
+    from matrix import plan_targets, run_matrix
+    from project import PROFILES
+
+    if profile not in PROFILES:
+        console.print(Panel(f"[bold red]Error: Unknown build profile '{profile}'. Choose one of: {', '.join(PROFILES)}.[/bold red]", title="[bold red]Build Matrix Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+
+    project_configs = []
+    if projects:
+        for project in projects:
+            project_root = os.path.abspath(project)
+            if not os.path.isdir(project_root):
+                # Not a directory here: a project name from the workspace index.
+                project_root = _named_project_root(project)
+            board_file = os.path.join(project_root, ".board.json")
+            if not os.path.exists(board_file):
+                console.print(Panel(f"[bold red]Error: '{project}' is not an embedded project ('.board.json' not found).[/bold red]", title="[bold red]Project Error[/bold red]", border_style="red"))
+                raise typer.Exit(code=1)
+            with open(board_file, "r") as f:
+                project_configs.append((project_root, json.load(f)))
+    else:
+        project_root, board_config = _project_context(ctx)
+        if not project_root:
+            console.print(Panel("[bold red]Error: Not in an embedded project directory. Please run 'embed new' first.[/bold red]", title="[bold red]Error[/bold red]", border_style="red"))
+            raise typer.Exit(code=1)
+        project_configs.append((project_root, board_config))
+
+    board_names = [name.strip() for value in boards or [] for name in value.split(",") if name.strip()]
+    index = load_board_index()
+    if board_names:
+        unknown = [name for name in board_names if find_board(index, name) is None]
+        if unknown:
+            console.print(Panel(f"[bold red]Error: Unknown board(s): {', '.join(unknown)}. See 'embed board list'.[/bold red]", title="[bold red]Board Not Found[/bold red]", border_style="red"))
+            raise typer.Exit(code=1)
+
+    registry = {}
+    for name in board_names or [config.get("name", "") for _root, config in project_configs]:
+        entry = find_board(index, name)
+        if entry:
+            registry[name] = entry["config"]
+    targets = plan_targets(project_configs, board_names, profile=profile, registry=registry)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(targets)))
+    console.print(Panel(f"[bold blue]Building {len(targets)} target(s) with {jobs} parallel job(s)[/bold blue]", title="[bold blue]Build Matrix[/bold blue]", border_style="blue"))
+
+    started = time.monotonic()
+    with console.status("[bold blue]Building...[/bold blue]") as status:
+        done = []
+
+        def on_result(result):
+            done.append(result)
+            mark = "[green]✔[/green]" if result["ok"] else "[red]✖[/red]"
+            console.print(f"{mark} {result['project']} [cyan]{result['board']}[/cyan] in {result['duration']:.1f}s")
+            status.update(f"[bold blue]Building...[/bold blue] {len(done)}/{len(targets)} done")
+
+        results = run_matrix(targets, jobs=jobs, on_result=on_result)
+    wall_time = time.monotonic() - started
+
+    table = Table(title="[bold magenta]Build Matrix Results[/bold magenta]")
+    table.add_column("Project", style="cyan", no_wrap=True)
+    table.add_column("Board", style="cyan", no_wrap=True)
+    table.add_column("Status")
+    table.add_column("Time", justify="right")
+    table.add_column("Errors/Warnings", justify="right")
+    table.add_column("ELF", style="green")
+    for result in results:
+        status_text = "[bold green]✔ OK[/bold green]" if result["ok"] else "[bold red]✖ FAILED[/bold red]"
+        elf = os.path.relpath(result["elf"], result["project_root"]) if result["elf"] else "-"
+        table.add_row(result["project"], result["board"], status_text, f"{result['duration']:.1f}s", f"{result['errors']}/{result['warnings']}", elf)
+    serial_time = sum(result["duration"] for result in results)
+    table.caption = f"wall time {wall_time:.1f}s, serial time {serial_time:.1f}s"
+    console.print(table)
+
+    failed = [result for result in results if not result["ok"]]
+    for result in failed:
+        console.print(Panel("\n".join(result["tail"][-10:]) or "No output.", title=f"[bold red]{result['project']} / {result['board']} failed[/bold red]", border_style="red"))
+    if failed:
+        raise typer.Exit(code=1)
+
+@app.command("projects")
+def projects_command(
+    path: Annotated[str, typer.Argument(help="Directory to search (defaults to the workspace: the enclosing git checkout or EMBED_WORKSPACE).")] = None,
+    as_json: Annotated[bool, typer.Option("--json", help="Print the projects as JSON.")] = False,
+    refresh: Annotated[bool, typer.Option("--refresh", help="Ignore the cached index and rescan every directory.")] = False,
+):
+    """
+    Lists every embedded project (directory with a .board.json) below a directory.
+    """
+    from project_index import discover_projects, workspace_root
+
+    root = os.path.abspath(path) if path else workspace_root()
+    if not os.path.isdir(root):
+        console.print(Panel(f"[bold red]Error: '{path}' is not a directory.[/bold red]", title="[bold red]Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+    projects = discover_projects(root, refresh=refresh)
+
+    if as_json:
+        print(json.dumps(projects, indent=2))
+        return
+
+    if not projects:
+        console.print(Panel(f"[bold yellow]No projects found under {root}.[/bold yellow]", title="[bold yellow]No Projects[/bold yellow]", border_style="yellow"))
+        return
+    table = Table(title=f"[bold magenta]Projects under {root}[/bold magenta]")
+    table.add_column("Name", style="cyan", no_wrap=True)
+    table.add_column("Path", style="green")
+    table.add_column("Board", style="magenta")
+    table.add_column("Language")
+    for project in projects:
+        table.add_row(project["name"], project["relative_path"], project["board"] or "N/A", project["language"] or "N/A")
+    console.print(table)
 
 @board_app.command("list")
-def board_list():
+def board_list(
+    as_json: Annotated[bool, typer.Option("--json", help="Print boards as JSON.")] = False,
+):
     """
     Lists all available boards.
     """
+    from board_index import board_summary, load_board_index
+
+    if as_json:
+        print(json.dumps([board_summary(entry) for entry in load_board_index()["boards"]], indent=2))
+        return
+
     console.print("[bold blue]Listing available boards...[/bold blue]")
     
     table = Table(title="[bold magenta]Available Boards[/bold magenta]")
     table.add_column("Board Name", style="cyan", no_wrap=True)
     table.add_column("Config File", style="green")
 
-    # Add boards from project's boards/ directory
-    boards_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "boards")
-    for board_file in os.listdir(boards_dir):
-        if board_file.endswith(".json"):
-            file_path = os.path.join(boards_dir, board_file)
-            try:
-                with open(file_path, "r") as f:
-                    config = json.load(f)
-                board_name = config.get("name", "N/A")
-                config_file = board_file.replace(".json", "")
-                table.add_row(board_name, config_file)
-            except Exception as e:
-                console.print(f"[bold red]Error reading {board_file}: {e}[/bold red]")
-
-    # Add boards from OpenOCD config directory
-    openocd_board_dir = os.environ.get("EMBED_OPENOCD_BOARD_DIR", "/usr/share/openocd/scripts/board")
-    if os.path.exists(openocd_board_dir):
-        for board_file in os.listdir(openocd_board_dir):
-            if board_file.endswith(".cfg"):
-                file_path = os.path.join(openocd_board_dir, board_file)
-                try:
-                    board_name = _get_openocd_board_name(file_path)
-                    config_file = board_file
-                    table.add_row(board_name, config_file)
-                except Exception as e:
-                    console.print(f"[bold red]Error reading {board_file}: {e}[/bold red]")
-    else:
-        console.print(f"[bold yellow]Warning: OpenOCD board directory not found at {openocd_board_dir}. Skipping OpenOCD board listing.[/bold yellow]")
+    index = load_board_index()
+    for error in index["errors"]:
+        console.print(f"[bold red]{error}[/bold red]")
+    for entry in index["boards"]:
+        table.add_row(entry["name"], entry["config_file"])
+
+    if not index["openocd_found"]:
+        console.print(f"[bold yellow]Warning: OpenOCD board directory not found at {index['openocd_board_dir']}. Skipping OpenOCD board listing.[/bold yellow]")
     
     console.print(table)
 
 @board_app.command("search")
 def board_search(
-    term: Annotated[str, typer.Argument(help="Search term for boards.")]
+    term: Annotated[str, typer.Argument(help="Search term for boards.")],
+    limit: Annotated[int, typer.Option("--limit", "-n", help="Maximum number of results to show.")] = 10,
+    as_json: Annotated[bool, typer.Option("--json", help="Print results as JSON.")] = False,
 ):
     """
     Searches for a specific board.
     """
-    console.print(f"[bold blue]Searching for boards matching '{term}'...[/bold blue]")
-    
-    table = Table(title=f"[bold magenta]Search Results for '{term}'[/bold magenta]")
-    table.add_column("Board Name", style="cyan", no_wrap=True)
-    table.add_column("Config File", style="green")
+    from board_index import load_board_index
+    from board_search import load_search_index
 
-    found_boards = False
+    if not as_json:
+        console.print(f"[bold blue]Searching for boards matching '{term}'...[/bold blue]")
 
-    # Search in project's boards/ directory
-    boards_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "boards")
-    for board_file in os.listdir(boards_dir):
-        if board_file.endswith(".json"):
-            file_path = os.path.join(boards_dir, board_file)
-            try:
-                with open(file_path, "r") as f:
-                    config = json.load(f)
-                board_name = config.get("name", "N/A")
-                config_file = board_file.replace(".json", "")
-                
-                if term.lower() in board_name.lower() or term.lower() in config_file.lower():
-                    table.add_row(board_name, config_file)
-                    found_boards = True
-            except Exception as e:
-                console.print(f"[bold red]Error reading {board_file}: {e}[/bold red]")
-
-    # Search in OpenOCD config directory
-    openocd_board_dir = os.environ.get("EMBED_OPENOCD_BOARD_DIR", "/usr/share/openocd/scripts/board")
-    if os.path.exists(openocd_board_dir):
-        for board_file in os.listdir(openocd_board_dir):
-            if board_file.endswith(".cfg"):
-                file_path = os.path.join(openocd_board_dir, board_file)
-                try:
-                    board_name = _get_openocd_board_name(file_path)
-                    config_file = board_file
-                    
-                    if term.lower() in board_name.lower() or term.lower() in config_file.lower():
-                        table.add_row(board_name, config_file)
-                        found_boards = True
-                except Exception as e:
-                    console.print(f"[bold red]Error reading {board_file}: {e}[/bold red]")
-    else:
-        console.print(f"[bold yellow]Warning: OpenOCD board directory not found at {openocd_board_dir}. Skipping OpenOCD board search.[/bold yellow]")
-    
-    if not found_boards:
+    index = load_board_index()
+    results = load_search_index(index).search(term, limit=limit)
+
+    if as_json:
+        print(json.dumps([dict(board, score=score) for score, board in results], indent=2))
+        return
+
+    for error in index["errors"]:
+        console.print(f"[bold red]{error}[/bold red]")
+    if not index["openocd_found"]:
+        console.print(f"[bold yellow]Warning: OpenOCD board directory not found at {index['openocd_board_dir']}. Skipping OpenOCD board search.[/bold yellow]")
+
+    if not results:
         console.print(Panel(f"[bold yellow]No boards found matching '{term}'.[/bold yellow]", title="[bold yellow]No Results[/bold yellow]", border_style="yellow"))
-    else:
-        console.print(table)
+        return
+
+    table = Table(title=f"[bold magenta]Search Results for '{term}'[/bold magenta]")
+    table.add_column("Board Name", style="cyan", no_wrap=True)
+    table.add_column("Config File", style="green")
+    table.add_column("Score", style="magenta", justify="right")
+    for score, board in results:
+        table.add_row(board["name"], board["config_file"], f"{score:.2f}")
+    console.print(table)
 
 @board_app.command("tools")
 def board_tools(
-    board_name: Annotated[str, typer.Argument(help="Name of the board to show tools for.")]
+    board_name: Annotated[str, typer.Argument(help="Name of the board to show tools for.")],
+    as_json: Annotated[bool, typer.Option("--json", help="Print the board's tools as JSON.")] = False,
 ):
     """
     Shows the recommended toolchain and debugger for a specific board.
     """
+    from board_index import board_summary, find_board, load_board_index
+
+    if as_json:
+        entry = find_board(load_board_index(), board_name)
+        if entry is None:
+            print(f"Board '{board_name}' not found in project configurations.", file=sys.stderr)
+            raise typer.Exit(code=1)
+        print(json.dumps(board_summary(entry), indent=2))
+        return
+
     console.print(f"[bold blue]Fetching tool information for board: {board_name}[/bold blue]")
 
-    board_found = False
-    boards_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "boards")
-    for board_file in os.listdir(boards_dir):
-        if board_file.endswith(".json"):
-            file_path = os.path.join(boards_dir, board_file)
-            try:
-                with open(file_path, "r") as f:
-                    config = json.load(f)
-                if config.get("name", "N/A").lower() == board_name.lower() or board_file.replace(".json", "").lower() == board_name.lower():
-                    table = Table(title=f"[bold magenta]Tools for {config.get("name", board_name)}[/bold magenta]")
-                    table.add_column("Tool Type", style="cyan")
-                    table.add_column("Recommended Tool", style="green")
-
-                    toolchain = config.get("toolchain", "N/A")
-                    debug = config.get("debug", "N/A")
-
-                    table.add_row("Toolchain", toolchain)
-                    table.add_row("Debugger", debug)
-                    console.print(table)
-                    board_found = True
-                    break
-            except Exception as e:
-                console.print(f"[bold red]Error reading {board_file}: {e}[/bold red]")
-    
-    if not board_found:
+    index = load_board_index()
+    for error in index["errors"]:
+        console.print(f"[bold red]{error}[/bold red]")
+    entry = find_board(index, board_name)
+    if entry:
+        config = entry["config"]
+        table = Table(title=f"[bold magenta]Tools for {config.get('name', board_name)}[/bold magenta]")
+        table.add_column("Tool Type", style="cyan")
+        table.add_column("Recommended Tool", style="green")
+
+        toolchain = config.get("toolchain", "N/A")
+        debug = config.get("debug", "N/A")
+
+        table.add_row("Toolchain", toolchain)
+        table.add_row("Debugger", debug)
+        console.print(table)
+    else:
         console.print(Panel(f"[bold yellow]Board '{board_name}' not found in project configurations.[/bold yellow]", title="[bold yellow]Board Not Found[/bold yellow]", border_style="yellow"))
 
 @app.command()
-def install():
+def upload(
+    ctx: typer.Context,
+    project: Annotated[str, typer.Option("--project", "-P", help="Project to use, by name or path within the workspace (see 'embed projects'), instead of the current one.")] = None,
+    all_devices: Annotated[bool, typer.Option("--all", help="Flash every attached device whose USB ID matches the project's board.")] = False,
+    ports: Annotated[list[str], typer.Option("--ports", help="Ports to flash; repeat or comma-separate for several.")] = None,
+    jobs: Annotated[int, typer.Option("--jobs", "-j", help="Devices to flash at the same time.")] = 8,
+    retries: Annotated[int, typer.Option("--retries", help="Times to retry a device that failed to flash.")] = 2,
+    profile: Annotated[str, typer.Option("--profile", help="Build profile whose ELF to flash: dev, release or size.")] = None,
+    full_flash: Annotated[bool, typer.Option("--full-flash", help="Rewrite every flash sector instead of only the ones that changed.")] = False,
+):
+    """
+    Flashes the built firmware to several attached devices concurrently.
+    """
+    import time
+
+    from delta_flash import FlashError
+    from devices import device_for_port, discover_devices, match_devices
+    from multi_upload import flash_devices
+    from project import elf_path
+
+    project_root, board_config = _project_context(ctx, project)
+    if not project_root or not board_config:
+        console.print(Panel("[bold red]Error: Not in an embedded project directory. Please run 'embed new' first.[/bold red]", title="[bold red]Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+    if not all_devices and not ports:
+        console.print(Panel("[bold red]Error: Pass --all or --ports, or use 'embed compile --port <port>' for a single device.[/bold red]", title="[bold red]Upload Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+
+    elf_file = elf_path(project_root, board_config, profile=profile or board_config.get("profile", "dev"))
+    if not os.path.exists(elf_file):
+        console.print(Panel(f"[bold red]Error: ELF file not found for upload. Expected at {elf_file}. Run 'embed compile' first.[/bold red]", title="[bold red]Upload Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+
+    upload_config = _upload_config(board_config)
+    serials = {}
+    port_list = [port.strip() for value in ports or [] for port in value.split(",") if port.strip()]
+    devices = discover_devices()
+    for port in port_list:
+        device = device_for_port(port, devices=devices)
+        if device:
+            serials[port] = device.serial
+    if all_devices:
+        if not upload_config.get("usb_ids"):
+            console.print(Panel(f"[bold red]Error: Board '{board_config['name']}' declares no usb_ids, so its devices cannot be discovered. Use --ports instead.[/bold red]", title="[bold red]Upload Error[/bold red]", border_style="red"))
+            raise typer.Exit(code=1)
+        for device in match_devices(devices, upload_config):
+            if device.port not in port_list:
+                serials[device.port] = device.serial
+                port_list.append(device.port)
+    if not port_list:
+        console.print(Panel(f"[bold yellow]No attached devices match board '{board_config['name']}' ({', '.join(upload_config.get('usb_ids', []))}).[/bold yellow]", title="[bold yellow]No Devices[/bold yellow]", border_style="yellow"))
+        raise typer.Exit(code=1)
+
+    console.print(Panel(f"[bold blue]Flashing {os.path.relpath(elf_file, project_root)} to {len(port_list)} device(s), {min(jobs, len(port_list))} at a time[/bold blue]", title="[bold blue]Upload[/bold blue]", border_style="blue"))
+
+    started = time.monotonic()
+    with console.status("[bold blue]Flashing...[/bold blue]") as status:
+        done = []
+
+        def on_event(port, event, detail):
+            if event == "retry":
+                console.print(f"[yellow]↻[/yellow] {port} attempt {detail}")
+            elif event in ("ok", "failed"):
+                done.append(port)
+                mark = "[green]✔[/green]" if event == "ok" else "[red]✖[/red]"
+                console.print(f"{mark} {port}")
+                status.update(f"[bold blue]Flashing...[/bold blue] {len(done)}/{len(port_list)} done")
+
+        try:
+            results = flash_devices(elf_file, upload_config, port_list, serials=serials, jobs=jobs, retries=retries, full=full_flash, on_event=on_event)
+        except FlashError as e:
+            console.print(Panel(f"[bold red]Error: {e}[/bold red]", title="[bold red]Upload Error[/bold red]", border_style="red"))
+            raise typer.Exit(code=1)
+    wall_time = time.monotonic() - started
+
+    table = Table(title="[bold magenta]Upload Results[/bold magenta]")
+    table.add_column("Port", style="cyan", no_wrap=True)
+    table.add_column("Serial", style="cyan")
+    table.add_column("Status")
+    table.add_column("Attempts", justify="right")
+    table.add_column("Time", justify="right")
+    table.add_column("Details")
+    for result in results:
+        status_text = "[bold green]✔ OK[/bold green]" if result["ok"] else "[bold red]✖ FAILED[/bold red]"
+        detail = result["detail"] if result["ok"] else (result["detail"].strip().splitlines() or ["-"])[-1]
+        table.add_row(result["port"], serials.get(result["port"]) or "-", status_text, str(result["attempts"]), f"{result['duration']:.1f}s", detail)
+    table.caption = f"wall time {wall_time:.1f}s, serial time {sum(result['duration'] for result in results):.1f}s"
+    console.print(table)
+
+    if not all(result["ok"] for result in results):
+        raise typer.Exit(code=1)
+
+@app.command("size")
+def size_command(
+    ctx: typer.Context,
+    project: Annotated[str, typer.Option("--project", "-P", help="Project to use, by name or path within the workspace (see 'embed projects'), instead of the current one.")] = None,
+    elf_file: Annotated[str, typer.Argument(help="ELF to size (defaults to the current project's build output).")] = None,
+    top: Annotated[int, typer.Option("--top", "-n", help="Number of largest symbols to list.")] = 10,
+    linker_script: Annotated[str, typer.Option("--linker-script", help="Linker script with the MEMORY regions (defaults to memory.x or *.ld in the project).")] = None,
+    profile: Annotated[str, typer.Option("--profile", help="Build profile whose ELF to size: dev, release or size.")] = None,
+    as_json: Annotated[bool, typer.Option("--json", help="Print the size report as JSON.")] = False,
+):
+    """
+    Reports flash/RAM usage per memory region and the largest symbols.
+    """
+    from project import elf_path
+
+    project_root, board_config = _project_context(ctx, project)
+    if elf_file:
+        elf_file = os.path.abspath(elf_file)
+        project_root = project_root or os.path.dirname(elf_file)
+        board_config = board_config or {}
+    elif project_root:
+        elf_file = elf_path(project_root, board_config, profile=profile or board_config.get("profile", "dev"))
+    else:
+        console.print(Panel("[bold red]Error: Not in an embedded project directory. Pass an ELF file or run 'embed new' first.[/bold red]", title="[bold red]Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+
+    if not os.path.exists(elf_file):
+        console.print(Panel(f"[bold red]Error: ELF file not found at {elf_file}. Run 'embed compile' first.[/bold red]", title="[bold red]Size Report Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+
+    if as_json:
+        from elf import ElfError
+        from size_report import find_linker_script, parse_memory_regions, size_report
+
+        linker_script = linker_script or find_linker_script(project_root, board_config)
+        regions = []
+        if linker_script and os.path.exists(linker_script):
+            with open(linker_script, "r") as f:
+                regions = parse_memory_regions(f.read())
+        try:
+            report = size_report(elf_file, regions)
+        except ElfError as e:
+            print(str(e), file=sys.stderr)
+            raise typer.Exit(code=1)
+        report["symbols"] = report["symbols"][:top]
+        print(json.dumps(report, indent=2))
+        return
+
+    # Only a project's own build output is remembered for diffing.
+    if _print_size_report(project_root, board_config, elf_file, top=top, linker_script=linker_script, save=bool(ctx.obj.get("project_root"))) is None:
+        raise typer.Exit(code=1)
+
+_LOG_LEVEL_STYLES = {"error": "bold red", "warn": "yellow", "info": "green", "debug": "cyan", "trace": "dim", "raw": "magenta"}
+
+def _monitor_port(port, baud=None, log_format=None, elf_file=None, capture_path=None, fps=30, duration=None, board_config=None):
+    """
+    Streams a device's serial output to the console, keeping a raw capture.
+    """
+    import time
+
+    from elf import ElfError
+    from log_decode import ElfStrings, FrameDecoder, TextDecoder
+    from rich.text import Text
+    from serial_capture import DEFAULT_BAUD, CaptureError, monitor, open_port
+
+    board_config = board_config or {}
+    baud = baud or board_config.get("baud") or DEFAULT_BAUD
+    log_format = log_format or board_config.get("log_format") or "text"
+    if log_format not in ("text", "binary"):
+        console.print(Panel(f"[bold red]Error: Unknown log format '{log_format}'. Choose text or binary.[/bold red]", title="[bold red]Monitor Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+    if log_format == "binary":
+        if not elf_file or not os.path.exists(elf_file):
+            console.print(Panel(f"[bold red]Error: Binary logs are decoded against the firmware's ELF, which was not found{f' at {elf_file}' if elf_file else ''}. Build the project or pass --elf.[/bold red]", title="[bold red]Monitor Error[/bold red]", border_style="red"))
+            raise typer.Exit(code=1)
+        try:
+            decoder = FrameDecoder(ElfStrings(elf_file))
+        except ElfError as e:
+            console.print(Panel(f"[bold red]Error: {e}[/bold red]", title="[bold red]Monitor Error[/bold red]", border_style="red"))
+            raise typer.Exit(code=1)
+    else:
+        decoder = TextDecoder()
+
+    try:
+        fd = open_port(port, int(baud))
+    except CaptureError as e:
+        console.print(Panel(f"[bold red]Error: {e}[/bold red]", title="[bold red]Monitor Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+
+    capture_fd = None
+    if capture_path:
+        os.makedirs(os.path.dirname(os.path.abspath(capture_path)), exist_ok=True)
+        capture_fd = os.open(capture_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+
+    console.print(f"[bold blue]Monitoring {port} at {baud} baud ({log_format} logs). Press Ctrl-C to stop.[/bold blue]")
+
+    def render(records, skipped):
+        # One Text per frame keeps rich's per-call overhead off each line.
+        text = Text()
+        if skipped["bytes"] or skipped["records"]:
+            text.append(f"… {skipped['bytes']} bytes / {skipped['records']} lines not shown, see the capture file\n", style="yellow")
+        for record in records:
+            if record.timestamp is not None:
+                text.append(f"[{record.timestamp / 1e6:12.6f}] ", style="dim")
+            if record.level is not None:
+                text.append(f"{record.level.upper():<5} ", style=_LOG_LEVEL_STYLES.get(record.level, "white"))
+            text.append(record.text + "\n")
+        text.rstrip()
+        console.print(text, highlight=False, soft_wrap=True)
+
+    try:
+        summary = monitor(fd, decoder, render, capture_fd=capture_fd, fps=fps, duration=duration)
+    finally:
+        os.close(fd)
+        if capture_fd is not None:
+            os.close(capture_fd)
+
+    reasons = {"disconnected": "the device disconnected", "closed": "the port closed", "duration": "the time limit was reached", "interrupted": "interrupted", "stopped": "stopped"}
+    rate = summary["bytes"] / summary["duration"] if summary["duration"] else 0
+    details = f"{summary['bytes']} bytes in {summary['duration']:.1f}s ({rate / 1024:.1f} KiB/s), {summary['records']} lines shown"
+    if summary["skipped_bytes"]:
+        details += f", {summary['skipped_bytes']} bytes not shown"
+    if capture_path:
+        details += f"\nRaw capture: {capture_path}"
+    console.print(Panel(details, title=f"[bold blue]Monitor stopped: {reasons.get(summary['reason'], summary['reason'])}[/bold blue]", border_style="blue"))
+    if summary["reason"].startswith("error"):
+        raise typer.Exit(code=1)
+
+def _board_port(board_config):
+    """
+    The port from .board.json, else the only attached device matching the board.
+    """
+    if board_config.get("port"):
+        return board_config["port"]
+    from devices import discover_devices, match_devices
+
+    devices = match_devices(discover_devices(), _upload_config(board_config))
+    return devices[0].port if len(devices) == 1 else None
+
+def _default_capture_path(project_root):
+    import time
+
+    return os.path.join(project_root, ".embed", "monitor", time.strftime("capture-%Y%m%d-%H%M%S.bin"))
+
+@app.command("monitor")
+def monitor_command(
+    ctx: typer.Context,
+    project: Annotated[str, typer.Option("--project", "-P", help="Project to use, by name or path within the workspace (see 'embed projects'), instead of the current one.")] = None,
+    port: Annotated[str, typer.Option("--port", "-p", help="Serial port to read (defaults to 'port' in .board.json, else the one attached device matching the board).")] = None,
+    baud: Annotated[int, typer.Option("--baud", help="Baud rate (defaults to 'baud' in .board.json, else 115200).")] = None,
+    log_format: Annotated[str, typer.Option("--format", help="Log format: text, or binary frames decoded against the ELF (defaults to 'log_format' in .board.json).")] = None,
+    elf: Annotated[str, typer.Option("--elf", help="ELF to decode binary logs against (defaults to the project's build output).")] = None,
+    profile: Annotated[str, typer.Option("--profile", help="Build profile whose ELF to decode against: dev, release or size.")] = None,
+    capture: Annotated[str, typer.Option("--capture", help="File to write the raw capture to (defaults to .embed/monitor/ in the project).")] = None,
+    fps: Annotated[int, typer.Option("--fps", help="Screen updates per second.")] = 30,
+    duration: Annotated[float, typer.Option("--duration", help="Stop after this many seconds.")] = None,
+):
+    """
+    Shows a device's serial output while capturing it raw to disk.
+    """
+    from project import elf_path
+
+    project_root, board_config = _project_context(ctx, project)
+    board_config = board_config or {}
+    port = port or (_board_port(board_config) if board_config else None)
+    if not port:
+        console.print(Panel("[bold red]Error: No serial port to monitor. Pass --port, or set 'port' in .board.json.[/bold red]", title="[bold red]Monitor Error[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+    if not elf and project_root and board_config:
+        elf = elf_path(project_root, board_config, profile=profile or board_config.get("profile", "dev"))
+    if not capture and project_root:
+        capture = _default_capture_path(project_root)
+    _monitor_port(port, baud=baud, log_format=log_format, elf_file=elf, capture_path=capture, fps=max(1, fps), duration=duration, board_config=board_config)
+
+def _format_bytes(count):
+    for unit in ("B", "KiB", "MiB"):
+        if count < 1024:
+            return f"{count:.0f} {unit}" if unit == "B" else f"{count:.1f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GiB"
+
+def _install_with_script():
+    """
+    Runs the package-manager install in the Bash frontend, its output going
+    straight to the terminal so prompts and progress show as they happen.
+    """
+    import subprocess
+
+    embed_script_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "embed")
+    env = dict(os.environ)
+    env.pop("EMBED_TOOLCHAIN_MIRROR", None)  # The script would hand mirror installs back to us.
+    with tracing.subprocess_span([embed_script_path, "install"]):
+        returncode = subprocess.run([embed_script_path, "install"], cwd=os.path.dirname(embed_script_path), env=env).returncode
+    if returncode != 0:
+        console.print(Panel(f"Toolchain installation failed with error code {returncode}.", title="[bold red]Toolchain Installation Failed[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+
+@app.command()
+def install(
+    toolchains: Annotated[list[str], typer.Argument(help="Toolchains to install (defaults to every toolchain the boards use).")] = None,
+    boards: Annotated[list[str], typer.Option("--board", "-b", help="Install the toolchain of this board; repeat or comma-separate for several.")] = None,
+    jobs: Annotated[int, typer.Option("--jobs", "-j", help="Toolchains to download and unpack at the same time.")] = 4,
+    force: Annotated[bool, typer.Option("--force", help="Reinstall toolchains that are already up to date.")] = False,
+):
     """
     Installs required toolchains.
+
+    With EMBED_TOOLCHAIN_MIRROR set, toolchain archives are fetched from
+    the mirror, checked against its sha256 sums, kept in a shared cache
+    and unpacked in parallel; otherwise the system package manager is used.
     """
-    console.print("[bold blue]Installing required toolchains...[/bold blue]")
-    embed_script_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "embed")
+    import time
+
+    from board_index import find_board, load_board_index
+    from toolchain_install import InstallError, board_toolchains, fetch_index, install_root, install_toolchains, mirror_url, resolve_toolchains
+
+    index_url = mirror_url()
+    if index_url is None:
+        if toolchains or boards:
+            console.print(Panel("[bold red]Error: Installing specific toolchains needs a mirror. Set EMBED_TOOLCHAIN_MIRROR to the URL of its index.json.[/bold red]", title="[bold red]Toolchain Installation Failed[/bold red]", border_style="red"))
+            raise typer.Exit(code=1)
+        console.print("[bold blue]Installing required toolchains...[/bold blue]")
+        _install_with_script()
+        return
+
+    board_names = [name.strip() for value in boards or [] for name in value.split(",") if name.strip()]
+    index = load_board_index()
+    wanted = list(toolchains or [])
+    if board_names:
+        unknown = [name for name in board_names if find_board(index, name) is None]
+        if unknown:
+            console.print(Panel(f"[bold red]Error: Unknown board(s): {', '.join(unknown)}. See 'embed board list'.[/bold red]", title="[bold red]Board Not Found[/bold red]", border_style="red"))
+            raise typer.Exit(code=1)
+        wanted += board_toolchains([find_board(index, name) for name in board_names])
+    elif not wanted:
+        wanted = board_toolchains(index["boards"])
+    wanted = list(dict.fromkeys(wanted))
+
     try:
-        result = subprocess.run([embed_script_path, "install"], capture_output=True, text=True, check=True, cwd=os.path.dirname(embed_script_path))
-        console.print(Panel(result.stdout, title="[bold green]Toolchain Installation Summary[/bold green]", border_style="green"))
-        if result.stderr:
-            console.print(Panel(result.stderr, title="[bold yellow]Toolchain Installation Warnings/Errors[/bold yellow]", border_style="yellow"))
-    except subprocess.CalledProcessError as e:
-        console.print(Panel(f"Toolchain installation failed with error code {e.returncode}:\n{e.stdout}\n{e.stderr}", title="[bold red]Toolchain Installation Failed[/bold red]", border_style="red"))
+        with console.status("[bold blue]Reading the toolchain index...[/bold blue]"):
+            plans, missing = resolve_toolchains(fetch_index(index_url), wanted, index_url)
+    except InstallError as e:
+        console.print(Panel(f"[bold red]Error: {e}[/bold red]", title="[bold red]Toolchain Installation Failed[/bold red]", border_style="red"))
+        raise typer.Exit(code=1)
+    for name in missing:
+        console.print(f"[yellow]![/yellow] {name} is not on the mirror for this platform; skipping.")
+    if not plans:
+        console.print(Panel("[bold yellow]Nothing to install.[/bold yellow]", title="[bold yellow]Toolchain Installation[/bold yellow]", border_style="yellow"))
+        raise typer.Exit(code=1 if missing else 0)
+
+    root = install_root()
+    console.print(Panel(f"[bold blue]Installing {len(plans)} toolchain(s) into {root}, {min(jobs, len(plans))} at a time[/bold blue]", title="[bold blue]Toolchain Installation[/bold blue]", border_style="blue"))
+
+    started = time.monotonic()
+    with console.status("[bold blue]Installing...[/bold blue]") as status:
+        downloads = {}
+        last_update = [0.0]
+
+        def show_downloads(force_update=False):
+            now = time.monotonic()
+            # Downloads report every chunk; redrawing that often costs more than it shows.
+            if not force_update and now - last_update[0] < 0.1:
+                return
+            last_update[0] = now
+            parts = [f"{name} {_format_bytes(done)}" + (f"/{_format_bytes(total)}" if total else "") for name, (done, total) in sorted(downloads.items())]
+            status.update("[bold blue]Installing...[/bold blue] " + ", ".join(parts))
+
+        def on_event(name, event, detail):
+            if event == "download":
+                downloads[name] = detail
+                show_downloads()
+                return
+            if event == "cached":
+                console.print(f"[cyan]•[/cyan] {name} archive found in the cache")
+            elif event == "unpack":
+                downloads.pop(name, None)
+                console.print(f"[cyan]•[/cyan] unpacking {name}")
+            elif event in ("installed", "current"):
+                console.print(f"[green]✔[/green] {name}" + (" already up to date" if event == "current" else ""))
+            elif event == "failed":
+                downloads.pop(name, None)
+                console.print(f"[red]✖[/red] {name}")
+            show_downloads(force_update=True)
+
+        results = install_toolchains(plans, root=root, jobs=jobs, force=force, on_event=on_event)
+    wall_time = time.monotonic() - started
+
+    table = Table(title="[bold magenta]Toolchain Installation Summary[/bold magenta]")
+    table.add_column("Toolchain", style="cyan", no_wrap=True)
+    table.add_column("Version", style="white")
+    table.add_column("Status")
+    table.add_column("Time", justify="right")
+    table.add_column("Path/Details", style="green")
+    labels = {"current": "[bold green]✔ Up to date[/bold green]", "cached": "[bold green]✔ Installed (cached)[/bold green]", "downloaded": "[bold green]✔ Installed[/bold green]", "failed": "[bold red]✖ FAILED[/bold red]"}
+    for result in results:
+        table.add_row(result["name"], result["version"] or "-", labels[result["status"]], f"{result['duration']:.1f}s", result["path"] if result["ok"] else result["detail"])
+    table.caption = f"wall time {wall_time:.1f}s"
+    console.print(table)
+
+    bin_dir = os.path.join(root, "bin")
+    if any(result["ok"] for result in results) and bin_dir not in os.environ.get("PATH", "").split(os.pathsep):
+        console.print(f"[yellow]Add {bin_dir} to your PATH to use the installed toolchains.[/yellow]")
+    if missing or not all(result["ok"] for result in results):
         raise typer.Exit(code=1)
 
 @app.command("check-tools")
-def check_tools_command():
+def check_tools_command(
+    as_json: Annotated[bool, typer.Option("--json", help="Print the toolchain status as JSON.")] = False,
+    refresh: Annotated[bool, typer.Option("--refresh", help="Ignore cached results and probe every tool again.")] = False,
+):
     """
     Checks the status of all supported toolchains and displays them in a table.
     """
-    console.print("[bold blue]Checking toolchain status...[/bold blue]")
-    embed_script_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "embed")
+    from toolchain import probe_tools
+
+    if as_json:
+        print(json.dumps(probe_tools(refresh=refresh), indent=2))
+        return
+
+    with console.status("[bold blue]Checking toolchain status...[/bold blue]"):
+        tools = probe_tools(refresh=refresh)
+
+    table = Table(title="[bold magenta]Toolchain Status Summary[/bold magenta]")
+    table.add_column("Family", style="blue", no_wrap=True)
+    table.add_column("Tool", style="cyan", no_wrap=True)
+    table.add_column("Status", style="magenta")
+    table.add_column("Path/Details", style="green")
+    table.add_column("Version", style="white")
+
+    for tool in tools:
+        if tool["installed"]:
+            status = "[bold green]✔ Installed[/bold green]"
+        else:
+            status = "[bold red]✖ NOT Installed[/bold red]"
+        table.add_row(tool["family"], tool["name"], status, tool["path"] or tool["command"], tool["version"] or "")
+
+    console.print(table)
+
+_daemon_click_command = None
+
+
+class _ThreadStream:
+    """
+    Stands in for sys.stdout/sys.stderr in the daemon: writes go to the
+    client of the command running on the current thread, so a query can run
+    alongside a build without their output mixing.
+    """
+
+    def __init__(self, name, default):
+        self._name = name
+        self._default = default
+
+    def __getattr__(self, attribute):
+        return getattr(getattr(_daemon_local, self._name, None) or self._default, attribute)
+
+
+def _run_daemon_command(argv, stdout, stderr, terminal, cancel=None):
+    """
+    Runs one forwarded command line inside the daemon, writing to the
+    client's streams as if it ran in the client's terminal.
+    """
+    from rich.console import Console
+
+    global _daemon_click_command
+    if _daemon_click_command is None:
+        # Building the click command from the typer app costs more than most
+        # commands themselves, so the daemon does it once.
+        _daemon_click_command = typer.main.get_command(app)
+
+    _daemon_local.stdout, _daemon_local.stderr = stdout, stderr
+    _daemon_local.console = Console(file=stdout, width=terminal.get("columns"), force_terminal=terminal.get("tty", False))
+    _daemon_local.cancel = cancel
     try:
-        result = subprocess.run([embed_script_path, "check-tools"], capture_output=True, text=True, cwd=os.path.dirname(embed_script_path))
-        
-        table = Table(title="[bold magenta]Toolchain Status Summary[/bold magenta]")
-        table.add_column("Tool", style="cyan", no_wrap=True)
-        table.add_column("Status", style="magenta")
-        table.add_column("Path/Details", style="green")
-
-        # Parse the output
-        lines = result.stdout.strip().split('\n')
-        # Skip the header and divider lines
-        data_lines = [line for line in lines if "│" in line and "---" not in line]
-
-        for line in data_lines:
-            parts = line.split('│')
-            if len(parts) >= 3:
-                tool = parts[0].strip()
-                status = parts[1].strip()
-                path = '│'.join(parts[2:]).strip() # Join remaining parts for path/details
-                
-                # Add color to status
-                if "✔ Installed" in status:
-                    status = "[bold green]✔ Installed[/bold green]"
-                elif "✖ NOT Installed" in status:
-                    status = "[bold red]✖ NOT Installed[/bold red]"
-                
-                table.add_row(tool, status, path)
-        
-        console.print(table)
+        _daemon_click_command.main(args=argv, prog_name="embed")
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        import traceback
 
-    except subprocess.CalledProcessError as e:
-        console.print(Panel(f"Toolchain check failed with error code {e.returncode}:\n{e.stdout}\n{e.stderr}", title="[bold red]Toolchain Check Failed[/bold red]", border_style="red"))
+        traceback.print_exc()
+        return 1
+    finally:
+        _daemon_local.stdout = _daemon_local.stderr = _daemon_local.console = _daemon_local.cancel = None
+    return 0
+
+def _warm_daemon():
+    # Import what commands render with and load the registries once up front.
+    from rich.panel import Panel
+    from rich.table import Table
+
+    from board_index import load_board_index
+    from board_search import load_search_index
+    from toolchain import probe_tools
+
+    global _daemon_click_command
+    _daemon_click_command = typer.main.get_command(app)
+    load_search_index(load_board_index())
+    probe_tools()
+
+@daemon_app.command("run")
+def daemon_run(
+    idle_timeout: Annotated[int, typer.Option("--idle-timeout", help="Exit after this many seconds without a command.")] = 3600,
+):
+    """
+    Runs the daemon in the foreground.
+    """
+    from daemon import serve
+
+    sys.stdout = _ThreadStream("stdout", sys.stdout)
+    sys.stderr = _ThreadStream("stderr", sys.stderr)
+    try:
+        serve(_run_daemon_command, idle_timeout=idle_timeout, warm=_warm_daemon, log=print)
+    except OSError as e:
+        console.print(Panel(f"[bold red]Error: {e}[/bold red]", title="[bold red]Daemon Error[/bold red]", border_style="red"))
         raise typer.Exit(code=1)
 
+@daemon_app.command("start")
+def daemon_start(
+    idle_timeout: Annotated[int, typer.Option("--idle-timeout", help="Exit after this many seconds without a command.")] = 3600,
+):
+    """
+    Starts the daemon in the background.
+    """
+    import subprocess
+    import time
+
+    from cache import cache_dir
+    from daemon import request, socket_path
+
+    status = request("status")
+    if status:
+        console.print(f"[bold green]embed daemon already running (pid {status['pid']}).[/bold green]")
+        return
+
+    log_path = os.path.join(cache_dir(), "daemon.log")
+    with open(log_path, "a") as log:
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "daemon", "run", f"--idle-timeout={idle_timeout}"],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, start_new_session=True, close_fds=True,
+        )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        status = request("status")
+        if status:
+            console.print(Panel(f"[bold green]embed daemon started (pid {status['pid']}).[/bold green]\nSocket: {status['socket']}\nLog: {log_path}", title="[bold green]Success[/bold green]", border_style="green"))
+            return
+        time.sleep(0.05)
+    console.print(Panel(f"[bold red]Error: The daemon did not come up on {socket_path()}. See {log_path}.[/bold red]", title="[bold red]Daemon Error[/bold red]", border_style="red"))
+    raise typer.Exit(code=1)
+
+@daemon_app.command("stop")
+def daemon_stop():
+    """
+    Stops the background daemon.
+    """
+    from daemon import request
+
+    if request("stop") is None:
+        console.print("[bold yellow]No embed daemon is running.[/bold yellow]")
+        return
+    console.print("[bold green]embed daemon stopping.[/bold green]")
+
+@daemon_app.command("status")
+def daemon_status(
+    as_json: Annotated[bool, typer.Option("--json", help="Print the daemon status as JSON.")] = False,
+):
+    """
+    Shows whether the daemon is running and what it keeps warm.
+    """
+    from daemon import request
+
+    status = request("status")
+    if as_json:
+        print(json.dumps(status, indent=2))
+        return
+    if status is None:
+        console.print("[bold yellow]No embed daemon is running; commands run in-process.[/bold yellow]")
+        return
+    table = Table(title="[bold magenta]embed daemon[/bold magenta]")
+    table.add_column("Property", style="cyan")
+    table.add_column("Value", style="green")
+    for key, value in status.items():
+        table.add_row(key, str(value))
+    console.print(table)
+
+def _defer_commands():
+    """
+    Moves the app's commands and sub-apps behind _LazyGroup, so building the
+    click command (on every run) no longer converts all of them.
+    """
+    from functools import partial
+
+    from typer.main import get_command_from_info, get_command_name, get_group_from_info
+
+    options = {"pretty_exceptions_short": app.pretty_exceptions_short, "rich_markup_mode": app.rich_markup_mode}
+    for info in app.registered_commands:
+        name = info.name or get_command_name(info.callback.__name__)
+        _LazyGroup.deferred[name] = partial(get_command_from_info, info, **options)
+    for info in app.registered_groups:
+        _LazyGroup.deferred[info.name] = partial(get_group_from_info, info, suggest_commands=app.suggest_commands, **options)
+    app.registered_commands.clear()
+    app.registered_groups.clear()
+
 @app.callback()
 def main(
     ctx: typer.Context,
     verbose: Annotated[bool, typer.Option("--verbose", "-v", help="Enable verbose output.")] = False,
+    trace: Annotated[str, typer.Option("--trace", help="Write a Chrome trace (chrome://tracing, Perfetto) of this run to FILE.")] = None,
 ):
     """
     Embed-Check CLI for embedded development.
     """
     ctx.ensure_object(dict)
     ctx.obj["verbose"] = verbose
-
-    project_root = _find_project_root()
-    if project_root:
-        ctx.obj["project_root"] = project_root
-        with open(os.path.join(project_root, ".board.json"), "r") as f:
-            ctx.obj["board_config"] = json.load(f)
+    if trace:
+        tracing.enable(trace)
 
     if verbose:
         console.print(Panel("[bold yellow]Verbose mode enabled.[/bold yellow]", title="[bold yellow]Verbose Output[/bold yellow]", border_style="yellow"))
 
+_defer_commands()
+
 if __name__ == "__main__":
     if len(sys.argv) == 1:
         # Display a welcome message when no arguments are provided
@@ -530,4 +1512,5 @@ if __name__ == "__main__":
         )
         console.print(welcome_message)
     else:
-        app()
\ No newline at end of file
+        with tracing.span("embed", category="command", argv=sys.argv[1:]):
+            app()
\ No newline at end of file
@@ -0,0 +1,25 @@
+import re
+
+# `SRCS := \` followed by backslash-continued lines, as in templates/c/Makefile.
+_SRCS_RE = re.compile(r"^SRCS[ \t]*:?=(?P<body>(?:[^\n]*\\\n)*[^\n]*)$", re.MULTILINE)
+
+
+def _format_sources(sources):
+    return "SRCS := \\\n" + " \\\n".join(f"\t{source}" for source in sources)
+
+
+def add_makefile_sources(text, sources):
+    """
+    Returns `text` with `sources` appended to its SRCS list.
+
+    Sources already listed are left alone, so re-adding a module is a no-op.
+    Raises ValueError if the Makefile has no SRCS list to edit.
+    """
+    match = _SRCS_RE.search(text)
+    if not match:
+        raise ValueError("Makefile has no SRCS list.")
+    current = match["body"].replace("\\\n", " ").split()
+    added = [source for source in sources if source not in current]
+    if not added:
+        return text
+    return text[:match.start()] + _format_sources(current + added) + text[match.end():]
@@ -0,0 +1,161 @@
+import json
+import os
+import re
+import shutil
+import time
+
+from build_cache import IGNORED_DIRS, IGNORED_SUFFIXES
+from build_runner import run_build
+from project import build_command, cross_compile_prefix, elf_path, rust_target
+
+MATRIX_DIR = os.path.join(".embed", "matrix")
+
+
+def _sync_tree(source_root, destination_root, skip=()):
+    """
+    Mirrors the project's inputs into an out-of-tree build dir.
+
+    Files are copied with their mtimes and only when size or mtime differ,
+    so make and cargo see an unchanged tree as unchanged and stay incremental.
+    """
+    skip = {os.path.abspath(path) for path in skip}
+    # Build outputs that live next to the sources are neither copied nor
+    # pruned, so the previous build's output survives for incremental builds.
+    kept = {os.path.relpath(path, source_root) for path in skip}
+    wanted = set()
+    for directory, dir_names, file_names in os.walk(source_root):
+        dir_names[:] = [name for name in dir_names if name not in IGNORED_DIRS]
+        for name in file_names:
+            source = os.path.join(directory, name)
+            if name.endswith(IGNORED_SUFFIXES) or source in skip:
+                continue
+            relative = os.path.relpath(source, source_root)
+            destination = os.path.join(destination_root, relative)
+            wanted.add(relative)
+            source_stat = os.stat(source)
+            try:
+                destination_stat = os.stat(destination)
+                if destination_stat.st_size == source_stat.st_size and destination_stat.st_mtime_ns == source_stat.st_mtime_ns:
+                    continue
+            except OSError:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copy2(source, destination)
+
+    # Drop inputs that were deleted from the project since the last sync.
+    for directory, dir_names, file_names in os.walk(destination_root):
+        dir_names[:] = [name for name in dir_names if name not in IGNORED_DIRS]
+        for name in file_names:
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, destination_root)
+            if relative not in wanted and relative not in kept and not name.endswith(IGNORED_SUFFIXES):
+                os.unlink(path)
+
+
+def plan_targets(projects, boards, profile="dev", registry=None):
+    """
+    Expands projects x boards into build targets.
+
+    `projects` is a list of (project_root, board_config); an empty `boards`
+    builds every project for the board in its own .board.json. `registry`
+    maps board names to their boards/*.json config, whose toolchain picks
+    the cell's compiler (CROSS_COMPILE for C, --target for Rust).
+    """
+    registry = registry or {}
+    targets = []
+    for project_root, board_config in projects:
+        for board in boards or [board_config.get("name")]:
+            registry_config = registry.get(board) or {}
+            targets.append({
+                "project_root": project_root,
+                "board": board,
+                "language": board_config.get("language"),
+                "profile": profile,
+                "cross_compile": cross_compile_prefix(registry_config.get("toolchain")),
+                "rust_target": rust_target(registry_config),
+                "board_config": dict(board_config, name=board),
+                "build_dir": os.path.join(project_root, MATRIX_DIR, re.sub(r"[^A-Za-z0-9._-]+", "-", board)),
+            })
+    return targets
+
+
+def _new_result(target):
+    return {
+        "project": os.path.basename(target["project_root"]),
+        "project_root": target["project_root"],
+        "board": target["board"],
+        "ok": False,
+        "returncode": None,
+        "errors": 0,
+        "warnings": 0,
+        "elf": None,
+        "tail": [],
+    }
+
+
+def build_target(target):
+    """
+    Builds one matrix target in its own build dir; runs in a worker process.
+    """
+    started = time.monotonic()
+    project_root = target["project_root"]
+    build_dir = target["build_dir"]
+    result = _new_result(target)
+    command = build_command(target["language"], target["profile"], board=target["board"], cross_compile=target.get("cross_compile"), target=target.get("rust_target"))
+    if command is None:
+        result["tail"] = [f"Unsupported language '{target['language']}'."]
+        result["duration"] = time.monotonic() - started
+        return result
+
+    os.makedirs(build_dir, exist_ok=True)
+    _sync_tree(project_root, build_dir, skip=[elf_path(project_root, target["board_config"], profile=target["profile"], target=target.get("rust_target"))])
+    with open(os.path.join(build_dir, ".board.json"), "w") as f:
+        json.dump(target["board_config"], f, indent=2)
+
+    env = dict(os.environ, EMBED_BOARD=target["board"], CARGO_TARGET_DIR=os.path.join(build_dir, "target"))
+    try:
+        build = run_build(command, cwd=build_dir, env=env, tail_lines=20)
+    except FileNotFoundError:
+        result["tail"] = [f"Build tool '{command[0]}' not found."]
+        result["duration"] = time.monotonic() - started
+        return result
+
+    elf = elf_path(build_dir, target["board_config"], env=env, profile=target["profile"], target=target.get("rust_target"))
+    result.update(
+        ok=build.ok,
+        returncode=build.returncode,
+        errors=build.counts.get("error", 0),
+        warnings=build.counts.get("warning", 0),
+        elf=elf if build.ok and os.path.exists(elf) else None,
+        tail=[line for _stream, line in build.tail],
+        duration=time.monotonic() - started,
+    )
+    return result
+
+
+def run_matrix(targets, jobs=None, on_result=None):
+    """
+    Builds all targets on a process pool bounded by the core count.
+
+    A target whose worker raises (or dies) is reported as a failed cell;
+    the other targets keep building.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(targets)))
+    results = []
+    started = time.monotonic()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(build_target, target): target for target in targets}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = _new_result(futures[future])
+                result["tail"] = [f"Build worker failed: {type(e).__name__}: {e}"]
+                result["duration"] = time.monotonic() - started
+            results.append(result)
+            if on_result:
+                on_result(result)
+    order = {(t["project_root"], t["board"]): i for i, t in enumerate(targets)}
+    results.sort(key=lambda r: order[(r["project_root"], r["board"])])
+    return results
@@ -0,0 +1,220 @@
+import json
+import os
+import re
+from string import Template
+
+from makefile import add_makefile_sources
+
+# Compiled once at import; rendering a module is then a single substitute().
+RUST_MODULE = Template("""\
+// $name $type module (Rust) - $conn connection
+pub struct $struct {
+    // Add $conn specific fields here
+}
+
+impl $struct {
+    pub fn new() -> Self {
+        // Initialize $name module
+        Self {}
+    }
+
+    pub fn read(&mut self) -> u32 {
+        // Read data from $name
+        0
+    }
+
+    pub fn write(&mut self, value: u32) {
+        // Write data to $name
+    }
+}
+""")
+
+C_HEADER = Template("""\
+// $name $type module (C) - $conn connection
+#ifndef ${guard}_H
+#define ${guard}_H
+
+#include <stdint.h>
+
+typedef struct {
+    // Add $conn specific fields here
+} $struct;
+
+void ${struct}_init($struct* module);
+uint32_t ${struct}_read($struct* module);
+void ${struct}_write($struct* module, uint32_t value);
+
+#endif // ${guard}_H
+""")
+
+C_SOURCE = Template("""\
+// $name $type module (C) implementation
+#include "$name.h"
+
+void ${struct}_init($struct* module) {
+    // Initialize $name module
+}
+
+uint32_t ${struct}_read($struct* module) {
+    // Read data from $name
+    return 0;
+}
+
+void ${struct}_write($struct* module, uint32_t value) {
+    // Write data to $name
+}
+""")
+
+_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class ModuleError(Exception):
+    pass
+
+
+def load_manifest(path):
+    """
+    Reads modules.json: a list of {"name", "type", "conn"} objects, either
+    at the top level or under a "modules" key.
+    """
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ModuleError(f"Could not read {path}: {e}") from None
+    if isinstance(data, dict):
+        data = data.get("modules", [])
+    modules = []
+    for index, entry in enumerate(data):
+        if not isinstance(entry, dict) or not entry.get("name") or not entry.get("type") or not (entry.get("conn") or entry.get("connection")):
+            raise ModuleError(f"Entry {index} in {path} needs 'name', 'type' and 'conn'.")
+        modules.append({"name": entry["name"], "type": entry["type"], "conn": entry.get("conn") or entry.get("connection")})
+    return modules
+
+
+def render_module(language, module):
+    """
+    Returns {relative_path: content} for one module.
+    """
+    name = module["name"]
+    if not _NAME_RE.match(name):
+        raise ModuleError(f"'{name}' is not a valid module name.")
+    values = {"name": name, "type": module["type"], "conn": module["conn"], "struct": name.capitalize(), "guard": name.upper()}
+    if language == "rust":
+        return {os.path.join("src", f"{name}.rs"): RUST_MODULE.substitute(values)}
+    if language == "c":
+        return {
+            os.path.join("modules", f"{name}.h"): C_HEADER.substitute(values),
+            os.path.join("modules", f"{name}.c"): C_SOURCE.substitute(values),
+        }
+    raise ModuleError(f"Unsupported language '{language}' for module generation.")
+
+
+def _read(path):
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _add_mod_declarations(text, names):
+    declared = set(re.findall(r"^\s*(?:pub(?:\([^)]*\))?\s+)?mod\s+(\w+)\s*;", text, re.MULTILINE))
+    missing = [name for name in names if name not in declared]
+    if not missing:
+        return text
+    if text and not text.endswith("\n"):
+        text += "\n"
+    return text + "\n" + "".join(f"mod {name};\n" for name in missing)
+
+
+def plan_modules(project_root, language, modules, force=False):
+    """
+    Renders every module and works out the single edit of main.rs/lib.rs
+    or the Makefile that registers them.
+
+    Only missing module files are created; an existing file that differs
+    from the template may hold the user's code and is skipped unless
+    `force` is set. Returns (writes, statuses, warnings, skipped):
+    `writes` maps absolute paths to new content and leaves out files whose
+    content would not change, `skipped` lists the existing files left alone.
+    """
+    names = [module["name"] for module in modules]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ModuleError(f"Duplicate module name(s): {', '.join(duplicates)}.")
+
+    writes = {}
+    statuses = {}
+    warnings = []
+    skipped = []
+    for module in modules:
+        status = "unchanged"
+        for relative, content in render_module(language, module).items():
+            path = os.path.join(project_root, relative)
+            existing = _read(path)
+            if existing == content:
+                continue
+            if existing is not None and not force:
+                skipped.append(path)
+                if status == "unchanged":
+                    status = "skipped"
+                continue
+            writes[path] = content
+            status = "created" if existing is None and status != "updated" else "updated"
+        statuses[module["name"]] = status
+
+    if language == "rust":
+        for candidate in ("main.rs", "lib.rs"):
+            path = os.path.join(project_root, "src", candidate)
+            text = _read(path)
+            if text is not None:
+                updated = _add_mod_declarations(text, names)
+                if updated != text:
+                    writes[path] = updated
+                break
+        else:
+            warnings.append(f"Neither src/main.rs nor src/lib.rs found. Please declare the modules manually: {', '.join(names)}.")
+    else:
+        path = os.path.join(project_root, "Makefile")
+        text = _read(path)
+        sources = [f"modules/{name}.c" for name in names]
+        if text is None:
+            warnings.append("Makefile not found in project root. Please update manually.")
+        else:
+            try:
+                updated = add_makefile_sources(text, sources)
+            except ValueError:
+                warnings.append(f"No SRCS list found in Makefile. Please add {', '.join(sources)} manually.")
+            else:
+                if updated != text:
+                    writes[path] = updated
+    return writes, statuses, warnings, skipped
+
+
+def write_text_atomic(path, text):
+    """
+    Replaces `path` via a temp file and rename, keeping its permissions.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.embed-tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        try:
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        except OSError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def apply_writes(writes):
+    # New module files first, so the build files never reference a missing source.
+    for path in sorted(writes, key=lambda path: os.path.exists(path)):
+        write_text_atomic(path, writes[path])
@@ -0,0 +1,87 @@
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from delta_flash import FlashError, flash_delta, forget_device, run_template, supports_delta
+
+DEFAULT_JOBS = 8
+DEFAULT_RETRIES = 2
+
+
+def device_selector(board_config):
+    """
+    Returns the placeholder ("port" or "serial") through which the board's
+    flashing command picks a device, or None if it always takes the first
+    one it finds.
+    """
+    template = board_config.get("upload_range") if supports_delta(board_config) else board_config.get("upload")
+    for name in ("port", "serial"):
+        if "{" + name + "}" in (template or ""):
+            return name
+    return None
+
+
+def flash_device(elf_file, board_config, port, serial=None, full=False, run=subprocess.run):
+    """
+    Flashes one device: changed sectors if the board supports it, else its
+    full `upload` command. Returns a short description of what was written.
+    """
+    if supports_delta(board_config):
+        summary = flash_delta(elf_file, board_config, port=port, serial=serial, full=full, run=run)
+        return f"{summary['sectors_changed']}/{summary['sectors_total']} sectors"
+    template = board_config.get("upload")
+    if not template:
+        raise FlashError(f"Board '{board_config.get('name')}' has no upload command.")
+    # Whatever was recorded about this device's sectors is stale from here on.
+    forget_device(board_config.get("name", ""), serial)
+    run_template(template, {"elf": elf_file, "port": port, "serial": serial}, run)
+    return "full image"
+
+
+def flash_devices(elf_file, board_config, ports, serials=None, jobs=DEFAULT_JOBS, retries=DEFAULT_RETRIES, full=False, on_event=None, run=subprocess.run, retry_delay=0.5):
+    """
+    Flashes `ports` concurrently on a bounded thread pool.
+
+    `serials` maps ports to the USB serial of the device behind them.
+    Several devices are only flashed when the board's command can be aimed
+    at each of them, by port or by serial; otherwise FlashError is raised
+    before anything is written. Each device is retried up to `retries`
+    times. `on_event(port, event, detail)` reports "start", "retry", "ok"
+    and "failed" as they happen. Returns one result dict per port, in the
+    order given.
+    """
+    serials = serials or {}
+    if len(ports) > 1:
+        selector = device_selector(board_config)
+        if selector is None:
+            raise FlashError(f"The flash command of board '{board_config.get('name')}' cannot select a device by port or serial, so devices can only be flashed one at a time.")
+        unknown = [port for port in ports if selector == "serial" and not serials.get(port)]
+        if unknown:
+            raise FlashError(f"The flash command of board '{board_config.get('name')}' selects devices by USB serial, and the serial of {', '.join(unknown)} is unknown.")
+
+    def notify(port, event, detail=""):
+        if on_event:
+            on_event(port, event, detail)
+
+    def flash_one(port):
+        started = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            notify(port, "start" if attempts == 1 else "retry", attempts)
+            try:
+                detail = flash_device(elf_file, board_config, port, serial=serials.get(port), full=full, run=run)
+            except (FlashError, OSError) as e:
+                error = str(e)
+                if attempts <= retries:
+                    time.sleep(retry_delay * attempts)
+                    continue
+                notify(port, "failed", error)
+                return {"port": port, "ok": False, "attempts": attempts, "detail": error, "duration": time.monotonic() - started}
+            notify(port, "ok", detail)
+            return {"port": port, "ok": True, "attempts": attempts, "detail": detail, "duration": time.monotonic() - started}
+
+    if not ports:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(ports)))) as pool:
+        return list(pool.map(flash_one, ports))
@@ -0,0 +1,124 @@
+import os
+import re
+
+_PACKAGE_NAME_RE = re.compile(r'^\s*name\s*=\s*"([^"]+)"', re.MULTILINE)
+_BUILD_TARGET_RE = re.compile(r'^\s*target\s*=\s*"([^"]+)"', re.MULTILINE)
+
+PROFILES = ("dev", "release", "size")
+# Optimization level passed to the C Makefile's OPT variable per profile.
+C_OPT_LEVELS = {"dev": "-Og", "release": "-O2", "size": "-Os"}
+# Rust target triple per board `mcu`, unless the board sets `rust_target`.
+RUST_TARGETS = {
+    "cortex-m0": "thumbv6m-none-eabi",
+    "cortex-m3": "thumbv7m-none-eabi",
+    "cortex-m4": "thumbv7em-none-eabihf",
+    "cortex-m7": "thumbv7em-none-eabihf",
+    "cortex-m33": "thumbv8m.main-none-eabihf",
+    "xtensa-esp32": "xtensa-esp32-none-elf",
+    "xtensa-esp32s3": "xtensa-esp32s3-none-elf",
+    "riscv-esp32c3": "riscv32imc-unknown-none-elf",
+}
+
+
+def _read(path):
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+
+def _toml_section(text, section):
+    """
+    Returns the body of a `[section]` table; enough TOML for Cargo files.
+    """
+    match = re.search(rf"^\[{re.escape(section)}\]\s*$(.*?)(?=^\[|\Z)", text, re.MULTILINE | re.DOTALL)
+    return match.group(1) if match else ""
+
+
+def cargo_package_name(project_root):
+    match = _PACKAGE_NAME_RE.search(_toml_section(_read(os.path.join(project_root, "Cargo.toml")), "package"))
+    return match.group(1) if match else os.path.basename(project_root)
+
+
+def cargo_build_target(project_root):
+    match = _BUILD_TARGET_RE.search(_toml_section(_read(os.path.join(project_root, ".cargo", "config.toml")), "build"))
+    return match.group(1) if match else None
+
+
+def cargo_target_dir(project_root, env=None):
+    target_dir = (env if env is not None else os.environ).get("CARGO_TARGET_DIR")
+    return target_dir or os.path.join(project_root, "target")
+
+
+def shared_cargo_target_dir():
+    """
+    A CARGO_TARGET_DIR shared by all projects, so dependency crates are
+    compiled once per machine rather than once per project.
+    """
+    from cache import cache_dir
+
+    return cache_dir("cargo-target")
+
+
+def cargo_profile_dir(profile):
+    # Cargo puts the dev profile's output in target/debug.
+    return "debug" if profile == "dev" else profile
+
+
+def cross_compile_prefix(toolchain):
+    """
+    Returns the CROSS_COMPILE prefix of a board's `toolchain`, e.g.
+    "xtensa-esp32-elf-" for "xtensa-esp32-elf-gcc".
+    """
+    if not toolchain or not toolchain.endswith("gcc"):
+        return None
+    return toolchain[:-len("gcc")]
+
+
+def rust_target(board_config):
+    return board_config.get("rust_target") or RUST_TARGETS.get(board_config.get("mcu"))
+
+
+def build_command(language, profile="dev", board=None, cross_compile=None, target=None):
+    """
+    Returns the build command for a project, or None for unknown languages.
+
+    `cross_compile` (C) and `target` (Rust) override the toolchain the
+    project would pick by itself, for building it for another board.
+    """
+    if language == "rust":
+        if profile == "dev":
+            command = ["cargo", "build"]
+        elif profile == "release":
+            command = ["cargo", "build", "--release"]
+        else:
+            command = ["cargo", "build", "--profile", profile]
+        if target:
+            command += ["--target", target]
+        return command
+    if language == "c":
+        command = ["make"]
+        if board:
+            command.append(f"BOARD={board}")
+        if cross_compile:
+            command.append(f"CROSS_COMPILE={cross_compile}")
+        if profile != "dev":
+            command.append(f"OPT={C_OPT_LEVELS[profile]}")
+        return command
+    return None
+
+
+def elf_path(project_root, board_config, env=None, profile="dev", target=None):
+    """
+    Returns where the project's build leaves its firmware ELF.
+    """
+    language = board_config.get("language")
+    if language == "rust":
+        parts = [cargo_target_dir(project_root, env)]
+        target = target or cargo_build_target(project_root)
+        if target:
+            parts.append(target)
+        parts += [cargo_profile_dir(profile), cargo_package_name(project_root)]
+        return os.path.join(*parts)
+    return os.path.join(project_root, board_config.get("output", "main"))
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from build_cache import IGNORED_DIRS
+from cache import cache_dir, load_json, write_json_atomic
+
+INDEX_VERSION = 1
+# Never searched for projects: VCS metadata, build outputs and environments.
+PRUNED_DIRS = IGNORED_DIRS | {".hg", ".svn", ".venv", "venv", ".tox", "dist"}
+MAX_WORKERS = 16
+
+
+class ProjectLookupError(Exception):
+    pass
+
+
+def workspace_root(start=None):
+    """
+    The tree project names are looked up in: EMBED_WORKSPACE, else the
+    enclosing git checkout, else the current directory.
+    """
+    configured = os.environ.get("EMBED_WORKSPACE")
+    if configured:
+        return os.path.abspath(configured)
+    start = os.path.abspath(start or os.getcwd())
+    current = start
+    while True:
+        if os.path.exists(os.path.join(current, ".git")):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return start
+        current = parent
+
+
+def _index_path(root):
+    name = hashlib.sha1(root.encode()).hexdigest()
+    return os.path.join(cache_dir("projects"), f"{name}.json")
+
+
+def _visit(path, cached_dir):
+    """
+    Returns (dir_state, changed) for one directory, rescanning it only when
+    its mtime moved since `cached_dir` was recorded.
+    """
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None, True
+    if cached_dir and cached_dir["mtime_ns"] == mtime_ns:
+        return cached_dir, False
+    subdirs = []
+    project = False
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name == ".board.json":
+                    project = True
+                elif entry.name not in PRUNED_DIRS and entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+    except OSError:
+        return None, True
+    return {"mtime_ns": mtime_ns, "subdirs": sorted(subdirs), "project": project}, True
+
+
+def _read_project(path, cached_project):
+    board_file = os.path.join(path, ".board.json")
+    try:
+        st = os.stat(board_file)
+    except OSError:
+        return None
+    stamp = [st.st_mtime_ns, st.st_size]
+    if cached_project and cached_project["stamp"] == stamp:
+        return cached_project
+    try:
+        with open(board_file, "r") as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        config = {}
+    if not isinstance(config, dict):
+        config = {}
+    return {"stamp": stamp, "board": config.get("name"), "language": config.get("language")}
+
+
+def discover_projects(root, refresh=False, index_path=None, jobs=MAX_WORKERS):
+    """
+    Returns every project (directory with a .board.json) below `root`.
+
+    The tree is walked breadth-first with one os.scandir per directory,
+    spread over a thread pool. The result is cached per root: a directory
+    is only rescanned when its mtime changed, and a project's .board.json
+    only re-read when its own mtime or size did, so a warm call is one stat
+    per directory and per project.
+    """
+    root = os.path.abspath(root)
+    index_path = index_path or _index_path(root)
+    cached = {} if refresh else load_json(index_path, {})
+    if cached.get("version") != INDEX_VERSION or cached.get("root") != root:
+        cached = {}
+    cached_dirs = cached.get("dirs", {})
+    cached_projects = cached.get("projects", {})
+
+    dirs = {}
+    projects = {}
+    changed = not cached
+
+    def visit_chunk(paths):
+        return [(path, *_visit(path, cached_dirs.get(path))) for path in paths]
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        frontier = [root]
+        while frontier:
+            # One task per chunk of a level keeps the pool overhead off the
+            # warm path, where a directory costs a single stat.
+            size = max(64, -(-len(frontier) // jobs))
+            chunks = [frontier[start:start + size] for start in range(0, len(frontier), size)]
+            visited = [entry for chunk in pool.map(visit_chunk, chunks) for entry in chunk]
+            frontier = []
+            project_dirs = []
+            for path, state, dir_changed in visited:
+                changed = changed or dir_changed
+                if state is None:
+                    continue
+                dirs[path] = state
+                frontier.extend(os.path.join(path, name) for name in state["subdirs"])
+                if state["project"]:
+                    project_dirs.append(path)
+            for path, project in zip(project_dirs, pool.map(lambda path: _read_project(path, cached_projects.get(path)), project_dirs)):
+                if project is not None:
+                    projects[path] = project
+    changed = changed or set(dirs) != set(cached_dirs) or projects != cached_projects
+
+    if changed:
+        try:
+            write_json_atomic(index_path, {"version": INDEX_VERSION, "root": root, "dirs": dirs, "projects": projects})
+        except OSError:
+            pass
+
+    return [
+        {"name": os.path.basename(path), "path": path, "relative_path": os.path.relpath(path, root), "board": project["board"], "language": project["language"]}
+        for path, project in sorted(projects.items())
+    ]
+
+
+def find_project(name, root=None, projects=None):
+    """
+    Resolves a project by directory name or by a trailing part of its path
+    relative to the workspace (`motor-ctrl`, `drives/motor-ctrl`).
+    """
+    root = root or workspace_root()
+    if projects is None:
+        projects = discover_projects(root)
+    wanted = name.strip("/").replace("/", os.sep)
+    matches = [project for project in projects if project["relative_path"] == wanted]
+    if not matches:
+        matches = [project for project in projects if project["relative_path"].endswith(os.sep + wanted) or project["name"] == wanted]
+    if not matches:
+        raise ProjectLookupError(f"No project named '{name}' under {root}. See 'embed projects'.")
+    if len(matches) > 1:
+        raise ProjectLookupError(f"'{name}' matches several projects: {', '.join(project['relative_path'] for project in matches)}. Use more of its path.")
+    return matches[0]
@@ -0,0 +1,76 @@
+import _thread
+import os
+
+# None outside `embed daemon`: memo() then just calls through, so a normal
+# one-shot run keeps nothing in memory.
+_entries = None
+_watch = None
+_invalidations = 0
+# _thread rather than threading: this module is on the fast path's import chain.
+_lock = _thread.allocate_lock()
+
+
+def enable(watch):
+    """
+    Starts keeping memo() results in memory.
+
+    `watch(directory)` registers a directory with the daemon's watcher and
+    returns False if it cannot be watched; results depending on such a
+    directory are not kept.
+    """
+    global _entries, _watch
+    _entries = {}
+    _watch = watch
+
+
+def active():
+    return _entries is not None
+
+
+def memo(key, compute, watch=(), stamp=None, keep=None):
+    """
+    Returns compute(), reusing the last result for `key` in the daemon.
+
+    The result is dropped when anything in one of the `watch` directories
+    changes, or when `stamp` differs from the one it was stored with.
+    A result for which `keep(result)` is false is returned but not stored.
+    Callers must treat the result as read-only.
+    """
+    if _entries is None:
+        return compute()
+    with _lock:
+        entry = _entries.get(key)
+    if entry is not None and entry[1] == stamp:
+        return entry[0]
+    # Watch before computing, and only keep the result if nothing was
+    # invalidated meanwhile, so a change during compute() is never lost.
+    directories = tuple(os.path.abspath(directory) for directory in watch)
+    watching = all(_watch(directory) for directory in directories)
+    invalidations = _invalidations
+    value = compute()
+    if keep is not None and not keep(value):
+        return value
+    with _lock:
+        if watching and invalidations == _invalidations:
+            _entries[key] = (value, stamp, directories)
+    return value
+
+
+def invalidate(changed_paths):
+    """
+    Drops every entry watching a directory that `changed_paths` touch.
+    """
+    global _invalidations
+    if _entries is None or not changed_paths:
+        return 0
+    touched = set(changed_paths) | {os.path.dirname(path) for path in changed_paths}
+    with _lock:
+        _invalidations += 1
+        stale = [key for key, (_value, _stamp, directories) in _entries.items() if touched.intersection(directories)]
+        for key in stale:
+            del _entries[key]
+    return len(stale)
+
+
+def size():
+    return len(_entries) if _entries is not None else 0
@@ -0,0 +1,202 @@
+import json
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import cache_dir, load_json, write_json_atomic
+
+MANIFEST_VERSION = 1
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+TEMPLATE_ROOTS = {
+    "c": os.path.join(TEMPLATES_DIR, "c"),
+    "rust": os.path.join(TEMPLATES_DIR, "rust", "embedded_template"),
+}
+# Files `cargo new` used to add that are not part of the template tree.
+GENERATED_FILES = {
+    "rust": {".gitignore": "/target\n"},
+}
+FICLONE = 0x40049409
+
+_PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+_CARGO_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_-]*$")
+
+
+class ScaffoldError(Exception):
+    pass
+
+
+def _tree_stamp(root):
+    stamp = []
+    for directory, dir_names, file_names in os.walk(root):
+        dir_names.sort()
+        for name in sorted(file_names):
+            path = os.path.join(directory, name)
+            st = os.stat(path)
+            stamp.append([os.path.relpath(path, root), st.st_size, st.st_mtime_ns, st.st_mode])
+    return stamp
+
+
+def _parse_template(data):
+    """
+    Splits a text template into literal and placeholder parts.
+
+    Rendering is then one join over the parts, whatever the number of
+    placeholders; files without placeholders come back as None.
+    """
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    parts = _PLACEHOLDER_RE.split(text)
+    return parts if len(parts) > 1 else None
+
+
+def load_manifest(language, manifest_dir=None):
+    """
+    Returns the pre-parsed template tree for `language`, cached on disk.
+
+    The cache is keyed on the size, mtime and mode of every template file,
+    so an edited template is picked up on the next call.
+    """
+    root = TEMPLATE_ROOTS.get(language)
+    if not root or not os.path.isdir(root):
+        raise ScaffoldError(f"Template for language '{language}' not found.")
+    stamp = _tree_stamp(root)
+    # JSON rather than a pickle: the cache dir may be shared (EMBED_CACHE_DIR).
+    manifest_path = os.path.join(manifest_dir or cache_dir("templates"), f"{language}.json")
+    cached = load_json(manifest_path)
+    try:
+        if cached["version"] == MANIFEST_VERSION and cached["root"] == root and cached["stamp"] == stamp:
+            return cached
+    except (KeyError, TypeError):
+        pass
+
+    files = []
+    for relative, _size, _mtime_ns, mode in stamp:
+        with open(os.path.join(root, relative), "rb") as f:
+            parts = _parse_template(f.read())
+        files.append({"path": relative, "mode": mode & 0o7777, "parts": parts})
+    manifest = {"version": MANIFEST_VERSION, "root": root, "stamp": stamp, "files": files}
+    try:
+        write_json_atomic(manifest_path, manifest)
+    except OSError:
+        pass
+    return manifest
+
+
+def _render(parts, values):
+    # Odd indexes are placeholder names; unknown placeholders are left as they are.
+    return "".join(part if index % 2 == 0 else values.get(part, "{{" + part + "}}") for index, part in enumerate(parts))
+
+
+def _clone(source, destination, link):
+    """
+    Copies a static file, sharing its data blocks with the template if possible.
+    """
+    if link == "hardlink":
+        try:
+            os.link(source, destination)
+            return "hardlink"
+        except OSError:
+            pass
+    try:
+        import fcntl
+
+        with open(source, "rb") as src, open(destination, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return "reflink"
+    except (ImportError, OSError):
+        shutil.copyfile(source, destination)
+        return "copy"
+
+
+def render_project(language, project_path, values, board_config=None, link="reflink", manifest=None):
+    """
+    Creates a project from the language's template without any subprocess.
+
+    The tree is rendered into a temporary sibling directory and renamed into
+    place, so a project either appears complete or not at all. Returns
+    {"rendered", "linked", "copied"} file counts.
+    """
+    if os.path.exists(project_path):
+        raise ScaffoldError(f"Project directory '{os.path.basename(project_path)}' already exists.")
+    if language == "rust" and not _CARGO_NAME_RE.match(values.get("project_name", "")):
+        raise ScaffoldError(f"'{values.get('project_name')}' is not a valid Cargo package name.")
+    manifest = manifest or load_manifest(language)
+
+    tmp_path = os.path.join(os.path.dirname(project_path) or ".", f".{os.path.basename(project_path)}.embed-tmp-{os.getpid()}-{threading.get_ident()}")
+    counts = {"rendered": 0, "linked": 0, "copied": 0}
+    try:
+        os.makedirs(tmp_path)
+        for entry in manifest["files"]:
+            destination = os.path.join(tmp_path, entry["path"])
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            if entry["parts"] is None:
+                kind = _clone(os.path.join(manifest["root"], entry["path"]), destination, link)
+                counts["copied" if kind == "copy" else "linked"] += 1
+                if kind == "hardlink":
+                    continue
+            else:
+                with open(destination, "w") as f:
+                    f.write(_render(entry["parts"], values))
+                counts["rendered"] += 1
+            os.chmod(destination, entry["mode"])
+        for relative, content in GENERATED_FILES.get(language, {}).items():
+            with open(os.path.join(tmp_path, relative), "w") as f:
+                f.write(content)
+        if board_config is not None:
+            with open(os.path.join(tmp_path, ".board.json"), "w") as f:
+                json.dump(board_config, f, indent=2)
+        os.rename(tmp_path, project_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return counts
+
+
+def load_batch_spec(path):
+    """
+    Reads a batch spec: a list of {"name", "lang", "board"} objects, either
+    at the top level or under a "projects" key.
+    """
+    try:
+        with open(path, "r") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ScaffoldError(f"Could not read {path}: {e}") from None
+    if isinstance(data, dict):
+        data = data.get("projects", [])
+    for index, entry in enumerate(data):
+        if not isinstance(entry, dict) or not entry.get("name"):
+            raise ScaffoldError(f"Entry {index} in {path} needs a 'name'.")
+    return data
+
+
+def render_batch(projects, base_dir, default_language, default_board, link="reflink", jobs=None, on_result=None):
+    """
+    Creates many projects in parallel; returns one result dict per project.
+    """
+    # Load each template once up front rather than once per project.
+    manifests = {}
+    for language in {project.get("lang", default_language) for project in projects}:
+        if language in TEMPLATE_ROOTS:
+            manifests[language] = load_manifest(language)
+
+    def create(project):
+        name = project["name"]
+        language = project.get("lang", default_language)
+        board = project.get("board", default_board)
+        result = {"name": name, "language": language, "board": board, "ok": False, "error": None}
+        try:
+            render_project(language, os.path.join(base_dir, name), {"project_name": name, "board": board, "language": language}, {"name": board, "language": language}, link=link, manifest=manifests.get(language))
+            result["ok"] = True
+        except (ScaffoldError, OSError) as e:
+            result["error"] = str(e)
+        if on_result:
+            on_result(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs or (os.cpu_count() or 1) * 4, len(projects) or 1))) as pool:
+        return list(pool.map(create, projects))
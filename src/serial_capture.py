@@ -0,0 +1,237 @@
+import errno
+import os
+import select
+import threading
+import time
+
+DEFAULT_BAUD = 115200
+DEFAULT_CAPACITY = 4 * 1024 * 1024
+DEFAULT_READ_SIZE = 256 * 1024
+DEFAULT_FPS = 30
+# Most lines drawn per screen update. rich needs tens of microseconds a
+# line, so this keeps one update within a frame at the default rate; the
+# capture file has everything.
+MAX_LINES_PER_FRAME = 500
+
+
+class CaptureError(Exception):
+    pass
+
+
+def open_port(path, baud=DEFAULT_BAUD):
+    """
+    Opens a serial port non-blocking in raw 8N1 mode at `baud`.
+    """
+    import termios
+
+    speed = getattr(termios, f"B{baud}", None)
+    if speed is None:
+        raise CaptureError(f"Unsupported baud rate {baud}.")
+    try:
+        fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    except OSError as e:
+        raise CaptureError(f"Cannot open {path}: {e.strerror}.")
+    try:
+        iflag, oflag, cflag, lflag, _ispeed, _ospeed, cc = termios.tcgetattr(fd)
+        iflag &= ~(termios.IGNBRK | termios.BRKINT | termios.PARMRK | termios.ISTRIP | termios.INLCR | termios.IGNCR | termios.ICRNL | termios.IXON | termios.IXOFF | termios.IXANY)
+        oflag &= ~termios.OPOST
+        cflag = (cflag & ~(termios.CSIZE | termios.PARENB | termios.CSTOPB | getattr(termios, "CRTSCTS", 0))) | termios.CS8 | termios.CREAD | termios.CLOCAL
+        lflag &= ~(termios.ECHO | termios.ECHONL | termios.ICANON | termios.ISIG | termios.IEXTEN)
+        cc[termios.VMIN] = 0
+        cc[termios.VTIME] = 0
+        termios.tcsetattr(fd, termios.TCSANOW, [iflag, oflag, cflag, lflag, speed, speed, cc])
+    except termios.error as e:
+        os.close(fd)
+        raise CaptureError(f"Cannot configure {path}: {e.args[-1]}.")
+    return fd
+
+
+class RingBuffer:
+    """
+    Fixed-size byte ring filled by one reader thread and drained by one
+    consumer.
+
+    Positions are absolute byte counts since the start, so the consumer
+    can tell how much the writer lapped it by. The writer reads straight
+    into the buffer through memoryviews; nothing is copied until the
+    consumer takes its bytes out.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._view = memoryview(bytearray(capacity))
+        self.head = 0
+        # head plus the bytes being written right now, which may already
+        # have overwritten the oldest data.
+        self._reserved = 0
+
+    def reserve(self, size):
+        """
+        Returns one or two writable views for the next `size` bytes.
+        """
+        size = min(size, self.capacity)
+        self._reserved = self.head + size
+        start = self.head % self.capacity
+        end = start + size
+        if end <= self.capacity:
+            return [self._view[start:end]]
+        return [self._view[start:], self._view[:end - self.capacity]]
+
+    def commit(self, count):
+        self.head += count
+        self._reserved = self.head
+
+    def read_from(self, position):
+        """
+        Returns (start, data) with everything written since `position`.
+        `start` is later than `position` when the writer overwrote bytes
+        that were never read.
+        """
+        head = self.head
+        start = max(position, head - self.capacity)
+        first, last = start % self.capacity, head % self.capacity
+        if start == head:
+            data = b""
+        elif first < last:
+            data = self._view[first:last].tobytes()
+        else:
+            data = self._view[first:].tobytes() + self._view[:last].tobytes()
+        # The writer may have moved on while we copied; drop what it overwrote.
+        oldest = self._reserved - self.capacity
+        if oldest > start:
+            data = data[oldest - start:]
+            start = oldest
+        return start, data
+
+
+def _trim(views, count):
+    trimmed = []
+    for view in views:
+        if count <= 0:
+            break
+        trimmed.append(view[:count])
+        count -= len(view)
+    return trimmed
+
+
+def _write_all(fd, views):
+    written = os.writev(fd, views)
+    for view in views:
+        if written >= len(view):
+            written -= len(view)
+            continue
+        view = view[written:]
+        written = 0
+        while len(view):
+            view = view[os.write(fd, view):]
+
+
+def capture(fd, ring, capture_fd=None, stop=None, read_size=DEFAULT_READ_SIZE, poll_interval=0.1):
+    """
+    Reads `fd` into `ring` until `stop` is set or the port goes away, and
+    returns why it stopped ("stopped", "closed" or "disconnected").
+
+    Every read takes whatever the driver has buffered, up to `read_size`
+    bytes, in one readv() straight into the ring. The same views go to
+    `capture_fd` with writev(), so the raw capture is complete even when
+    the consumer of the ring falls behind.
+    """
+    stop = stop or threading.Event()
+    poller = select.poll()
+    poller.register(fd, select.POLLIN | select.POLLERR | select.POLLHUP)
+    while not stop.is_set():
+        if not poller.poll(poll_interval * 1000):
+            continue
+        views = ring.reserve(read_size)
+        try:
+            count = os.readv(fd, views)
+        except BlockingIOError:
+            ring.commit(0)
+            continue
+        except OSError as e:
+            ring.commit(0)
+            if e.errno in (errno.EIO, errno.ENXIO, errno.ENODEV):
+                return "disconnected"
+            raise
+        if count == 0:
+            ring.commit(0)
+            return "closed"
+        if capture_fd is not None:
+            _write_all(capture_fd, _trim(views, count))
+        ring.commit(count)
+    return "stopped"
+
+
+def monitor(fd, decoder, render, capture_fd=None, fps=DEFAULT_FPS, capacity=DEFAULT_CAPACITY, stop=None, duration=None, max_records=MAX_LINES_PER_FRAME):
+    """
+    Captures `fd` on a reader thread and hands decoded records to
+    `render(records, skipped)` at most `fps` times a second.
+
+    Rendering runs on the calling thread and only ever sees bytes already
+    in the ring, so a slow terminal can never hold up reading the port:
+    if rendering falls a whole ring behind, the unseen bytes are counted
+    in `skipped` (they are still in the capture file), as are records
+    beyond `max_records` in one update. Runs until the port
+    closes, `stop` is set or `duration` seconds pass; returns a summary.
+    """
+    stop = stop or threading.Event()
+    ring = RingBuffer(capacity)
+    outcome = {}
+
+    def reader():
+        try:
+            outcome["reason"] = capture(fd, ring, capture_fd, stop)
+        except OSError as e:
+            outcome["reason"] = f"error: {e.strerror}"
+        finally:
+            stop.set()
+
+    started = time.monotonic()
+    thread = threading.Thread(target=reader, name="embed-monitor-reader", daemon=True)
+    thread.start()
+
+    position = 0
+    skipped = 0
+    records_shown = 0
+
+    def drain(final=False):
+        nonlocal position, skipped, records_shown
+        start, data = ring.read_from(position)
+        lost = start - position
+        position = start + len(data)
+        if lost:
+            decoder.flush()  # A partial frame or line cut off by the gap is garbage now.
+        records = decoder.feed(data) if data else []
+        if final:
+            records += decoder.flush()
+        if len(records) > max_records:
+            lost_records = len(records) - max_records
+            records = records[-max_records:]
+        else:
+            lost_records = 0
+        skipped += lost
+        if records or lost or lost_records:
+            render(records, {"bytes": lost, "records": lost_records})
+            records_shown += len(records)
+
+    reason = None
+    try:
+        interval = 1.0 / fps
+        while not stop.wait(interval):
+            drain()
+            if duration is not None and time.monotonic() - started >= duration:
+                reason = "duration"
+                break
+    except KeyboardInterrupt:
+        reason = "interrupted"
+    finally:
+        stop.set()
+        thread.join()
+    drain(final=True)
+    return {
+        "bytes": ring.head,
+        "skipped_bytes": skipped,
+        "records": records_shown,
+        "duration": time.monotonic() - started,
+        "reason": reason or outcome.get("reason", "stopped"),
+    }
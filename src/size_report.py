@@ -0,0 +1,146 @@
+import glob
+import os
+import re
+
+from cache import load_json, write_json_atomic
+from elf import SHF_ALLOC, SHF_WRITE, SHT_NOBITS, STT_FUNC, STT_OBJECT, ElfFile
+
+SIZE_HISTORY = os.path.join(".embed", "size.json")
+
+_MEMORY_BLOCK_RE = re.compile(r"\bMEMORY\s*\{(?P<body>[^}]*)\}", re.DOTALL)
+_REGION_RE = re.compile(
+    r"(?P<name>\w+)\s*(?:\([^)]*\))?\s*:\s*"
+    r"(?:ORIGIN|org|o)\s*=\s*(?P<origin>[^,]+?)\s*,\s*"
+    r"(?:LENGTH|len|l)\s*=\s*(?P<length>[^\n;]+)"
+)
+_TERM_RE = re.compile(r"([+-]?)\s*(0[xX][0-9a-fA-F]+|\d+)\s*([KkMm]?)")
+
+
+def _evaluate(expression):
+    """
+    Evaluates the sums of constants used for ORIGIN/LENGTH, e.g. `256K - 4K`.
+    """
+    expression = expression.strip()
+    total = 0
+    position = 0
+    while position < len(expression):
+        match = _TERM_RE.match(expression, position)
+        if not match:
+            raise ValueError(f"Unsupported linker script expression: {expression}")
+        value = int(match[2], 0) * {"": 1, "k": 1024, "m": 1024 * 1024}[match[3].lower()]
+        total += -value if match[1] == "-" else value
+        position = match.end()
+        while position < len(expression) and expression[position].isspace():
+            position += 1
+    return total
+
+
+def parse_memory_regions(text):
+    """
+    Returns [(name, origin, length)] from a linker script's MEMORY block.
+    """
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.DOTALL)
+    regions = []
+    for block in _MEMORY_BLOCK_RE.finditer(text):
+        for match in _REGION_RE.finditer(block["body"]):
+            try:
+                regions.append((match["name"], _evaluate(match["origin"]), _evaluate(match["length"])))
+            except ValueError:
+                continue
+    return regions
+
+
+def find_linker_script(project_root, board_config):
+    configured = board_config.get("linker_script")
+    if configured:
+        return os.path.join(project_root, configured)
+    memory_x = os.path.join(project_root, "memory.x")
+    if os.path.exists(memory_x):
+        return memory_x
+    scripts = sorted(glob.glob(os.path.join(project_root, "*.ld")))
+    return scripts[0] if scripts else None
+
+
+def _region_for(regions, address):
+    for region in regions:
+        if region["origin"] <= address < region["origin"] + region["length"]:
+            return region
+    return None
+
+
+def size_report(elf_file, memory_regions=()):
+    """
+    Sizes a firmware ELF: text/data/bss totals, usage of each MEMORY region
+    and every sized function/object symbol, largest first.
+
+    Initialised data is charged both to the region it runs from and to the
+    region its load image is stored in, as the linker does.
+    """
+    elf = ElfFile(elf_file)
+    totals = {"text": 0, "data": 0, "bss": 0}
+    regions = [{"name": name, "origin": origin, "length": length, "used": 0} for name, origin, length in memory_regions]
+    for section in elf.sections:
+        if not section.flags & SHF_ALLOC or not section.size:
+            continue
+        if section.type == SHT_NOBITS:
+            totals["bss"] += section.size
+        elif section.flags & SHF_WRITE:
+            totals["data"] += section.size
+        else:
+            totals["text"] += section.size
+
+        run_region = _region_for(regions, section.addr)
+        if run_region:
+            run_region["used"] += section.size
+        if section.type != SHT_NOBITS:
+            load_region = _region_for(regions, elf.load_address(section))
+            if load_region and load_region is not run_region:
+                load_region["used"] += section.size
+
+    seen = set()
+    symbols = []
+    for symbol in elf.symbols():
+        if symbol.size and symbol.type in (STT_FUNC, STT_OBJECT) and (symbol.name, symbol.value) not in seen:
+            seen.add((symbol.name, symbol.value))
+            symbols.append({"name": symbol.name, "size": symbol.size, "type": "function" if symbol.type == STT_FUNC else "object"})
+    symbols.sort(key=lambda symbol: (-symbol["size"], symbol["name"]))
+    return {"elf": elf_file, "totals": totals, "regions": regions, "symbols": symbols}
+
+
+def diff_reports(previous, current):
+    """
+    Returns the size deltas between two reports; symbols by largest change.
+    """
+    previous_regions = {region["name"]: region["used"] for region in previous.get("regions", [])}
+    previous_symbols = {}
+    for symbol in previous.get("symbols", []):
+        previous_symbols[symbol["name"]] = previous_symbols.get(symbol["name"], 0) + symbol["size"]
+    current_symbols = {}
+    for symbol in current["symbols"]:
+        current_symbols[symbol["name"]] = current_symbols.get(symbol["name"], 0) + symbol["size"]
+
+    symbols = []
+    for name in previous_symbols.keys() | current_symbols.keys():
+        old, new = previous_symbols.get(name, 0), current_symbols.get(name, 0)
+        if old != new:
+            symbols.append((name, old, new))
+    symbols.sort(key=lambda change: (-abs(change[2] - change[1]), change[0]))
+    return {
+        "totals": {key: value - previous.get("totals", {}).get(key, 0) for key, value in current["totals"].items()},
+        "regions": {region["name"]: region["used"] - previous_regions[region["name"]] for region in current["regions"] if region["name"] in previous_regions},
+        "symbols": symbols,
+    }
+
+
+def load_previous_report(project_root, elf_file):
+    return load_json(os.path.join(project_root, SIZE_HISTORY), {}).get(os.path.relpath(elf_file, project_root))
+
+
+def save_report(project_root, report):
+    """
+    Remembers the report per ELF so the next build can be diffed against it.
+    """
+    history_path = os.path.join(project_root, SIZE_HISTORY)
+    history = load_json(history_path, {})
+    history[os.path.relpath(report["elf"], project_root)] = report
+    write_json_atomic(history_path, history)
@@ -0,0 +1,163 @@
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import resident
+from cache import cache_dir, load_json, write_json_atomic
+from tracing import subprocess_span
+
+PROBE_CACHE_VERSION = 1
+DEFAULT_TIMEOUT = 5.0
+
+# Mirrors TOOLS_META in lib/tool_meta.sh: (family, name, command).
+TOOLS = [
+    ("STM32", "gcc", "arm-none-eabi-gcc"),
+    ("STM32", "gdb", "arm-none-eabi-gdb"),
+    ("STM32", "st-flash", "st-flash"),
+    ("STM32", "openocd", "openocd"),
+    ("STM32", "CubeCLT", "/usr/local/bin/stm32cubeclt"),
+    ("NXP", "gcc", "arm-none-eabi-gcc"),
+    ("TI", "msp430-gcc", "msp430-gcc"),
+    ("Microchip", "gputils", "gputils"),
+    ("Nuvoton", "nu-isp-cli", "nu-isp-cli"),
+    ("GD32", "GD32_ISP_Console_Linux", "GD32_ISP_Console_Linux"),
+    ("Espressif", "gcc", "xtensa-esp32-elf-gcc"),
+    ("Espressif", "esptool.py", "esptool.py"),
+    ("Espressif", "ESP-IDF", "idf.py"),
+    ("Arduino", "CLI", "arduino-cli"),
+    ("Arduino", "avrdude", "avrdude"),
+    ("General", "cmake", "cmake"),
+    ("General", "make", "make"),
+]
+
+# Tools that do not understand --version.
+VERSION_ARGS = {
+    "avrdude": ["-?"],
+}
+
+# Install locations checked when a tool is not on PATH.
+FALLBACK_LOCATIONS = {
+    "arduino-cli": [os.path.join("~", "bin", "arduino-cli")],
+}
+
+
+def _resolve(command, path_env):
+    if os.path.isabs(command):
+        return command if os.access(command, os.X_OK) else None
+    found = shutil.which(command, path=path_env)
+    if found:
+        return found
+    for location in FALLBACK_LOCATIONS.get(command, []):
+        location = os.path.expanduser(location)
+        if os.access(location, os.X_OK):
+            return location
+    return None
+
+
+def _probe_version(command, path, timeout):
+    """
+    Returns (version line, ok); ok is False when the tool could not be run.
+    """
+    args = VERSION_ARGS.get(command, ["--version"])
+    try:
+        with subprocess_span([path, *args]):
+            result = subprocess.run([path, *args], capture_output=True, text=True, timeout=timeout, stdin=subprocess.DEVNULL)
+    except subprocess.TimeoutExpired:
+        return "timed out", False
+    except OSError as e:
+        return f"error: {e.strerror}", False
+    for line in (result.stdout + "\n" + result.stderr).splitlines():
+        if line.strip():
+            return line.strip(), True
+    return "unknown", True
+
+
+def _path_dir_stamps(path_env):
+    stamps = {}
+    for directory in path_env.split(os.pathsep):
+        if directory and directory not in stamps:
+            try:
+                stamps[directory] = os.stat(directory).st_mtime_ns
+            except OSError:
+                stamps[directory] = None
+    return stamps
+
+
+def probe_tools(tools=TOOLS, refresh=False, timeout=DEFAULT_TIMEOUT, cache_path=None, path_env=None):
+    """
+    Detects the toolchains concurrently and returns one dict per tool.
+
+    Lookups are cached against PATH and the mtime of every PATH directory
+    (adding or removing a binary changes it), versions against each binary's
+    own mtime, so a warm call costs a handful of stat calls and no process
+    launches.
+    """
+    path_env = os.environ.get("PATH", "") if path_env is None else path_env
+    cache_path = cache_path or os.path.join(cache_dir(), "toolchain_probe.json")
+    if refresh:
+        return _probe_tools(tools, True, timeout, cache_path, path_env)
+    # In the daemon, installing or removing a binary shows up as a change in
+    # its PATH directory; a PATH directory appearing changes the stamp.
+    existing = [directory for directory in dict.fromkeys(path_env.split(os.pathsep)) if directory and os.path.isdir(directory)]
+    return resident.memo(
+        ("toolchain", tuple(tools), timeout, cache_path, path_env),
+        lambda: _probe_tools(tools, False, timeout, cache_path, path_env),
+        watch=existing,
+        stamp=tuple(existing),
+        keep=lambda results: not any(result["probe_failed"] for result in results),
+    )
+
+
+def _probe_tools(tools, refresh, timeout, cache_path, path_env):
+    dir_stamps = _path_dir_stamps(path_env)
+    cached = {} if refresh else load_json(cache_path, {})
+    if cached.get("version") != PROBE_CACHE_VERSION:
+        cached = {}
+    lookups_valid = cached.get("path_env") == path_env and cached.get("path_dirs") == dir_stamps
+    cached_tools = cached.get("tools", {})
+
+    failed = set()
+
+    def probe(command):
+        entry = cached_tools.get(command)
+        path = entry["path"] if lookups_valid and entry else _resolve(command, path_env)
+        if not path:
+            return command, {"path": None, "mtime_ns": None, "version": None}
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return command, {"path": None, "mtime_ns": None, "version": None}
+        if entry and entry["path"] == path and entry["mtime_ns"] == mtime_ns:
+            return command, entry
+        version, ok = _probe_version(command, path, timeout)
+        if not ok:
+            failed.add(command)
+        return command, {"path": path, "mtime_ns": mtime_ns, "version": version}
+
+    commands = list(dict.fromkeys(command for _family, _name, command in tools))
+    with ThreadPoolExecutor(max_workers=min(16, len(commands)) or 1) as pool:
+        probed = dict(pool.map(probe, commands))
+
+    # A probe that timed out or could not run says nothing about the
+    # binary, so it is retried next time rather than cached.
+    persisted = {command: entry for command, entry in probed.items() if command not in failed}
+    if persisted != cached_tools or not lookups_valid:
+        try:
+            write_json_atomic(cache_path, {"version": PROBE_CACHE_VERSION, "path_env": path_env, "path_dirs": dir_stamps, "tools": persisted})
+        except OSError:
+            pass
+
+    results = []
+    for family, name, command in tools:
+        entry = probed[command]
+        results.append({
+            "family": family,
+            "name": name,
+            "command": command,
+            "installed": entry["path"] is not None,
+            "path": entry["path"],
+            "version": entry["version"],
+            "probe_failed": command in failed,
+        })
+    return results
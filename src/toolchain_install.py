@@ -0,0 +1,344 @@
+import hashlib
+import http.client
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import cache_dir
+
+# A mirror serves index.json next to the archives:
+#   {"toolchains": {"arm-none-eabi-gcc": {"version": "13.3.rel1",
+#     "provides": ["arm-none-eabi-gdb"], "bin": "bin",
+#     "archives": {"linux-x86_64": {"url": "arm-13.3.tar.xz", "sha256": "...", "size": 123}}}}}
+# Archive URLs are resolved against the index URL.
+DEFAULT_JOBS = 4
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT = 30.0
+CHUNK_SIZE = 1024 * 1024
+# Written into every installed toolchain; its sha256 tells whether the
+# install is current.
+MARKER_FILE = ".embed-toolchain.json"
+
+
+class InstallError(Exception):
+    pass
+
+
+def mirror_url():
+    """
+    The mirror's index.json URL from EMBED_TOOLCHAIN_MIRROR, or None.
+    The variable may name the index itself or the directory holding it.
+    """
+    mirror = os.environ.get("EMBED_TOOLCHAIN_MIRROR")
+    if not mirror:
+        return None
+    return mirror if mirror.endswith(".json") else mirror.rstrip("/") + "/index.json"
+
+
+def archive_cache_dir():
+    """
+    Where downloaded archives are kept, named by their sha256 so several
+    checkouts or build agents can share one directory (EMBED_TOOLCHAIN_CACHE).
+    """
+    shared = os.environ.get("EMBED_TOOLCHAIN_CACHE")
+    if shared:
+        os.makedirs(shared, exist_ok=True)
+        return shared
+    return cache_dir("toolchains")
+
+
+def install_root():
+    """
+    Where toolchains are unpacked: EMBED_TOOLCHAIN_HOME, else
+    $XDG_DATA_HOME/embed/toolchains. Their executables are linked into bin/.
+    """
+    root = os.environ.get("EMBED_TOOLCHAIN_HOME")
+    if not root:
+        data_home = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+        root = os.path.join(data_home, "embed", "toolchains")
+    return root
+
+
+def host_platform():
+    return f"{platform.system().lower()}-{platform.machine().lower()}"
+
+
+def board_toolchains(entries):
+    """
+    The distinct `toolchain` fields of boards/*.json registry entries.
+    """
+    names = {entry["config"].get("toolchain") for entry in entries if entry.get("source") == "json" and entry.get("config")}
+    return sorted(name for name in names if name)
+
+
+def fetch_index(url, timeout=DEFAULT_TIMEOUT):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            index = json.load(response)
+    except (OSError, ValueError) as e:
+        raise InstallError(f"Could not read the toolchain index {url}: {e}")
+    if not isinstance(index, dict) or not isinstance(index.get("toolchains"), dict):
+        raise InstallError(f"{url} is not a toolchain index (no 'toolchains' object).")
+    return index
+
+
+def resolve_toolchains(index, names, index_url, host=None):
+    """
+    Maps the wanted toolchain names to install plans.
+
+    A name matches an index key or any of an entry's `provides` commands
+    (arm-none-eabi-gdb ships with arm-none-eabi-gcc), so several names can
+    resolve to the same plan. Returns (plans, missing).
+    """
+    host = host or host_platform()
+    by_command = {}
+    for key, entry in index["toolchains"].items():
+        for command in [key, *entry.get("provides", [])]:
+            by_command.setdefault(command, key)
+
+    plans = {}
+    missing = []
+    for name in names:
+        key = by_command.get(name)
+        archive = index["toolchains"][key].get("archives", {}).get(host) if key else None
+        if archive is None:
+            missing.append(name)
+            continue
+        if key in plans:
+            continue
+        entry = index["toolchains"][key]
+        sha256 = archive.get("sha256", "").lower()
+        if len(sha256) != 64 or any(c not in "0123456789abcdef" for c in sha256):
+            raise InstallError(f"The index has no valid sha256 for {key} on {host}.")
+        plans[key] = {
+            "name": key,
+            "version": str(entry.get("version", "")),
+            "url": urllib.parse.urljoin(index_url, archive["url"]),
+            "sha256": sha256,
+            "size": archive.get("size"),
+            "bin": entry.get("bin", "bin"),
+        }
+    return list(plans.values()), missing
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest
+
+
+def _download_once(url, part_path, total, progress, timeout):
+    """
+    Appends the rest of `url` to `part_path`, asking the server to resume
+    after the bytes already there. Returns the sha256 of the whole file.
+    """
+    have = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    request = urllib.request.Request(url)
+    if have:
+        request.add_header("Range", f"bytes={have}-")
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 416 and have:
+            # Nothing left to send: the partial file is already complete.
+            return _hash_file(part_path)
+        raise
+    with response:
+        if have and (getattr(response, "status", None) or 200) != 206:
+            have = 0  # The server ignored the range; start over.
+        digest = _hash_file(part_path) if have else hashlib.sha256()
+        length = response.headers.get("Content-Length")
+        if length is not None:
+            total = have + int(length)
+        done = have
+        progress(done, total)
+        with open(part_path, "ab" if have else "wb") as f:
+            for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                f.write(chunk)
+                digest.update(chunk)
+                done += len(chunk)
+                progress(done, total)
+    if total is not None and done < total:
+        raise ConnectionError(f"transfer ended after {done} of {total} bytes")
+    return digest
+
+
+def fetch_archive(plan, cache=None, on_progress=None, retries=DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT, retry_delay=1.0):
+    """
+    Returns the path of the plan's archive in the content-addressed cache,
+    downloading it first if needed.
+
+    Downloads go to `<sha256>.part` and are resumed with a Range request,
+    both on a retry within this call and on the next run after an
+    interruption. The archive only gets its final name once its sha256 has
+    been verified, so anything under that name is known-good. A lock file
+    keeps concurrent installs sharing the cache from fetching it twice.
+    """
+    import fcntl
+
+    cache = cache or archive_cache_dir()
+    os.makedirs(cache, exist_ok=True)
+    sha256 = plan["sha256"]
+    archive_path = os.path.join(cache, sha256)
+    part_path = archive_path + ".part"
+    progress = on_progress or (lambda done, total: None)
+
+    with open(archive_path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if os.path.exists(archive_path):
+            return archive_path, True
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                digest = _download_once(plan["url"], part_path, plan.get("size"), progress, timeout)
+                break
+            except (OSError, http.client.HTTPException) as e:
+                if isinstance(e, urllib.error.HTTPError) and e.code < 500:
+                    raise InstallError(f"Download of {plan['url']} failed: HTTP {e.code}")
+                if attempts > retries:
+                    raise InstallError(f"Download of {plan['url']} failed after {attempts} attempts: {e}")
+                time.sleep(retry_delay * attempts)
+
+        actual = digest.hexdigest()
+        if actual != sha256:
+            os.unlink(part_path)
+            raise InstallError(f"Checksum mismatch for {plan['name']}: expected {sha256}, got {actual}.")
+        os.replace(part_path, archive_path)
+    return archive_path, False
+
+
+def _installed_sha256(directory):
+    try:
+        with open(os.path.join(directory, MARKER_FILE), "r") as f:
+            return json.load(f).get("sha256")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _extract(archive_path, destination):
+    import tarfile
+    import zipfile
+
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                path = archive.extract(info, destination)
+                mode = info.external_attr >> 16
+                if mode & 0o111 and not info.is_dir():
+                    # zipfile drops permission bits, but toolchains need theirs.
+                    os.chmod(path, mode & 0o777)
+        return
+    try:
+        with tarfile.open(archive_path, "r:*") as archive:
+            if hasattr(tarfile, "data_filter"):
+                archive.extractall(destination, filter="data")
+            else:
+                archive.extractall(destination)
+    except tarfile.TarError as e:
+        raise InstallError(f"Could not unpack {archive_path}: {e}")
+
+
+def unpack_toolchain(plan, archive_path, root):
+    """
+    Unpacks the archive into `<root>/<name>-<version>` and links its
+    executables into `<root>/bin`.
+
+    The archive is extracted next to its final location and renamed into
+    place, so an interrupted unpack never leaves a half-installed
+    toolchain. A single top-level directory in the archive is stripped.
+    """
+    os.makedirs(root, exist_ok=True)
+    label = f"{plan['name']}-{plan['version']}" if plan["version"] else plan["name"]
+    target = os.path.join(root, label)
+    staging = tempfile.mkdtemp(dir=root, prefix=f".embed-tmp-{label}-")
+    try:
+        _extract(archive_path, staging)
+        entries = os.listdir(staging)
+        top = os.path.join(staging, entries[0]) if len(entries) == 1 and os.path.isdir(os.path.join(staging, entries[0])) else staging
+        with open(os.path.join(top, MARKER_FILE), "w") as f:
+            json.dump({"name": plan["name"], "version": plan["version"], "sha256": plan["sha256"], "url": plan["url"]}, f)
+        if os.path.exists(target):
+            previous = tempfile.mkdtemp(dir=root, prefix=f".embed-tmp-old-{label}-")
+            os.rename(target, os.path.join(previous, label))
+            shutil.rmtree(previous, ignore_errors=True)
+        os.rename(top, target)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return target, _link_executables(os.path.join(target, plan["bin"]), os.path.join(root, "bin"))
+
+
+def _link_executables(source_dir, bin_dir):
+    os.makedirs(bin_dir, exist_ok=True)
+    linked = []
+    try:
+        entries = list(os.scandir(source_dir))
+    except OSError:
+        return linked
+    for entry in entries:
+        if entry.is_dir() or not os.access(entry.path, os.X_OK):
+            continue
+        link = os.path.join(bin_dir, entry.name)
+        temporary = link + ".embed-tmp"
+        try:
+            os.unlink(temporary)
+        except FileNotFoundError:
+            pass
+        os.symlink(entry.path, temporary)
+        os.replace(temporary, link)
+        linked.append(entry.name)
+    return sorted(linked)
+
+
+def install_toolchains(plans, root=None, cache=None, jobs=DEFAULT_JOBS, force=False, on_event=None, retries=DEFAULT_RETRIES, timeout=DEFAULT_TIMEOUT):
+    """
+    Installs `plans` concurrently on a bounded thread pool.
+
+    Each toolchain is downloaded (or taken from the archive cache),
+    verified and unpacked independently, so a slow download does not hold
+    up unpacking the others. Toolchains whose installed copy already has
+    the plan's sha256 are skipped unless `force` is set. `on_event(name,
+    event, detail)` reports "current", "download" ((done, total) bytes),
+    "cached", "unpack", "installed" and "failed". Returns one result dict
+    per plan, in the order given.
+    """
+    root = root or install_root()
+    cache = cache or archive_cache_dir()
+
+    def notify(name, event, detail=None):
+        if on_event:
+            on_event(name, event, detail)
+
+    def install_one(plan):
+        name = plan["name"]
+        started = time.monotonic()
+        label = f"{name}-{plan['version']}" if plan["version"] else name
+        target = os.path.join(root, label)
+        if not force and _installed_sha256(target) == plan["sha256"]:
+            notify(name, "current", target)
+            return {"name": name, "version": plan["version"], "ok": True, "status": "current", "path": target, "linked": [], "detail": "", "duration": time.monotonic() - started}
+        try:
+            archive_path, cached = fetch_archive(plan, cache, lambda done, total: notify(name, "download", (done, total)), retries=retries, timeout=timeout)
+            if cached:
+                notify(name, "cached", archive_path)
+            notify(name, "unpack", target)
+            target, linked = unpack_toolchain(plan, archive_path, root)
+        except (InstallError, OSError) as e:
+            notify(name, "failed", str(e))
+            return {"name": name, "version": plan["version"], "ok": False, "status": "failed", "path": None, "linked": [], "detail": str(e), "duration": time.monotonic() - started}
+        notify(name, "installed", target)
+        return {"name": name, "version": plan["version"], "ok": True, "status": "cached" if cached else "downloaded", "path": target, "linked": linked, "detail": "", "duration": time.monotonic() - started}
+
+    if not plans:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, len(plans)))) as pool:
+        return list(pool.map(install_one, plans))
@@ -0,0 +1,201 @@
+import _thread
+import os
+import time
+
+# Set once tracing is on; spans are no-ops (one global check) otherwise.
+_events = None
+_output = None
+_epoch = time.perf_counter()
+_lock = _thread.allocate_lock()
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, name, category, args, subprocess):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.subprocess = subprocess
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def __enter__(self):
+        if self.subprocess:
+            import resource
+
+            self._usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if self.subprocess:
+            import resource
+
+            usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            self.args.update(
+                child_user_s=round(usage.ru_utime - self._usage.ru_utime, 6),
+                child_system_s=round(usage.ru_stime - self._usage.ru_stime, 6),
+                # ru_maxrss is the largest child waited for so far, in KB on Linux.
+                child_peak_rss_kb=usage.ru_maxrss,
+            )
+        if exc_type is SystemExit:
+            self.args["exit_code"] = exc.code
+        elif exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        _record(self.name, self.category, self._start, end, self.args)
+        return False
+
+
+def _record(name, category, start, end, args):
+    event = {
+        "name": name,
+        "cat": category,
+        "ph": "X",
+        "ts": round((start - _epoch) * 1e6, 1),
+        "dur": round((end - start) * 1e6, 1),
+        "pid": os.getpid(),
+        "tid": _thread.get_ident(),
+    }
+    if args:
+        event["args"] = args
+    with _lock:
+        _events.append(event)
+
+
+def enabled():
+    return _events is not None
+
+
+def span(name, category="phase", **args):
+    """
+    Times a block as one complete ("X") trace event.
+    """
+    if _events is None:
+        return _NULL_SPAN
+    return _Span(name, category, args, False)
+
+
+def traced(name, category="phase"):
+    """
+    Decorator form of span() for functions that are phases on their own.
+    """
+    def decorator(function):
+        def wrapper(*args, **kwargs):
+            if _events is None:
+                return function(*args, **kwargs)
+            with _Span(name, category, {}, False):
+                return function(*args, **kwargs)
+        wrapper.__name__ = function.__name__
+        wrapper.__qualname__ = function.__qualname__
+        wrapper.__doc__ = function.__doc__
+        wrapper.__wrapped__ = function
+        return wrapper
+    return decorator
+
+
+def subprocess_span(command, **args):
+    """
+    Times a child process, adding its CPU time and peak RSS from getrusage.
+
+    With several children running at once the CPU times of overlapping
+    spans are shared between them.
+    """
+    if _events is None:
+        return _NULL_SPAN
+    argv = command if isinstance(command, str) else " ".join(str(part) for part in command)
+    return _Span(f"subprocess: {os.path.basename(argv.split(' ', 1)[0])}", "subprocess", dict(args, command=argv), True)
+
+
+def _start():
+    global _events
+    if _events is None:
+        import atexit
+
+        _events = []
+        atexit.register(write)
+
+
+def enable(output):
+    """
+    Starts recording; the trace is written to `output` when the process exits.
+
+    Timestamps count from when this module was imported, which the entry
+    script does first, so interpreter-level startup work shows up too.
+    """
+    global _output
+    _start()
+    _output = output
+
+
+def write():
+    import json
+
+    if _events is None or not _output:
+        return
+    path = _output
+    if os.path.isdir(path):
+        path = os.path.join(path, f"embed-{int(time.time())}-{os.getpid()}.json")
+    metadata = {"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": "embed"}}
+    try:
+        with open(path, "w") as f:
+            json.dump({"traceEvents": [metadata] + _events, "displayTimeUnit": "ms"}, f)
+    except OSError:
+        pass
+
+
+def split_global_options(argv):
+    """
+    Splits argv into the options of the top-level CLI callback (`--trace
+    FILE`, `-v`), which come before the command, and the rest.
+    """
+    index = 0
+    while index < len(argv):
+        if argv[index] == "--trace":
+            index += 2
+        elif argv[index] in ("-v", "--verbose") or argv[index].startswith("--trace="):
+            index += 1
+        else:
+            break
+    return argv[:index], argv[index:]
+
+
+def configure(argv):
+    """
+    Turns tracing on from the environment, and starts recording early for a
+    global `--trace` option.
+
+    The trace of `--trace <file>` is only written once the CLI has parsed
+    the option and called enable(); recording from here just makes sure the
+    startup imports before that are in it. EMBED_TRACE names a trace file,
+    or a directory that collects one file per invocation;
+    EMBED_TRACE_SAMPLE (0-1, default 1) traces only that fraction of
+    invocations, keeping always-on tracing in CI cheap.
+    """
+    options, _command = split_global_options(argv)
+    if any(option == "--trace" or option.startswith("--trace=") for option in options):
+        _start()
+        return
+    output = os.environ.get("EMBED_TRACE")
+    if not output:
+        return
+    try:
+        rate = float(os.environ.get("EMBED_TRACE_SAMPLE", "1"))
+    except ValueError:
+        rate = 1.0
+    if rate >= 1 or int.from_bytes(os.urandom(2), "little") < rate * 65536:
+        enable(output)
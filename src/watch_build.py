@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+
+from build_cache import IGNORED_DIRS, IGNORED_SUFFIXES
+from watcher import Watcher
+
+DEFAULT_DEBOUNCE = 0.05
+# Longest a steady stream of events can hold back a rebuild.
+MAX_SETTLE = 2.0
+
+# Files that feed the build; saving anything else never triggers a rebuild.
+BUILD_INPUT_SUFFIXES = {
+    "c": (".c", ".h", ".s", ".S", ".ld", ".mk"),
+    "rust": (".rs", ".toml", ".x", ".ld"),
+}
+BUILD_INPUT_NAMES = {
+    "c": {"Makefile", "makefile", "GNUmakefile"},
+    "rust": {"Cargo.lock"},
+}
+# Swap and backup files editors write next to the file being saved.
+_EDITOR_TEMP_SUFFIXES = ("~", ".swp", ".swx", ".tmp")
+
+
+def make_ignore(exclude=()):
+    """
+    Returns the ignore(path, is_dir) used to prune the watched tree: build
+    output directories, object files and the `exclude` paths (the ELF).
+    """
+    exclude = {os.path.abspath(path) for path in exclude}
+
+    def ignore(path, is_dir):
+        name = os.path.basename(path)
+        if is_dir:
+            return name in IGNORED_DIRS or ".embed-tmp-" in name
+        return path in exclude or name.endswith(IGNORED_SUFFIXES)
+
+    return ignore
+
+
+def build_inputs(language, paths):
+    """
+    Returns the paths among `paths` whose change requires a rebuild.
+    """
+    suffixes = BUILD_INPUT_SUFFIXES.get(language, ())
+    names = BUILD_INPUT_NAMES.get(language, set())
+    inputs = set()
+    for path in paths:
+        name = os.path.basename(path)
+        if name.startswith(".#") or name.endswith(_EDITOR_TEMP_SUFFIXES) or name == "4913":
+            continue
+        if name in names or name.endswith(suffixes):
+            inputs.add(path)
+    return inputs
+
+
+def _settle(watcher, language, debounce):
+    """
+    Keeps collecting changes until none arrive for `debounce` seconds.
+    """
+    changes = set()
+    deadline = time.monotonic() + MAX_SETTLE
+    while time.monotonic() < deadline:
+        more = watcher.wait(timeout=debounce)
+        if not more:
+            break
+        changes |= build_inputs(language, more)
+    return changes
+
+
+def watch_rebuilds(project_root, language, build, exclude=(), debounce=DEFAULT_DEBOUNCE, initial=True, on_event=None, watcher=None, stop=None):
+    """
+    Calls build(changes, cancel) whenever build inputs under `project_root`
+    change, until interrupted or `stop` is set.
+
+    Bursts of events are collected until the tree has been quiet for
+    `debounce` seconds. Builds run on a worker thread; when new changes
+    arrive while one runs, its `cancel` event is set and it is waited for
+    before the next build starts. `on_event(event, detail)` reports
+    "watching", "changed" and "cancelling".
+    """
+    def notify(event, detail=None):
+        if on_event:
+            on_event(event, detail)
+
+    watcher = watcher or Watcher()
+    unwatched = watcher.add_tree(project_root, make_ignore(exclude))
+    notify("watching", {"backend": watcher.backend, "unwatched": unwatched})
+
+    current = {"worker": None, "cancel": None}
+
+    def start(changes):
+        cancel = threading.Event()
+        worker = threading.Thread(target=build, args=(changes, cancel), name="embed-rebuild", daemon=True)
+        current.update(worker=worker, cancel=cancel)
+        worker.start()
+
+    def finish_running():
+        worker = current["worker"]
+        if worker is not None and worker.is_alive():
+            notify("cancelling")
+            current["cancel"].set()
+            worker.join()
+
+    try:
+        if initial:
+            start([])
+        while stop is None or not stop.is_set():
+            changes = build_inputs(language, watcher.wait(timeout=0.2))
+            if not changes:
+                continue
+            changes |= _settle(watcher, language, debounce)
+            finish_running()
+            relative = sorted(os.path.relpath(path, project_root) for path in changes)
+            notify("changed", relative)
+            start(relative)
+    finally:
+        finish_running()
+        watcher.close()
@@ -0,0 +1,226 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+_EVENT = struct.Struct("iIII")
+
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+def _load_inotify():
+    name = ctypes.util.find_library("c")
+    try:
+        libc = ctypes.CDLL(name, use_errno=True)
+        return libc if hasattr(libc, "inotify_init1") else None
+    except OSError:
+        return None
+
+
+class Watcher:
+    """
+    Reports changes inside a set of directories.
+
+    Uses inotify through ctypes where the kernel has it, so an idle watch
+    costs nothing; elsewhere it falls back to comparing directory listings
+    every `poll_interval` seconds. Only the directories' direct entries are
+    watched unless add_tree() is used.
+    """
+
+    def __init__(self, poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=True):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._dirs = {}  # path -> watch descriptor, or listing when polling
+        self._paths = {}  # watch descriptor -> path
+        self._trees = {}  # root -> ignore(path, is_dir) for add_tree()
+        self._fd = None
+        self._libc = _load_inotify() if use_inotify else None
+        if self._libc is not None:
+            fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+        self._next_poll = time.monotonic() + poll_interval
+
+    @property
+    def backend(self):
+        return "inotify" if self._fd is not None else "poll"
+
+    def add(self, path):
+        """
+        Starts watching directory `path`; returns False if it cannot be watched.
+        """
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._dirs:
+                return True
+            if self._fd is not None:
+                wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+                if wd < 0:
+                    return False
+                self._dirs[path] = wd
+                self._paths[wd] = path
+                return True
+            listing = _listing(path)
+            if listing is None:
+                return False
+            self._dirs[path] = listing
+            return True
+
+    def add_tree(self, root, ignore=None):
+        """
+        Watches `root` and every directory below it, including directories
+        created later. `ignore(path, is_dir)` prunes paths from the walk and
+        from the changes wait() reports. Returns the paths that could not
+        be watched.
+        """
+        root = os.path.abspath(root)
+        ignore = ignore or (lambda path, is_dir: False)
+        with self._lock:
+            self._trees[root] = ignore
+        return self._add_subtree(root, ignore)
+
+    def _add_subtree(self, top, ignore, found=None):
+        failed = []
+        for directory, dir_names, file_names in os.walk(top):
+            dir_names[:] = [name for name in dir_names if not ignore(os.path.join(directory, name), True)]
+            if not self.add(directory):
+                failed.append(directory)
+            if found is not None:
+                found.update(os.path.join(directory, name) for name in file_names if not ignore(os.path.join(directory, name), False))
+        return failed
+
+    def _tree_for(self, path):
+        for root, ignore in self._trees.items():
+            if path == root or path.startswith(root + os.sep):
+                return ignore
+        return None
+
+    def _filter_trees(self, changed):
+        """
+        Drops ignored paths and starts watching new directories inside trees.
+        """
+        if not self._trees:
+            return changed
+        kept = set()
+        for path in changed:
+            ignore = self._tree_for(path)
+            if ignore is None:
+                kept.add(path)
+                continue
+            is_dir = os.path.isdir(path)
+            if ignore(path, is_dir):
+                continue
+            if is_dir and path not in self._dirs:
+                # Files may land in a new directory before it is watched.
+                self._add_subtree(path, ignore, kept)
+            kept.add(path)
+        return kept
+
+    def wait(self, timeout=None):
+        """
+        Blocks until something changes or `timeout` seconds pass.
+
+        Returns the set of changed paths: the changed entry inside a watched
+        directory, or the directory itself when it went away or events were
+        lost.
+        """
+        if self._fd is not None:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+            return self._filter_trees(self._read_events()) if readable else set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self._next_poll - time.monotonic()
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+            if delay > 0:
+                time.sleep(delay)
+            if time.monotonic() >= self._next_poll:
+                self._next_poll = time.monotonic() + self.poll_interval
+                changed = self._filter_trees(self._poll())
+                if changed:
+                    return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+
+    def _read_events(self):
+        changed = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        with self._lock:
+            while offset < len(data):
+                wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    changed.update(self._dirs)
+                    continue
+                path = self._paths.get(wd)
+                if path is None:
+                    continue
+                if mask & IN_IGNORED:
+                    # The directory was removed (or unmounted); stop tracking it.
+                    del self._paths[wd]
+                    self._dirs.pop(path, None)
+                    changed.add(path)
+                    continue
+                changed.add(os.path.join(path, os.fsdecode(name)) if name else path)
+        return changed
+
+    def _poll(self):
+        changed = set()
+        with self._lock:
+            for path, listing in list(self._dirs.items()):
+                current = _listing(path)
+                if current is None:
+                    del self._dirs[path]
+                    changed.add(path)
+                    continue
+                if current != listing:
+                    self._dirs[path] = current
+                    for name in set(listing) | set(current):
+                        if listing.get(name) != current.get(name):
+                            changed.add(os.path.join(path, name))
+        return changed
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def _listing(path):
+    try:
+        with os.scandir(path) as entries:
+            listing = {}
+            for entry in entries:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                listing[entry.name] = (st.st_mtime_ns, st.st_size, st.st_ino)
+            return listing
+    except OSError:
+        return None
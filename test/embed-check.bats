@@ -1,13 +1,17 @@
 #!/usr/bin/env bats
 
+setup() {
+  EMBED="$BATS_TEST_DIRNAME/../embed"
+}
+
 @test "embed-check.sh --help outputs usage" {
-  run bash /home/shawal/GitHub/embed-check/embed help
+  run bash "$EMBED" help
   [ "$status" -eq 0 ]
   [[ "$output" == *"Usage:"* ]]
 }
 
 @test "embed-check.sh list --no-install outputs summary" {
-  run bash /home/shawal/GitHub/embed-check/embed board list
+  run bash "$EMBED" board list
   [ "$status" -eq 0 ]
   [[ "$output" == *"Board Name"* ]]
 }
@@ -23,7 +27,7 @@
 
   # Run the install command
   export EMBED_TEST_MODE="$temp_bin_dir"
-  run bash -c "rm '$temp_bin_dir/gdb'; /home/shawal/GitHub/embed-check/embed install"
+  run bash -c "rm '$temp_bin_dir/gdb'; '$EMBED' install"
   echo "Status: $status"
   echo "Output: $output"
 
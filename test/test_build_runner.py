@@ -0,0 +1,45 @@
+import sys
+
+from build_runner import DiagnosticParser, format_diagnostic, run_build
+
+LINK_FAILURE = """\
+arm-none-eabi-gcc -mcpu=cortex-m4 -Os -c main.c -o build/main.o
+arm-none-eabi-gcc build/main.o -T linker.ld -o build/firmware.elf
+/usr/bin/ld: build/main.o: in function `main':
+main.c:(.text.main+0x12): undefined reference to `uart_init'
+/usr/bin/ld: build/main.o:main.c:(.text.main+0x1a): undefined reference to `uart_write'
+collect2: error: ld returned 1 exit status
+make: *** [Makefile:20: build/firmware.elf] Error 1
+"""
+
+
+def test_link_failures_are_reported_as_tool_errors():
+    parser = DiagnosticParser()
+    diagnostics = [d for d in map(parser.feed, LINK_FAILURE.splitlines()) if d]
+
+    assert [(d.file, d.line, d.severity) for d in diagnostics] == [
+        ("/usr/bin/ld", None, "error"),
+        ("collect2", None, "error"),
+        ("make", None, "error"),
+    ]
+    assert diagnostics[0].message == "build/main.o:main.c:(.text.main+0x1a): undefined reference to `uart_write'"
+    assert format_diagnostic(diagnostics[1], "/project") == "collect2"
+
+
+def test_driver_errors_without_a_source_line():
+    parser = DiagnosticParser()
+
+    fatal = parser.feed("arm-none-eabi-gcc: fatal error: no input files")
+    source = parser.feed("main.c:12:5: error: expected ';' before '}' token")
+
+    assert fatal == ("arm-none-eabi-gcc", None, None, "error", "no input files")
+    assert source == ("main.c", 12, 5, "error", "expected ';' before '}' token")
+    assert parser.feed("make: *** Waiting for unfinished jobs....") is None
+
+
+def test_a_failed_build_keeps_its_exit_code_without_diagnostics(tmp_path):
+    result = run_build([sys.executable, "-c", "print('linking'); raise SystemExit(2)"], str(tmp_path))
+
+    assert result.returncode == 2
+    assert not result.ok
+    assert result.counts["error"] == 0
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import struct
+import sys
+
+import pytest
+
+from delta_flash import FlashError, changed_ranges, flash_delta, flat_image, forget_device
+
+SECTOR = 256
+BASE = 0x08000000
+FLASH_SIZE = 0x10000
+
+FAKE_FLASHER = """
+import hashlib, json, sys
+image, address, log = sys.argv[1:4]
+if address == "0xdead":
+    sys.exit(3)
+data = open(image, "rb").read()
+with open(log, "a") as f:
+    f.write(json.dumps([int(address, 16), len(data), hashlib.sha256(data).hexdigest()]) + "\\n")
+"""
+
+
+def write_elf(path, segments):
+    """
+    Writes a minimal 32-bit little-endian ELF with one PT_LOAD per (address, data).
+    """
+    header_size, phentsize = 52, 32
+    offset = header_size + phentsize * len(segments)
+    program_headers = b""
+    payload = b""
+    for address, data in segments:
+        program_headers += struct.pack("<IIIIIIII", 1, offset + len(payload), address, address, len(data), len(data), 5, 4)
+        payload += data
+    header = b"\x7fELF\x01\x01\x01" + b"\0" * 9
+    header += struct.pack("<HHIIIIIHHHHHH", 2, 40, 1, segments[0][0], header_size, 0, 0, header_size, phentsize, len(segments), 40, 0, 0)
+    with open(path, "wb") as f:
+        f.write(header + program_headers + payload)
+
+
+@pytest.fixture
+def flasher(tmp_path):
+    script = tmp_path / "fake_flasher.py"
+    script.write_text(FAKE_FLASHER)
+    log = tmp_path / "writes.log"
+
+    def writes():
+        if not log.exists():
+            return []
+        lines = log.read_text().splitlines()
+        log.unlink()
+        return [tuple(json.loads(line)[:2]) for line in lines]
+
+    config = {
+        "name": "fake-board",
+        "flash_base": hex(BASE),
+        "flash_size": hex(FLASH_SIZE),
+        "sector_size": SECTOR,
+        "upload_range": f"{sys.executable} {script} {{bin}} {{address}} {log}",
+    }
+    return config, writes
+
+
+def flash(elf, config, tmp_path, **kwargs):
+    kwargs = {"port": "/dev/ttyFAKE0", "serial": "FAKE0", **kwargs}
+    return flash_delta(str(elf), config, record_root=str(tmp_path / "records"), **kwargs)
+
+
+def test_flat_image_aligns_to_sectors_and_fills_gaps(tmp_path):
+    elf = tmp_path / "fw.elf"
+    write_elf(elf, [(BASE + 0x10, b"\x01" * 16), (BASE + SECTOR + 4, b"\x02" * 4)])
+
+    address, image = flat_image(str(elf), BASE, SECTOR, FLASH_SIZE)
+
+    assert address == BASE
+    assert len(image) == 2 * SECTOR
+    assert image[:0x10] == b"\xff" * 0x10
+    assert image[0x10:0x20] == b"\x01" * 16
+    assert image[SECTOR + 4:SECTOR + 8] == b"\x02" * 4
+
+
+def test_segments_outside_flash_are_rejected(tmp_path, flasher):
+    config, writes = flasher
+    elf = tmp_path / "fw.elf"
+    # An initialised RAM segment at 0x20000000 would otherwise pad the image to ~384 MiB.
+    write_elf(elf, [(BASE, b"\x01" * 16), (0x20000000, b"\x02" * 16)])
+
+    with pytest.raises(FlashError, match="0x20000000, outside flash"):
+        flat_image(str(elf), BASE, SECTOR, FLASH_SIZE)
+    with pytest.raises(FlashError, match="outside flash"):
+        flash(elf, config, tmp_path)
+    assert writes() == []
+
+
+def test_changed_ranges_merges_adjacent_sectors():
+    record = {"address": BASE, "sector_size": SECTOR, "hashes": ["a", "b", "c", "d", "e"]}
+
+    ranges = changed_ranges(record, BASE, ["a", "x", "y", "d", "z", "new"], SECTOR)
+
+    assert ranges == [(BASE + SECTOR, 2 * SECTOR), (BASE + 4 * SECTOR, 2 * SECTOR)]
+
+
+def test_only_changed_sectors_are_reflashed(tmp_path, flasher):
+    config, writes = flasher
+    elf = tmp_path / "fw.elf"
+    firmware = bytearray(b"\x00" * (8 * SECTOR))
+    write_elf(elf, [(BASE, bytes(firmware))])
+
+    first = flash(elf, config, tmp_path)
+    assert writes() == [(BASE, 8 * SECTOR)]
+    assert first["sectors_changed"] == 8
+
+    assert flash(elf, config, tmp_path)["ranges"] == []
+    assert writes() == []
+
+    firmware[2 * SECTOR + 5] = 0x42
+    firmware[6 * SECTOR] = 0x42
+    write_elf(elf, [(BASE, bytes(firmware))])
+    summary = flash(elf, config, tmp_path)
+    assert writes() == [(BASE + 2 * SECTOR, SECTOR), (BASE + 6 * SECTOR, SECTOR)]
+    assert summary["bytes_written"] == 2 * SECTOR
+    assert summary["sectors_total"] == 8
+
+
+def test_written_range_contains_the_new_bytes(tmp_path, flasher):
+    config, _writes = flasher
+    elf = tmp_path / "fw.elf"
+    write_elf(elf, [(BASE, b"\x00" * (2 * SECTOR))])
+    flash(elf, config, tmp_path)
+
+    changed = b"\x00" * SECTOR + b"\x07" * SECTOR
+    write_elf(elf, [(BASE, changed)])
+    flash(elf, config, tmp_path)
+
+    entries = [json.loads(line) for line in (tmp_path / "writes.log").read_text().splitlines()]
+    assert entries[-1] == [BASE + SECTOR, SECTOR, hashlib.sha256(b"\x07" * SECTOR).hexdigest()]
+
+
+def test_full_flash_rewrites_everything(tmp_path, flasher):
+    config, writes = flasher
+    elf = tmp_path / "fw.elf"
+    write_elf(elf, [(BASE, b"\x00" * (4 * SECTOR))])
+    flash(elf, config, tmp_path)
+    writes()
+
+    flash(elf, config, tmp_path, full=True)
+
+    assert writes() == [(BASE, 4 * SECTOR)]
+
+
+def test_failed_upload_forgets_the_device_state(tmp_path, flasher):
+    config, writes = flasher
+    elf = tmp_path / "fw.elf"
+    write_elf(elf, [(BASE, b"\x00" * (4 * SECTOR))])
+    flash(elf, config, tmp_path)
+    writes()
+
+    failing = dict(config, upload_range=config["upload_range"].replace("{address}", "0xdead"))
+    write_elf(elf, [(BASE, b"\x01" * (4 * SECTOR))])
+    with pytest.raises(FlashError):
+        flash(elf, failing, tmp_path)
+
+    write_elf(elf, [(BASE, b"\x00" * (4 * SECTOR))])
+    flash(elf, config, tmp_path)
+    assert writes() == [(BASE, 4 * SECTOR)]
+
+
+def test_devices_are_tracked_separately(tmp_path, flasher):
+    config, writes = flasher
+    elf = tmp_path / "fw.elf"
+    write_elf(elf, [(BASE, b"\x00" * SECTOR)])
+    flash(elf, config, tmp_path)
+    writes()
+
+    flash(elf, config, tmp_path, port="/dev/ttyFAKE1", serial="FAKE1")
+
+    assert writes() == [(BASE, SECTOR)]
+
+
+def test_device_keeps_its_record_when_it_moves_to_another_port(tmp_path, flasher):
+    config, writes = flasher
+    elf = tmp_path / "fw.elf"
+    write_elf(elf, [(BASE, b"\x00" * (2 * SECTOR))])
+    flash(elf, config, tmp_path)
+    writes()
+
+    assert flash(elf, config, tmp_path, port="/dev/ttyFAKE3")["ranges"] == []
+    assert writes() == []
+
+
+def test_unknown_device_is_always_flashed_in_full(tmp_path, flasher):
+    config, writes = flasher
+    elf = tmp_path / "fw.elf"
+    write_elf(elf, [(BASE, b"\x00" * (2 * SECTOR))])
+
+    flash(elf, config, tmp_path, serial=None)
+    flash(elf, config, tmp_path, serial=None)
+
+    assert writes() == [(BASE, 2 * SECTOR), (BASE, 2 * SECTOR)]
+    assert not (tmp_path / "records").exists()
+
+
+def test_forgotten_device_is_flashed_in_full(tmp_path, flasher):
+    config, writes = flasher
+    elf = tmp_path / "fw.elf"
+    write_elf(elf, [(BASE, b"\x00" * (2 * SECTOR))])
+    flash(elf, config, tmp_path)
+    flash(elf, config, tmp_path, serial="FAKE1")
+    writes()
+
+    forget_device(config["name"], "FAKE0", root=str(tmp_path / "records"))
+    flash(elf, config, tmp_path)
+    flash(elf, config, tmp_path, serial="FAKE1")
+    assert writes() == [(BASE, 2 * SECTOR)]
+
+    forget_device(config["name"], root=str(tmp_path / "records"))
+    flash(elf, config, tmp_path)
+    flash(elf, config, tmp_path, serial="FAKE1")
+    assert writes() == [(BASE, 2 * SECTOR), (BASE, 2 * SECTOR)]
@@ -0,0 +1,36 @@
+from matrix import plan_targets, run_matrix
+
+
+def test_a_crashing_worker_fails_its_cell_and_the_rest_still_build(tmp_path):
+    project = tmp_path / "blinky"
+    project.mkdir()
+    targets = plan_targets([(str(project), {"name": "tivac-launchpad", "language": "zig"})], ["tivac-launchpad", "stm32f103c8", "esp32dev"])
+    # A target the worker cannot even start on raises inside build_target.
+    del targets[1]["profile"]
+    reported = []
+
+    results = run_matrix(targets, jobs=2, on_result=reported.append)
+
+    assert [result["board"] for result in results] == ["tivac-launchpad", "stm32f103c8", "esp32dev"]
+    assert len(reported) == 3
+    assert not any(result["ok"] for result in results)
+    assert results[1]["tail"] == ["Build worker failed: KeyError: 'profile'"]
+    assert results[0]["tail"] == ["Unsupported language 'zig'."]
+    assert results[2]["tail"] == ["Unsupported language 'zig'."]
+
+
+def test_each_cell_builds_with_its_boards_toolchain(tmp_path):
+    project = tmp_path / "blinky"
+    project.mkdir()
+    # Stands in for templates/c/Makefile: reports the compiler it would run.
+    (project / "Makefile").write_text("CROSS_COMPILE ?= arm-none-eabi-\nCC := $(CROSS_COMPILE)gcc\n\nall:\n\t@echo $(CC)\n")
+    registry = {
+        "stm32f103c8": {"toolchain": "arm-none-eabi-gcc", "mcu": "cortex-m3"},
+        "esp32dev": {"toolchain": "xtensa-esp32-elf-gcc", "mcu": "xtensa-esp32"},
+    }
+    targets = plan_targets([(str(project), {"name": "stm32f103c8", "language": "c"})], ["stm32f103c8", "esp32dev"], registry=registry)
+
+    results = run_matrix(targets, jobs=2)
+
+    assert [result["tail"] for result in results] == [["arm-none-eabi-gcc"], ["xtensa-esp32-elf-gcc"]]
+    assert [target["rust_target"] for target in targets] == ["thumbv7m-none-eabi", "xtensa-esp32-none-elf"]
@@ -0,0 +1,24 @@
+from module_gen import apply_writes, plan_modules
+
+MODULES = [{"name": "temp", "type": "sensor", "conn": "I2C"}]
+
+
+def test_existing_module_files_are_kept_unless_forced(tmp_path):
+    (tmp_path / "Makefile").write_text("SRCS = main.c\n")
+    writes, _statuses, _warnings, _skipped = plan_modules(str(tmp_path), "c", MODULES)
+    apply_writes(writes)
+    source = tmp_path / "modules" / "temp.c"
+    source.write_text(source.read_text() + "// driver code\n")
+    (tmp_path / "modules" / "temp.h").unlink()
+
+    writes, statuses, _warnings, skipped = plan_modules(str(tmp_path), "c", MODULES)
+
+    assert list(writes) == [str(tmp_path / "modules" / "temp.h")]
+    assert skipped == [str(source)]
+    assert statuses == {"temp": "created"}
+
+    writes, statuses, _warnings, skipped = plan_modules(str(tmp_path), "c", MODULES, force=True)
+
+    assert sorted(writes) == [str(tmp_path / "modules" / "temp.c"), str(tmp_path / "modules" / "temp.h")]
+    assert skipped == []
+    assert statuses == {"temp": "updated"}
@@ -0,0 +1,198 @@
+import os
+import struct
+import threading
+import time
+
+import pytest
+
+from log_decode import ElfStrings, FrameDecoder, TextDecoder, cobs_decode, cobs_encode
+from serial_capture import RingBuffer, monitor, open_port
+
+RODATA = 0x08001000
+FORMATS = [
+    "boot ok",
+    "adc=%d mV, raw=%u, reg=%08x",
+    "task %s took %.2f ms",
+    "uptime %lld us, grade %c, %d%%",
+    "buffer at %p",
+]
+
+
+def write_elf(path, strings):
+    """
+    Writes a minimal 32-bit ELF whose .rodata holds `strings`; returns
+    each string's address.
+    """
+    rodata = b""
+    addresses = []
+    for string in strings:
+        addresses.append(RODATA + len(rodata))
+        rodata += string.encode() + b"\0"
+    shstrtab = b"\0.rodata\0.shstrtab\0"
+    header_size, shentsize = 52, 40
+    rodata_offset = header_size
+    shstrtab_offset = rodata_offset + len(rodata)
+    shoff = shstrtab_offset + len(shstrtab)
+    header = b"\x7fELF\x01\x01\x01" + b"\0" * 9
+    header += struct.pack("<HHIIIIIHHHHHH", 2, 40, 1, RODATA, 0, shoff, 0, header_size, 32, 0, shentsize, 3, 2)
+    sections = struct.pack("<10I", *[0] * 10)
+    sections += struct.pack("<10I", 1, 1, 0x2, RODATA, rodata_offset, len(rodata), 0, 0, 4, 0)
+    sections += struct.pack("<10I", 9, 3, 0, 0, shstrtab_offset, len(shstrtab), 0, 0, 1, 0)
+    with open(path, "wb") as f:
+        f.write(header + rodata + shstrtab + sections)
+    return addresses
+
+
+def frame(level, address, timestamp, args=b""):
+    return cobs_encode(struct.pack("<BII", level, address, timestamp) + args) + b"\0"
+
+
+def messages(addresses, count):
+    """
+    Yields (encoded frame, expected level, timestamp, text) covering every format.
+    """
+    for i in range(count):
+        kind = i % len(FORMATS)
+        if kind == 0:
+            yield frame(2, addresses[0], i), "info", i, "boot ok"
+        elif kind == 1:
+            yield frame(3, addresses[1], i, struct.pack("<iII", -i, i * 7, 0xBEEF)), "debug", i, f"adc={-i} mV, raw={i * 7}, reg=0000beef"
+        elif kind == 2:
+            name = f"t{i}".encode()
+            yield frame(1, addresses[2], i, bytes([len(name)]) + name + struct.pack("<d", i / 8)), "warn", i, f"task t{i} took {i / 8:.2f} ms"
+        elif kind == 3:
+            yield frame(0, addresses[3], i, struct.pack("<qII", i * 1_000_000, ord("A"), 42)), "error", i, f"uptime {i * 1_000_000} us, grade A, 42%"
+        else:
+            yield frame(4, addresses[4], i, struct.pack("<I", 0x20000000 + i)), "trace", i, f"buffer at 0x{0x20000000 + i:08x}"
+
+
+@pytest.fixture
+def pty_port():
+    """
+    A pty pair standing in for a USB serial adapter: the monitor opens the
+    slave by path like a /dev/ttyACM device, the test writes to the master.
+    """
+    master, slave = os.openpty()
+    path = os.ttyname(slave)
+    fd = open_port(path, 3000000)
+    os.close(slave)
+    yield master, fd
+    for descriptor in (master, fd):
+        try:
+            os.close(descriptor)
+        except OSError:
+            pass
+
+
+def feed_device(master, data, capture_path, chunk=4096):
+    """
+    Writes `data` as the device would, then hangs up once the monitor has
+    read all of it.
+    """
+    open(capture_path, "wb").close()
+
+    def run():
+        for start in range(0, len(data), chunk):
+            os.write(master, data[start:start + chunk])
+        deadline = time.monotonic() + 10
+        while os.path.getsize(capture_path) < len(data) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        os.close(master)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def run_monitor(fd, decoder, capture_path, **kwargs):
+    shown = []
+    skipped = []
+
+    def render(records, lost):
+        shown.extend(records)
+        skipped.append(lost)
+
+    capture_fd = os.open(capture_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        summary = monitor(fd, decoder, render, capture_fd=capture_fd, **kwargs)
+    finally:
+        os.close(capture_fd)
+    return summary, shown, skipped
+
+
+def test_binary_frames_over_a_pty_are_captured_and_decoded(tmp_path, pty_port):
+    master, fd = pty_port
+    addresses = write_elf(tmp_path / "fw.elf", FORMATS)
+    expected = list(messages(addresses, 5000))
+    stream = b"".join(encoded for encoded, *_ in expected)
+    capture_path = str(tmp_path / "capture.bin")
+
+    writer = feed_device(master, stream, capture_path)
+    summary, shown, _skipped = run_monitor(fd, FrameDecoder(ElfStrings(str(tmp_path / "fw.elf"))), capture_path, fps=50, duration=20, max_records=len(expected))
+    writer.join()
+
+    assert summary["reason"] in ("closed", "disconnected")
+    assert summary["bytes"] == len(stream)
+    assert open(capture_path, "rb").read() == stream
+    assert [(record.level, record.timestamp, record.text) for record in shown] == [(level, timestamp, text) for _encoded, level, timestamp, text in expected]
+
+
+def test_text_output_is_captured_completely_while_rendering_is_throttled(tmp_path, pty_port):
+    master, fd = pty_port
+    lines = [f"sample {i} value={i * 3}" for i in range(30000)]
+    stream = ("\r\n".join(lines) + "\r\n").encode()
+    capture_path = str(tmp_path / "capture.log")
+
+    writer = feed_device(master, stream, capture_path, chunk=65536)
+    summary, shown, skipped = run_monitor(fd, TextDecoder(), capture_path, fps=10, duration=20)
+    writer.join()
+    frames = len(skipped)
+
+    assert open(capture_path, "rb").read() == stream
+    assert summary["skipped_bytes"] == 0
+    # Every line was either rendered or counted as skipped, in order.
+    assert len(shown) + sum(lost["records"] for lost in skipped) == len(lines)
+    rendered = [record.text for record in shown]
+    seen = set(rendered)
+    assert rendered == [line for line in lines if line in seen]
+    assert frames <= summary["duration"] * 10 + 2
+
+
+def test_ring_buffer_reports_bytes_the_writer_overwrote():
+    ring = RingBuffer(capacity=16)
+    for value in range(3):
+        views = ring.reserve(10)
+        data = bytes([value]) * 10
+        offset = 0
+        for view in views:
+            view[:] = data[offset:offset + len(view)]
+            offset += len(view)
+        ring.commit(10)
+
+    start, data = ring.read_from(0)
+
+    assert start == 14
+    assert data == b"\x01" * 6 + b"\x02" * 10
+    assert ring.read_from(30) == (30, b"")
+
+
+def test_frames_split_across_reads_and_undecodable_frames(tmp_path):
+    addresses = write_elf(tmp_path / "fw.elf", FORMATS)
+    decoder = FrameDecoder(ElfStrings(str(tmp_path / "fw.elf")))
+    encoded = frame(2, addresses[0], 7) + frame(2, 0xDEAD0000, 8) + b"hello\0" + frame(3, addresses[1], 9, b"\x01")
+
+    records = []
+    for byte in range(len(encoded)):
+        records += decoder.feed(encoded[byte:byte + 1])
+
+    assert records[0] == ("info", 7, "boot ok")
+    assert [record.level for record in records[1:]] == ["raw", "raw", "raw"]
+    assert records[2].text == "hello"
+    assert decoder.flush() == []
+
+
+def test_cobs_round_trips_zeros_and_long_blocks():
+    for payload in (b"", b"\0", b"\0\0\x01", bytes(range(1, 256)) * 3, b"\x11" * 254, b"\x11" * 254 + b"\0"):
+        encoded = cobs_encode(payload)
+        assert b"\0" not in encoded
+        assert cobs_decode(encoded) == payload
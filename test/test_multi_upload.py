@@ -0,0 +1,234 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+
+from delta_flash import FlashError, record_path
+from devices import device_for_port, discover_devices, match_devices
+from multi_upload import flash_devices
+from test_delta_flash import write_elf
+
+BOARDS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "boards")
+
+STUB_FLASHER = """
+import json, os, sys, time
+port, log, fail_dir = sys.argv[1:4]
+marker = os.path.join(fail_dir, os.path.basename(port))
+if os.path.exists(marker):
+    os.unlink(marker)
+    sys.exit(1)
+started = time.time()
+time.sleep(0.3)
+with open(log, "a") as f:
+    f.write(json.dumps([port, started, time.time()]) + "\\n")
+"""
+
+
+def add_tty(root, bus_port, name, usb_id, serial=None, interface="1.0"):
+    """
+    Adds /sys/class/tty/<name> linked to a USB device like the kernel does.
+    """
+    vendor, product = usb_id.split(":")
+    usb_dir = root / "devices" / "usb1" / bus_port
+    tty_dir = usb_dir / f"{bus_port}:{interface}" / "tty" / name
+    tty_dir.mkdir(parents=True)
+    (usb_dir / "idVendor").write_text(vendor + "\n")
+    (usb_dir / "idProduct").write_text(product + "\n")
+    if serial:
+        (usb_dir / "serial").write_text(serial + "\n")
+    class_dir = root / "class" / "tty"
+    class_dir.mkdir(parents=True, exist_ok=True)
+    (class_dir / name).mkdir()
+    (class_dir / name / "device").symlink_to(usb_dir / f"{bus_port}:{interface}")
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBED_CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    root = tmp_path / "sys"
+    add_tty(root, "1-1", "ttyACM0", "1cbe:00fd", serial="TIVA0")
+    add_tty(root, "1-2", "ttyUSB0", "10C4:EA60", serial="ESP0")
+    add_tty(root, "1-3.1", "ttyACM1", "1cbe:00fd", serial="TIVA1")
+    add_tty(root, "1-3.2", "ttyUSB1", "0403:6001")
+    (root / "class" / "tty" / "tty0").mkdir()
+    return root
+
+
+@pytest.fixture
+def stub_flasher(tmp_path):
+    script = tmp_path / "stub_flasher.py"
+    script.write_text(STUB_FLASHER)
+    log = tmp_path / "flashes.log"
+    fail_dir = tmp_path / "fail"
+    fail_dir.mkdir()
+    config = {"name": "tivac-launchpad", "usb_ids": ["1cbe:00fd"], "upload": f"{sys.executable} {script} {{port}} {log} {fail_dir}"}
+
+    def flashes():
+        return [json.loads(line) for line in log.read_text().splitlines()] if log.exists() else []
+
+    return config, flashes, fail_dir
+
+
+def test_discovers_usb_serial_devices(sysfs):
+    devices = discover_devices(str(sysfs))
+
+    assert [(d.port, d.usb_id, d.serial) for d in devices] == [
+        ("/dev/ttyACM0", "1cbe:00fd", "TIVA0"),
+        ("/dev/ttyACM1", "1cbe:00fd", "TIVA1"),
+        ("/dev/ttyUSB0", "10c4:ea60", "ESP0"),
+        ("/dev/ttyUSB1", "0403:6001", None),
+    ]
+
+
+def test_discovery_honours_embed_sysfs_root(sysfs, monkeypatch):
+    monkeypatch.setenv("EMBED_SYSFS_ROOT", str(sysfs))
+
+    assert len(discover_devices()) == 4
+
+
+def test_missing_sysfs_finds_nothing(tmp_path):
+    assert discover_devices(str(tmp_path / "nothing")) == []
+
+
+def test_matches_devices_by_board_usb_ids(sysfs):
+    devices = discover_devices(str(sysfs))
+
+    assert [d.port for d in match_devices(devices, {"usb_ids": ["1CBE:00FD"]})] == ["/dev/ttyACM0", "/dev/ttyACM1"]
+    assert [d.port for d in match_devices(devices, {"usb_ids": ["10c4:ea60", "1a86:7523"]})] == ["/dev/ttyUSB0"]
+    assert match_devices(devices, {}) == []
+
+
+def test_finds_the_device_behind_a_port(sysfs, tmp_path):
+    devices = discover_devices(str(sysfs))
+    link = tmp_path / "by-id"
+    link.symlink_to("/dev/ttyACM1")
+
+    assert device_for_port("/dev/ttyACM1", devices=devices).serial == "TIVA1"
+    assert device_for_port(str(link), devices=devices).serial == "TIVA1"
+    assert device_for_port("/dev/ttyACM7", devices=devices) is None
+    assert device_for_port(None, {"usb_ids": ["10c4:ea60"]}, devices=devices).serial == "ESP0"
+    # Two boards attached: without a port it is unknown which one is meant.
+    assert device_for_port(None, {"usb_ids": ["1cbe:00fd"]}, devices=devices) is None
+
+
+def test_full_upload_forgets_the_sector_record(tmp_path, stub_flasher, cache):
+    config, _flashes, _fail_dir = stub_flasher
+    for serial in ("TIVA0", "TIVA1"):
+        path = record_path(config["name"], serial)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "w").close()
+
+    flash_devices(str(tmp_path / "fw.elf"), config, ["/dev/ttyACM0"], serials={"/dev/ttyACM0": "TIVA0"})
+
+    assert not os.path.exists(record_path(config["name"], "TIVA0"))
+    assert os.path.exists(record_path(config["name"], "TIVA1"))
+
+
+def load_board(name):
+    with open(os.path.join(BOARDS, name)) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def flash_tools(tmp_path, monkeypatch):
+    """
+    Puts logging stand-ins for lm4flash and st-flash first on PATH.
+    """
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    log = tmp_path / "tools.log"
+    for tool in ("lm4flash", "st-flash"):
+        script = bin_dir / tool
+        script.write_text(f"#!{sys.executable}\nimport json, os, sys\nwith open({str(log)!r}, 'a') as f:\n    f.write(json.dumps([os.path.basename(sys.argv[0])] + sys.argv[1:]) + '\\n')\n")
+        script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    def calls():
+        return [json.loads(line) for line in log.read_text().splitlines()] if log.exists() else []
+
+    return calls
+
+
+def test_each_device_is_flashed_through_its_own_probe(tmp_path, sysfs, flash_tools):
+    config = load_board("tivac-launchpad.json")
+    elf = tmp_path / "fw.elf"
+    write_elf(elf, [(0, b"\x00" * 2048)])
+    devices = match_devices(discover_devices(str(sysfs)), config)
+
+    results = flash_devices(str(elf), config, [d.port for d in devices], serials={d.port: d.serial for d in devices})
+
+    assert all(result["ok"] for result in results)
+    selected = sorted(call[1] for call in flash_tools())
+    assert selected == ["-sTIVA0", "-sTIVA1"]
+
+
+def test_parallel_flashing_needs_every_serial(tmp_path, flash_tools):
+    config = load_board("stm32f103c8.json")
+    elf = tmp_path / "fw.elf"
+    write_elf(elf, [(0x08000000, b"\x00" * 1024)])
+    ports = ["/dev/ttyACM0", "/dev/ttyACM1"]
+
+    with pytest.raises(FlashError, match="/dev/ttyACM1"):
+        flash_devices(str(elf), config, ports, serials={"/dev/ttyACM0": "STLINK0"})
+    with pytest.raises(FlashError, match="one at a time"):
+        flash_devices(str(elf), dict(config, upload_range="st-flash write {bin} {address}"), ports)
+    assert flash_tools() == []
+
+    # A single device needs no selector; an unknown serial just drops the option.
+    flash_devices(str(elf), config, ports[:1])
+    assert [call[:2] for call in flash_tools()] == [["st-flash", "write"]]
+
+
+def test_flashes_devices_concurrently(tmp_path, stub_flasher):
+    config, flashes, _fail_dir = stub_flasher
+    ports = [f"/dev/ttyACM{i}" for i in range(6)]
+
+    started = time.monotonic()
+    results = flash_devices(str(tmp_path / "fw.elf"), config, ports, jobs=6)
+    elapsed = time.monotonic() - started
+
+    assert [r["port"] for r in results] == ports
+    assert all(r["ok"] and r["attempts"] == 1 for r in results)
+    assert sorted(entry[0] for entry in flashes()) == ports
+    # Six 0.3 s flashes overlap instead of taking 1.8 s back to back.
+    assert elapsed < 1.5
+
+
+def test_worker_pool_is_bounded(tmp_path, stub_flasher):
+    config, flashes, _fail_dir = stub_flasher
+
+    flash_devices(str(tmp_path / "fw.elf"), config, [f"/dev/ttyACM{i}" for i in range(4)], jobs=2)
+
+    spans = [(start, end) for _port, start, end in flashes()]
+    overlapping = max(sum(1 for s, e in spans if s <= t < e) for t, _end in spans)
+    assert overlapping <= 2
+
+
+def test_failed_device_is_retried(tmp_path, stub_flasher):
+    config, flashes, fail_dir = stub_flasher
+    (fail_dir / "ttyACM1").touch()
+    events = []
+
+    results = flash_devices(str(tmp_path / "fw.elf"), config, ["/dev/ttyACM0", "/dev/ttyACM1"], retries=1, retry_delay=0, on_event=lambda *event: events.append(event[:2]))
+
+    assert [(r["port"], r["ok"], r["attempts"]) for r in results] == [("/dev/ttyACM0", True, 1), ("/dev/ttyACM1", True, 2)]
+    assert ("/dev/ttyACM1", "retry") in events
+    assert len(flashes()) == 2
+
+
+def test_device_fails_after_retries_run_out(tmp_path, stub_flasher):
+    config, _flashes, _fail_dir = stub_flasher
+    config = dict(config, upload=f"{sys.executable} -c 'import sys; sys.exit(2)'")
+
+    results = flash_devices(str(tmp_path / "fw.elf"), config, ["/dev/ttyACM0"], retries=2, retry_delay=0)
+
+    assert results[0]["ok"] is False
+    assert results[0]["attempts"] == 3
+    assert "error code 2" in results[0]["detail"]
@@ -0,0 +1,35 @@
+import json
+import os
+
+from toolchain import probe_tools
+
+
+def write_tool(directory, name, script):
+    path = directory / name
+    path.write_text("#!/bin/sh\n" + script)
+    path.chmod(0o755)
+    return path
+
+
+def test_failed_version_probes_are_not_cached(tmp_path):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    write_tool(bin_dir, "fast-gcc", "echo fast-gcc 1.0\n")
+    slow = write_tool(bin_dir, "slow-gcc", "sleep 5\n")
+    cache_path = str(tmp_path / "probe.json")
+    tools = [("GCC", "fast", "fast-gcc"), ("GCC", "slow", "slow-gcc")]
+
+    first = probe_tools(tools, timeout=0.2, cache_path=cache_path, path_env=str(bin_dir))
+
+    assert [tool["version"] for tool in first] == ["fast-gcc 1.0", "timed out"]
+    with open(cache_path) as f:
+        assert list(json.load(f)["tools"]) == ["fast-gcc"]
+
+    # Same binary, same mtime: only a cached success would skip the probe.
+    stat = os.stat(slow)
+    slow.write_text("#!/bin/sh\necho slow-gcc 2.0\n")
+    os.utime(slow, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    second = probe_tools(tools, timeout=0.2, cache_path=cache_path, path_env=str(bin_dir))
+
+    assert [tool["version"] for tool in second] == ["fast-gcc 1.0", "slow-gcc 2.0"]
+    assert not any(tool["probe_failed"] for tool in second)
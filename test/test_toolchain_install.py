@@ -0,0 +1,209 @@
+import hashlib
+import io
+import json
+import os
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from toolchain_install import InstallError, board_toolchains, fetch_archive, fetch_index, install_toolchains, resolve_toolchains
+
+HOST = "linux-x86_64"
+
+
+def make_archive(top, files):
+    """
+    Builds a .tar.gz with every file under `top/`, the way vendors ship toolchains.
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, (content, mode) in files.items():
+            info = tarfile.TarInfo(f"{top}/{name}")
+            info.size = len(content)
+            info.mode = mode
+            archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+class Mirror:
+    """
+    Stand-in for a toolchain mirror: serves files from memory, honours
+    Range requests and can cut a response off halfway.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.requests = []
+        self.truncate_once = set()
+        mirror = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.lstrip("/")
+                mirror.requests.append((path, self.headers.get("Range")))
+                data = mirror.files.get(path)
+                if data is None:
+                    self.send_error(404)
+                    return
+                start = 0
+                if self.headers.get("Range"):
+                    start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+                    if start >= len(data):
+                        self.send_error(416)
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+                else:
+                    self.send_response(200)
+                body = data[start:]
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if path in mirror.truncate_once:
+                    mirror.truncate_once.discard(path)
+                    self.wfile.write(body[:len(body) // 2])
+                    self.wfile.flush()
+                    self.connection.shutdown(2)
+                    return
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def add_toolchain(self, index, name, version, files, provides=()):
+        archive = make_archive(f"{name}-{version}", files)
+        path = f"archives/{name}-{version}.tar.gz"
+        self.files[path] = archive
+        index["toolchains"][name] = {
+            "version": version,
+            "provides": list(provides),
+            "archives": {HOST: {"url": path, "sha256": hashlib.sha256(archive).hexdigest(), "size": len(archive)}},
+        }
+        self.files["index.json"] = json.dumps(index).encode()
+        return archive
+
+    def downloads(self, path):
+        return [range_header for requested, range_header in self.requests if requested == path]
+
+
+@pytest.fixture
+def mirror():
+    mirror = Mirror()
+    yield mirror
+    mirror.server.shutdown()
+    mirror.server.server_close()
+
+
+@pytest.fixture
+def index(mirror):
+    index = {"toolchains": {}}
+    mirror.add_toolchain(index, "arm-none-eabi-gcc", "13.3", {"bin/arm-none-eabi-gcc": (b"#!/bin/sh\necho arm\n", 0o755), "bin/arm-none-eabi-gdb": (b"#!/bin/sh\n", 0o755), "share/doc.txt": (b"doc" * 50000, 0o644)}, provides=["arm-none-eabi-gdb"])
+    mirror.add_toolchain(index, "xtensa-esp32-elf-gcc", "12.2", {"bin/xtensa-esp32-elf-gcc": (b"#!/bin/sh\necho xtensa\n", 0o755)})
+    return index
+
+
+def plans_for(mirror, names):
+    index_url = mirror.url + "index.json"
+    plans, missing = resolve_toolchains(fetch_index(index_url), names, index_url, host=HOST)
+    assert missing == []
+    return plans
+
+
+def test_installs_toolchains_in_parallel_and_links_executables(mirror, index, tmp_path):
+    events = []
+    plans = plans_for(mirror, ["arm-none-eabi-gcc", "arm-none-eabi-gdb", "xtensa-esp32-elf-gcc"])
+    assert [plan["name"] for plan in plans] == ["arm-none-eabi-gcc", "xtensa-esp32-elf-gcc"]
+
+    results = install_toolchains(plans, root=str(tmp_path / "home"), cache=str(tmp_path / "cache"), on_event=lambda *event: events.append(event))
+
+    assert [result["status"] for result in results] == ["downloaded", "downloaded"]
+    assert results[0]["linked"] == ["arm-none-eabi-gcc", "arm-none-eabi-gdb"]
+    gcc = tmp_path / "home" / "bin" / "arm-none-eabi-gcc"
+    assert os.access(gcc, os.X_OK)
+    assert os.path.realpath(gcc) == str(tmp_path / "home" / "arm-none-eabi-gcc-13.3" / "bin" / "arm-none-eabi-gcc")
+    assert sorted(os.listdir(tmp_path / "cache")) == sorted([plan["sha256"] for plan in plans] + [plan["sha256"] + ".lock" for plan in plans])
+    downloads = [detail for name, event, detail in events if event == "download" and name == "arm-none-eabi-gcc"]
+    assert downloads[-1] == (plans[0]["size"], plans[0]["size"])
+
+    mirror.requests.clear()
+    again = install_toolchains(plans, root=str(tmp_path / "home"), cache=str(tmp_path / "cache"))
+    assert [result["status"] for result in again] == ["current", "current"]
+    assert mirror.requests == []
+
+
+def test_reinstall_uses_the_shared_archive_cache(mirror, index, tmp_path):
+    plans = plans_for(mirror, ["xtensa-esp32-elf-gcc"])
+    cache = str(tmp_path / "cache")
+    install_toolchains(plans, root=str(tmp_path / "agent1"), cache=cache)
+    mirror.requests.clear()
+
+    results = install_toolchains(plans, root=str(tmp_path / "agent2"), cache=cache)
+
+    assert results[0]["status"] == "cached"
+    assert mirror.requests == []
+    assert (tmp_path / "agent2" / "bin" / "xtensa-esp32-elf-gcc").exists()
+
+
+def test_download_cut_off_midway_resumes_with_a_range_request(mirror, index, tmp_path):
+    plan = plans_for(mirror, ["arm-none-eabi-gcc"])[0]
+    path = "archives/arm-none-eabi-gcc-13.3.tar.gz"
+    mirror.truncate_once.add(path)
+
+    archive_path, cached = fetch_archive(plan, cache=str(tmp_path), retry_delay=0)
+
+    assert not cached
+    first, second = mirror.downloads(path)
+    assert first is None
+    assert second == f"bytes={len(mirror.files[path]) // 2}-"
+    with open(archive_path, "rb") as f:
+        assert hashlib.sha256(f.read()).hexdigest() == plan["sha256"]
+
+
+def test_partial_download_from_an_earlier_run_is_resumed(mirror, index, tmp_path):
+    plan = plans_for(mirror, ["xtensa-esp32-elf-gcc"])[0]
+    path = "archives/xtensa-esp32-elf-gcc-12.2.tar.gz"
+    (tmp_path / (plan["sha256"] + ".part")).write_bytes(mirror.files[path][:100])
+
+    archive_path, _cached = fetch_archive(plan, cache=str(tmp_path))
+
+    assert mirror.downloads(path) == ["bytes=100-"]
+    assert open(archive_path, "rb").read() == mirror.files[path]
+
+
+def test_checksum_mismatch_is_rejected_and_not_cached(mirror, index, tmp_path):
+    plan = plans_for(mirror, ["xtensa-esp32-elf-gcc"])[0]
+    mirror.files["archives/xtensa-esp32-elf-gcc-12.2.tar.gz"] += b"tampered"
+
+    results = install_toolchains([plan], root=str(tmp_path / "home"), cache=str(tmp_path / "cache"))
+
+    assert not results[0]["ok"]
+    assert "Checksum mismatch" in results[0]["detail"]
+    assert os.listdir(tmp_path / "cache") == [plan["sha256"] + ".lock"]
+    assert not (tmp_path / "home" / "xtensa-esp32-elf-gcc-12.2").exists()
+
+
+def test_resolves_board_toolchains_and_reports_missing_ones(mirror, index):
+    entries = [
+        {"source": "json", "config": {"toolchain": "arm-none-eabi-gcc"}},
+        {"source": "json", "config": {"toolchain": "arm-none-eabi-gcc"}},
+        {"source": "json", "config": {"toolchain": "msp430-gcc"}},
+        {"source": "openocd"},
+    ]
+    names = board_toolchains(entries)
+    assert names == ["arm-none-eabi-gcc", "msp430-gcc"]
+
+    index_url = mirror.url + "index.json"
+    plans, missing = resolve_toolchains(fetch_index(index_url), names, index_url, host=HOST)
+    assert [plan["url"] for plan in plans] == [mirror.url + "archives/arm-none-eabi-gcc-13.3.tar.gz"]
+    assert missing == ["msp430-gcc"]
+    assert resolve_toolchains(fetch_index(index_url), names, index_url, host="darwin-arm64") == ([], names)
+
+
+def test_unreadable_index_raises_install_error(mirror):
+    with pytest.raises(InstallError):
+        fetch_index(mirror.url + "missing.json")
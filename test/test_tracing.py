@@ -0,0 +1,34 @@
+import pytest
+
+import tracing
+
+
+@pytest.fixture(autouse=True)
+def fresh_tracing(monkeypatch):
+    monkeypatch.setattr(tracing, "_events", None)
+    monkeypatch.setattr(tracing, "_output", None)
+    monkeypatch.delenv("EMBED_TRACE", raising=False)
+
+
+def test_global_options_are_only_the_ones_before_the_command():
+    assert tracing.split_global_options(["-v", "--trace", "out.json", "board", "list", "--trace", "x"]) == (["-v", "--trace", "out.json"], ["board", "list", "--trace", "x"])
+    assert tracing.split_global_options(["--trace=out.json", "compile", "-v"]) == (["--trace=out.json"], ["compile", "-v"])
+
+
+def test_trace_option_after_the_command_does_not_trace():
+    tracing.configure(["board", "list", "--json", "--trace", "out.json"])
+
+    assert not tracing.enabled()
+
+
+def test_leading_trace_option_records_but_writes_only_once_parsed(tmp_path):
+    tracing.configure(["--trace", str(tmp_path / "out.json"), "board", "list"])
+    with tracing.span("startup"):
+        pass
+
+    tracing.write()
+    assert not (tmp_path / "out.json").exists()
+
+    tracing.enable(str(tmp_path / "out.json"))
+    tracing.write()
+    assert "startup" in (tmp_path / "out.json").read_text()